@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+# entry reads are served by async views under asgi
+os.environ.setdefault('ENTRY_ASYNC_VIEWS', 'true')
 
 application = get_asgi_application()
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'drf_spectacular',
     'rest_framework.authtoken',
@@ -52,7 +54,9 @@ INSTALLED_APPS = [
 
 AUTH_USER_MODEL = 'core.user'
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -86,16 +90,80 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# connections are kept for DB_CONN_MAX_AGE seconds and checked
+# before reuse, set DB_POOLER=transaction behind a transaction mode
+# pooler such as pgbouncer
+DB_POOLER = os.environ.get('DB_POOLER', '')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
+        'PORT': os.environ.get('DB_PORT', ''),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get(
+            'DB_CONN_HEALTH_CHECKS', 'true').lower() == 'true',
+        # server side cursors do not survive transaction mode
+        # pooling, psycopg2 prepares no statements on the server
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOLER == 'transaction',
+    }
+}
+
+# read replicas as comma separated host[:port] values in
+# DB_REPLICA_HOSTS, with the credentials of the primary. DB_REPLICA_NAME
+# points a replica at another database of the same server for testing.
+DATABASE_REPLICAS = []
+for number, address in enumerate(filter(None, os.environ.get(
+        'DB_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = address.strip().partition(':')
+    DATABASE_REPLICAS.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port,
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# safe requests under the prefix read from the replicas unless the client
+# sent an unsafe request within the sticky seconds, see core.routers
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_READ_PATH_PREFIX = '/api/'
+REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# redis in production, local memory when CACHE_REDIS_URL is unset
+
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
+
+# cached entry list and retrieve responses, see entry.cache
+ENTRY_RESPONSE_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': int(os.environ.get('ENTRY_RESPONSE_CACHE_TIMEOUT', 300)),
 }
 
+# serve entry and category reads with the async views of
+# entry.async_views, app.asgi turns them on
+ENTRY_ASYNC_VIEWS = os.environ.get(
+    'ENTRY_ASYNC_VIEWS', 'false').lower() == 'true'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -148,6 +216,42 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
+# image processing runs on its own queue, served by
+# a worker with bounded concurrency
+CELERY_TASK_ROUTES = {
+    'entry.tasks.generate_image_variants': {'queue': 'images'},
+}
+
+# resized entry image variants, bounding boxes in pixels
+ENTRY_IMAGE_VARIANTS = {
+    'thumbnail': (320, 320),
+    'medium': (1024, 1024),
+}
+ENTRY_IMAGE_FORMATS = ['webp', 'jpeg']
+ENTRY_IMAGE_QUALITY = int(os.environ.get('ENTRY_IMAGE_QUALITY', 80))
+# number of unreferenced image blobs deleted per transaction
+# by collect_image_blobs
+IMAGE_BLOB_GC_BATCH_SIZE = int(os.environ.get(
+    'IMAGE_BLOB_GC_BATCH_SIZE', 500))
+# number of deleted entry image files per cleanup task
+MEDIA_CLEANUP_BATCH_SIZE = int(os.environ.get(
+    'MEDIA_CLEANUP_BATCH_SIZE', 100))
+# largest accepted entry image upload in bytes
+ENTRY_IMAGE_MAX_UPLOAD_SIZE = int(os.environ.get(
+    'ENTRY_IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024))
+
+# lower bounds of the entry facet price buckets, run
+# rebuild_entry_facets after changing them
+ENTRY_PRICE_BUCKETS = [
+    0, 100, 500, 1000, 5000, 10000, 50000, 100000, 500000, 1000000,
+]
+
+# searches rank only the newest ENTRY_SEARCH_CANDIDATES matches,
+# common words would otherwise rank every entry holding them
+ENTRY_SEARCH_CANDIDATES = int(os.environ.get(
+    'ENTRY_SEARCH_CANDIDATES', 1000))
+# number of entries expired per bulk update by mark_expired_entries
+ENTRY_EXPIRY_BATCH_SIZE = int(os.environ.get('ENTRY_EXPIRY_BATCH_SIZE', 1000))
 
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True
@@ -157,6 +261,92 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# api json rendered and parsed with orjson, the output is the output
+# of the rest framework classes, see core.renderers.
+if os.environ.get('FAST_JSON', 'true').lower() == 'true':
+    REST_FRAMEWORK.update({
+        'DEFAULT_RENDERER_CLASSES': [
+            'core.renderers.ORJSONRenderer',
+            'rest_framework.renderers.BrowsableAPIRenderer',
+        ],
+        'DEFAULT_PARSER_CLASSES': [
+            'core.parsers.ORJSONParser',
+            'rest_framework.parsers.FormParser',
+            'rest_framework.parsers.MultiPartParser',
+        ],
+    })
+
+# token authentication cache, see user.authentication.TokenCache.
+# SHARED_CACHE_ALIAS names an entry of CACHES backing the
+# in-process cache, it is disabled when empty.
+AUTH_TOKEN_CACHE = {
+    'MAX_SIZE': int(os.environ.get('AUTH_TOKEN_CACHE_MAX_SIZE', 10000)),
+    'TTL': int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 60)),
+    'SHARED_CACHE_ALIAS': os.environ.get('AUTH_TOKEN_SHARED_CACHE') or None,
+    'SHARED_TTL': int(os.environ.get('AUTH_TOKEN_SHARED_CACHE_TTL', 300)),
+}
+
+# request timing, see core.middleware.PerformanceMiddleware.
+# a SLOW_SAMPLE_RATE share of slow requests is logged with
+# its TOP_QUERIES slowest queries.
+REQUEST_PERFORMANCE = {
+    'SERVER_TIMING': os.environ.get('SERVER_TIMING', 'true').lower() == 'true',
+    'SLOW_REQUEST_MS': int(os.environ.get('SLOW_REQUEST_MS', 500)),
+    'SLOW_SAMPLE_RATE': float(os.environ.get('SLOW_REQUEST_SAMPLE_RATE', 1)),
+    'TOP_QUERIES': int(os.environ.get('SLOW_REQUEST_TOP_QUERIES', 5)),
+}
+
+# prometheus metrics, see core.metrics. processes write snapshots to
+# METRICS_MULTIPROC_DIR every METRICS_FLUSH_INTERVAL seconds to be
+# added up by the metrics endpoint, which requires METRICS_TOKEN as a
+# bearer token when set
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR') or None
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# query statistics by fingerprint, see core.querystats. processes log
+# their busiest fingerprints and write their statistics to DIR for
+# `manage.py querystats` every FLUSH_INTERVAL seconds
+QUERY_STATS = {
+    'ENABLED': os.environ.get('QUERY_STATS', 'true').lower() == 'true',
+    'DIR': os.environ.get('QUERY_STATS_DIR') or None,
+    'FLUSH_INTERVAL': float(os.environ.get('QUERY_STATS_FLUSH_INTERVAL', 60)),
+    'SLOW_QUERY_MS': float(os.environ.get('SLOW_QUERY_MS', 200)),
+    'TOP': int(os.environ.get('QUERY_STATS_TOP', 10)),
+}
+
+# requests slower than SLOW_REQUEST_MS and slow queries are logged as
+# warnings, PERFORMANCE_LOG_LEVEL=INFO logs every request and the query
+# statistics. test runs log none of them.
+PERFORMANCE_LOG_LEVEL = 'CRITICAL' if sys.argv[1:2] == ['test'] else \
+    os.environ.get('PERFORMANCE_LOG_LEVEL', 'WARNING')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'performance': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'core.performance': {
+            'handlers': ['performance'],
+            'level': PERFORMANCE_LOG_LEVEL,
+            'propagate': False,
+        },
+        'core.querystats': {
+            'handlers': ['performance'],
+            'level': PERFORMANCE_LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
 # cors config
 
 CORS_ALLOWED_ORIGINS = [
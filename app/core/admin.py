@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.contrib.postgres.search import SearchQuery
 from core import models
 from django.contrib.auth import get_user_model
 
@@ -71,6 +72,18 @@ class EntryAdmin(admin.ModelAdmin):
     list_filter = ('is_expired',)
     inlines = [EntryImageInline]
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Search title and description with the full text search index.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        query = SearchQuery(search_term, search_type='websearch',
+                            config=models.ENTRY_SEARCH_CONFIG)
+        return queryset.filter(search_vector=query), False
+
 
 admin.site.register(models.Category)
 
@@ -0,0 +1,160 @@
+"""
+Resumable backfills running set based updates in primary key ranges.
+
+Every batch updates the rows of one id range with a single UPDATE in
+its own short transaction, so only the rows of the current range are
+locked. Progress is recorded per backfill after every batch, and an
+interrupted backfill resumes after the last finished range.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from core.models import BackfillProgress, Category, Entry, Plan
+
+backfills = {}
+
+
+def register(cls):
+    """
+    Class decorator adding a backfill to the registry.
+    """
+    backfills[cls.name] = cls()
+    return cls
+
+
+class Backfill:
+    """
+    Base class of backfills over the rows of a model.
+    """
+    name = None
+    description = ''
+    model = Entry
+
+    def setup(self):
+        """
+        Prepare shared state before the first batch.
+        """
+
+    def update(self, rows):
+        """
+        Update the rows of a queryset, returning the number of
+        updated rows.
+        """
+        raise NotImplementedError
+
+    def id_range(self):
+        """
+        Return the smallest and largest primary key, rows created
+        later are written correctly by the models.
+        """
+        ids = self.model._default_manager.aggregate(
+            first=Min('pk'), last=Max('pk'))
+        return ids['first'], ids['last']
+
+    def run_batch(self, start, end):
+        """
+        Update the rows with start <= pk < end.
+        """
+        return self.update(self.model._default_manager.filter(
+            pk__gte=start, pk__lt=end))
+
+
+def run_backfill(backfill, batch_size=1000, sleep=0, restart=False,
+                 report=None):
+    """
+    Run a backfill from where it stopped, sleeping between batches to
+    leave room for other writes. Returns its progress.
+    """
+    progress, created = BackfillProgress.objects.get_or_create(
+        name=backfill.name)
+    if restart or created or progress.completed_at is not None:
+        first, last = backfill.id_range()
+        progress.next_id = first or 0
+        progress.last_id = last or 0
+        progress.rows_updated = 0
+        progress.completed_at = None
+        progress.save()
+
+    backfill.setup()
+    started = time.monotonic()
+    start_id = progress.next_id
+    while progress.next_id <= progress.last_id:
+        end = progress.next_id + batch_size
+        with transaction.atomic():
+            updated = backfill.run_batch(progress.next_id, end)
+            progress.next_id = end
+            progress.rows_updated += updated
+            progress.save(update_fields=['next_id', 'rows_updated',
+                                         'updated_at'])
+
+        if report is not None:
+            report(progress, progress_rate(progress, start_id, started))
+        if sleep:
+            time.sleep(sleep)
+
+    progress.completed_at = timezone.now()
+    progress.save(update_fields=['completed_at', 'updated_at'])
+    return progress
+
+
+def progress_rate(progress, start_id, started):
+    """
+    Return the ids processed per second since the run started.
+    """
+    elapsed = time.monotonic() - started
+    return (progress.next_id - start_id) / elapsed if elapsed else 0
+
+
+@register
+class EntryCategoryBackfill(Backfill):
+    name = 'entry-category'
+    description = 'Set the category of entries without one to ' \
+                  'Miscellaneous.'
+
+    def setup(self):
+        self.category, created = Category.objects.get_or_create(
+            name='Miscellaneous')
+
+    def update(self, rows):
+        # queryset updates leave edited_at alone
+        return rows.filter(category=None).update(category=self.category)
+
+
+@register
+class EntryExpiresAtBackfill(Backfill):
+    name = 'entry-expires-at'
+    description = "Set missing expiry dates from the owners' plans."
+
+    def setup(self):
+        self.plans = list(Plan.objects.values_list('pk', 'days_to_expire'))
+
+    def update(self, rows):
+        rows = rows.filter(expires_at=None, is_expired=False)
+        return sum(
+            rows.filter(user__plan_id=plan_id).reset_expiry(days_to_expire)
+            for plan_id, days_to_expire in self.plans
+        )
+
+
+@register
+class UserActiveEntriesCountBackfill(Backfill):
+    name = 'user-active-entries-count'
+    description = 'Recount the active entries of users.'
+    model = get_user_model()
+
+    def update(self, rows):
+        return get_user_model().objects.reconcile_entry_counts(rows)
+
+
+@register
+class EntrySearchVectorBackfill(Backfill):
+    name = 'entry-search-vector'
+    description = 'Recompute the full text search vectors of entries.'
+
+    def update(self, rows):
+        # the search vector trigger recomputes cleared vectors
+        return rows.update(search_vector=None)
@@ -0,0 +1,77 @@
+"""
+Django command to run resumable backfills.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core.backfills import backfills, run_backfill
+
+
+class Command(BaseCommand):
+    """
+    Django command to run a registered backfill in id range
+    batches, resuming where an interrupted run stopped.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'name',
+            nargs='?',
+            help='Name of the backfill to run.',
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List the registered backfills.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of ids per batch.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to pause between batches.',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Start from the first id instead of resuming.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['list'] or not options['name']:
+            for name, backfill in backfills.items():
+                self.stdout.write(f'{name}: {backfill.description}')
+            return
+
+        backfill = backfills.get(options['name'])
+        if backfill is None:
+            raise CommandError(
+                f'Unknown backfill {options["name"]}. '
+                f'Choose from: {", ".join(backfills)}.')
+        if options['batch_size'] < 1:
+            raise CommandError('Batch size must be positive.')
+
+        progress = run_backfill(
+            backfill,
+            batch_size=options['batch_size'],
+            sleep=options['sleep'],
+            restart=options['restart'],
+            report=self.report,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfill {backfill.name} done, '
+            f'{progress.rows_updated} rows updated.'))
+
+    def report(self, progress, rate):
+        done = min(progress.next_id - 1, progress.last_id)
+        remaining = progress.last_id - done
+        eta = f'{remaining / rate:.0f}s' if rate else '?'
+        self.stdout.write(
+            f'{progress.name}: ids up to {done}/{progress.last_id}, '
+            f'{progress.rows_updated} rows updated, {rate:.0f} ids/s, '
+            f'eta {eta}')
@@ -0,0 +1,293 @@
+"""
+Django command to benchmark the async entry views against the sync
+views under database latency.
+"""
+import asyncio
+import logging
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from django.urls import include, path, reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.management.commands.benchmark_search import percentile
+from core.models import Entry
+from entry.urls import async_urlpatterns
+
+
+class AsyncUrlconf:
+    """
+    URLconf serving the entry APIs with the async views.
+    """
+    urlpatterns = [
+        path('api/entry/', include((async_urlpatterns, 'entry'))),
+    ]
+
+
+class QueryDelay:
+    """
+    Execute wrapper delaying every query, standing in
+    for a slow or distant database.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    def install(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+class Command(BaseCommand):
+    """
+    Django command to send concurrent requests to an api path with
+    every query delayed, through the wsgi handler with a fixed number
+    of threads like a gthread worker, and through the asgi handler
+    like a uvicorn worker with the sync and with the async views.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            help='Path to request, the newest entry by default.',
+        )
+        parser.add_argument(
+            '--host',
+            default='localhost',
+            help='Host header of the requests.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Number of timed requests per server.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=32,
+            help='Number of concurrent clients.',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=4,
+            help='Threads of the wsgi server.',
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=20,
+            help='Milliseconds added to every query.',
+        )
+        parser.add_argument(
+            '--cache',
+            action='store_true',
+            help='Keep the entry response cache enabled, by default '
+                 'every request reaches the database.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        user = get_user_model().objects.order_by('pk').first()
+        if user is None:
+            raise CommandError('Create a user first, for example with '
+                               'create_test_entries.')
+        token, created = Token.objects.get_or_create(user=user)
+        if not options['path']:
+            entry = Entry.objects.filter(
+                is_expired=False).order_by('-created_at', '-id').first()
+            if entry is None:
+                raise CommandError('Create an entry first.')
+            options['path'] = reverse('entry:entry-detail', args=[entry.pk])
+
+        self.stdout.write(
+            f'{options["requests"]} requests to {options["path"]} from '
+            f'{options["concurrency"]} clients, {options["latency"]:g} ms '
+            f'per query (ms).')
+        self.stdout.write(f'{"server":<20}{"req/s":>10}{"p50":>10}'
+                          f'{"p95":>10}{"p99":>10}')
+
+        cache = {}
+        if not options['cache']:
+            cache = {'ENTRY_RESPONSE_CACHE': {'ALIAS': 'default',
+                                              'TIMEOUT': 0}}
+        delay = QueryDelay(options['latency'] / 1000)
+        connection_created.connect(delay.install)
+        settings_dict = connections['default'].settings_dict
+        conn_max_age = settings_dict['CONN_MAX_AGE']
+        # every request is slow with the added latency
+        logger = logging.getLogger('core.performance')
+        level = logger.level
+        logger.setLevel(logging.ERROR)
+        try:
+            with override_settings(**cache):
+                self.report(f'wsgi {options["threads"]} threads',
+                            *self.run_wsgi(token, options))
+                # asgi requests run in threads of their own, which
+                # close their connections when done
+                settings_dict['CONN_MAX_AGE'] = 0
+                self.report('asgi sync views', *self.run_asgi(
+                    token, options))
+                with override_settings(ROOT_URLCONF=AsyncUrlconf):
+                    self.report('asgi async views', *self.run_asgi(
+                        token, options))
+        finally:
+            settings_dict['CONN_MAX_AGE'] = conn_max_age
+            connection_created.disconnect(delay.install)
+            logger.setLevel(level)
+
+    def run_wsgi(self, token, options):
+        """
+        Return the durations in milliseconds and the total seconds of
+        the requests, served by a pool of threads.
+        """
+        handler = WSGIHandler()
+        url, query = options['path'].partition('?')[::2]
+        environ = {
+            'PATH_INFO': url,
+            'QUERY_STRING': query,
+            'HTTP_HOST': options['host'],
+            'HTTP_AUTHORIZATION': f'Token {token.key}',
+        }
+        setup_testing_defaults(environ)
+
+        def get():
+            status = []
+            response = handler(dict(environ),
+                               lambda *args: status.append(args[0]))
+            b''.join(response)
+            response.close()
+            return int(status[0].split()[0])
+
+        threads = options['threads']
+        with ThreadPoolExecutor(threads) as server:
+            def send():
+                return server.submit(get).result()
+
+            timings = self.run_clients(send, options)
+
+            # every server thread closes its connections
+            barrier = threading.Barrier(threads)
+
+            def close():
+                barrier.wait()
+                connections.close_all()
+
+            for future in [server.submit(close) for _ in range(threads)]:
+                future.result()
+
+        return timings
+
+    def run_asgi(self, token, options):
+        """
+        Return the durations in milliseconds and the total seconds
+        of the requests, served concurrently on an event loop.
+        """
+        application = get_asgi_application()
+        url, query = options['path'].partition('?')[::2]
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': url,
+            'query_string': query.encode(),
+            'headers': [
+                (b'host', options['host'].encode()),
+                (b'authorization', f'Token {token.key}'.encode()),
+            ],
+        }
+
+        async def get():
+            messages = []
+            body_sent = False
+
+            async def receive():
+                nonlocal body_sent
+                if body_sent:
+                    # the request is not disconnected before it is answered
+                    await asyncio.Event().wait()
+                body_sent = True
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                messages.append(message)
+
+            await application(dict(scope), receive, send)
+            return messages[0]['status']
+
+        async def send():
+            return await get()
+
+        return asyncio.run(self.arun_clients(send, options))
+
+    def run_clients(self, send, options):
+        """
+        Send the requests from client threads, after a warm up request.
+        """
+        self.check_status(options['path'], send())
+        timings = []
+
+        def client(count):
+            for _ in range(count):
+                started = time.perf_counter()
+                self.check_status(options['path'], send())
+                timings.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as clients:
+            list(clients.map(client, self.split(options)))
+        return timings, time.perf_counter() - started
+
+    async def arun_clients(self, send, options):
+        """
+        Send the requests from client tasks, after a warm up request.
+        """
+        self.check_status(options['path'], await send())
+        timings = []
+
+        async def client(count):
+            for _ in range(count):
+                started = time.perf_counter()
+                self.check_status(options['path'], await send())
+                timings.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*map(client, self.split(options)))
+        return timings, time.perf_counter() - started
+
+    def split(self, options):
+        """
+        Return the number of requests of every client.
+        """
+        clients = options['concurrency']
+        count, extra = divmod(options['requests'], clients)
+        return [count + (client < extra) for client in range(clients)]
+
+    def check_status(self, path, status):
+        if status != 200:
+            raise CommandError(f'{path} answered {status}.')
+
+    def report(self, server, timings, seconds):
+        self.stdout.write(
+            f'{server:<20}{len(timings) / seconds:>10.1f}'
+            f'{statistics.median(timings):>10.2f}'
+            f'{percentile(timings, 0.95):>10.2f}'
+            f'{percentile(timings, 0.99):>10.2f}')
@@ -0,0 +1,124 @@
+"""
+Django command to benchmark rendering and parsing entry pages.
+"""
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.management.commands.benchmark_search import percentile
+from core.models import Entry
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer, orjson
+from entry.serializers import EntrySerializer
+
+
+class Command(BaseCommand):
+    """
+    Django command to time serializing, rendering and parsing pages
+    of the newest entries, rendered and parsed by the rest framework
+    json classes and by the orjson ones.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'sizes',
+            nargs='*',
+            type=int,
+            default=[30, 100, 1000],
+            help='Page sizes to time.',
+        )
+        parser.add_argument(
+            '--host',
+            default='localhost',
+            help='Host of the image urls.',
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=50,
+            help='Number of timed runs per step.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if orjson is None:
+            raise CommandError('orjson is not installed.')
+
+        request = Request(APIRequestFactory().get(
+            '/api/entry/entries/', HTTP_HOST=options['host']))
+        entries = Entry.objects.filter(is_expired=False).select_related(
+            'category').prefetch_related('images').order_by('-created_at')
+
+        self.stdout.write(f'Timing entry pages, {options["runs"]} runs '
+                          f'each (ms).')
+        self.stdout.write(f'{"step":<30}{"p50":>10}{"p95":>10}'
+                          f'{"speedup":>10}')
+        for size in options['sizes']:
+            page = list(entries[:size])
+            if not page:
+                raise CommandError('Create entries first, for example '
+                                   'with create_test_entries.')
+
+            def serialize():
+                return EntrySerializer(
+                    page, many=True, context={'request': request}).data
+
+            data = {
+                'count': len(page),
+                'next': request.build_absolute_uri('?page=2'),
+                'previous': None,
+                'results': serialize(),
+            }
+            rendered = self.compare(
+                f'{len(page)} entries render',
+                lambda: JSONRenderer().render(data),
+                lambda: ORJSONRenderer().render(data),
+                options['runs'])
+            self.compare(
+                f'{len(page)} entries parse',
+                lambda: JSONParser().parse(io.BytesIO(rendered)),
+                lambda: ORJSONParser().parse(io.BytesIO(rendered)),
+                options['runs'])
+            self.report(f'{len(page)} entries serialize',
+                        self.time(serialize, options['runs']))
+
+    def compare(self, name, stock, fast, runs):
+        """
+        Time the stock and the fast run, which must agree, and return
+        the result.
+        """
+        result = stock()
+        if fast() != result:
+            raise CommandError(f'{name} differs from the stock output.')
+
+        stock_timings = self.time(stock, runs)
+        fast_timings = self.time(fast, runs)
+        self.report(f'{name} stock', stock_timings)
+        self.report(f'{name} orjson', fast_timings,
+                    percentile(stock_timings, 0.5)
+                    / percentile(fast_timings, 0.5))
+        return result
+
+    def time(self, run, runs):
+        """
+        Return the durations of runs in milliseconds, after a warm up.
+        """
+        run()
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def report(self, name, timings, speedup=None):
+        speedup = '' if speedup is None else f'{speedup:.1f}x'
+        self.stdout.write(
+            f'{name:<30}{percentile(timings, 0.5):>10.2f}'
+            f'{percentile(timings, 0.95):>10.2f}{speedup:>10}')
@@ -0,0 +1,134 @@
+"""
+Django command to benchmark requests per second against the api.
+"""
+import statistics
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.management.commands.benchmark_search import percentile
+from core.models import Entry
+
+
+class Command(BaseCommand):
+    """
+    Django command to time requests to an api path through the
+    wsgi handler for every connection max age, showing what reusing
+    database connections saves per request.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            help='Path to request, the newest entry by default.',
+        )
+        parser.add_argument(
+            '--host',
+            default='localhost',
+            help='Host header of the requests.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Number of timed requests per setting.',
+        )
+        parser.add_argument(
+            '--conn-max-age',
+            type=int,
+            nargs='+',
+            default=[0, 60],
+            help='Connection max ages to compare.',
+        )
+        parser.add_argument(
+            '--cache',
+            action='store_true',
+            help='Keep the entry response cache enabled, by default '
+                 'every request reaches the database.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        user = get_user_model().objects.order_by('pk').first()
+        if user is None:
+            raise CommandError('Create a user first, for example with '
+                               'create_test_entries.')
+        token, created = Token.objects.get_or_create(user=user)
+        if not options['path']:
+            entry = Entry.objects.filter(
+                is_expired=False).order_by('-created_at', '-id').first()
+            if entry is None:
+                raise CommandError('Create an entry first.')
+            options['path'] = reverse('entry:entry-detail', args=[entry.pk])
+
+        self.stdout.write(f'{options["requests"]} requests to '
+                          f'{options["path"]} (ms).')
+        self.stdout.write(f'{"conn max age":<16}{"req/s":>10}{"p50":>10}'
+                          f'{"p95":>10}{"max":>10}')
+
+        cache = {}
+        if not options['cache']:
+            cache = {'ENTRY_RESPONSE_CACHE': {'ALIAS': 'default',
+                                              'TIMEOUT': 0}}
+        settings_dict = connections['default'].settings_dict
+        conn_max_age = settings_dict['CONN_MAX_AGE']
+        try:
+            with override_settings(**cache):
+                for max_age in options['conn_max_age']:
+                    settings_dict['CONN_MAX_AGE'] = max_age
+                    connections['default'].close()
+                    self.report(max_age, self.time(
+                        token, options['host'], options['path'],
+                        options['requests']))
+        finally:
+            settings_dict['CONN_MAX_AGE'] = conn_max_age
+
+    def time(self, token, host, path, requests):
+        """
+        Return the durations of requests in milliseconds,
+        after a warm up request.
+        """
+        # requests go through the wsgi handler like in a server, its
+        # request signals close connections older than CONN_MAX_AGE
+        handler = WSGIHandler()
+        path, query = path.partition('?')[::2]
+        environ = {
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'HTTP_HOST': host,
+            'HTTP_AUTHORIZATION': f'Token {token.key}',
+        }
+        setup_testing_defaults(environ)
+
+        def get():
+            status = []
+            response = handler(dict(environ),
+                               lambda *args: status.append(args[0]))
+            b''.join(response)
+            response.close()
+            return status[0]
+
+        status = get()
+        if not status.startswith('200'):
+            raise CommandError(f'{path} answered {status}.')
+
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            get()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def report(self, max_age, timings):
+        rps = len(timings) / (sum(timings) / 1000)
+        self.stdout.write(
+            f'{max_age:<16}{rps:>10.1f}{statistics.median(timings):>10.2f}'
+            f'{percentile(timings, 0.95):>10.2f}{max(timings):>10.2f}')
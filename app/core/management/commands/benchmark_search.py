@@ -0,0 +1,145 @@
+"""
+Django command to benchmark entry search latency.
+"""
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from core.models import Category, Entry
+from entry.filters import search_entries
+
+WORDS = [
+    'bicycle', 'sofa', 'table', 'lamp', 'phone', 'laptop', 'camera',
+    'jacket', 'shoes', 'watch', 'guitar', 'desk', 'chair', 'bed',
+    'carpet', 'mirror', 'oven', 'fridge', 'heater', 'stroller',
+    'red', 'blue', 'black', 'white', 'green', 'old', 'new', 'used',
+    'cheap', 'vintage', 'wooden', 'leather', 'small', 'large', 'clean',
+]
+
+POPULATE_ENTRIES = """
+INSERT INTO core_entry (
+    user_id, category_id, title, description, price, phone_number,
+    created_at, edited_at, expires_at, is_expired
+)
+SELECT
+    %(user_id)s,
+    %(category_id)s,
+    w[1 + (n * 7) %% cardinality(w)] || ' ' ||
+        w[1 + (n * 13) %% cardinality(w)] || ' ' ||
+        w[1 + (n * 31) %% cardinality(w)],
+    w[1 + (n * 17) %% cardinality(w)] || ' ' ||
+        w[1 + (n * 19) %% cardinality(w)] || ' in good condition, ' ||
+        w[1 + (n * 23) %% cardinality(w)] || ' ' ||
+        w[1 + (n * 29) %% cardinality(w)] || ' included',
+    (n %% 100000) + 0.99,
+    '+900000000000',
+    now() - (n %% 86400) * interval '1 minute',
+    now(),
+    NULL,
+    false
+FROM generate_series(1, %(count)s) AS n,
+     (SELECT %(words)s::text[] AS w) AS words
+"""
+
+
+def percentile(timings, fraction):
+    """
+    Return the value below which the fraction of timings falls.
+    """
+    timings = sorted(timings)
+    index = min(len(timings) - 1, round(fraction * (len(timings) - 1)))
+    return timings[index]
+
+
+class Command(BaseCommand):
+    """
+    Django command to time full text search against the
+    ILIKE scan it replaces, on the first page of results.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'terms',
+            nargs='*',
+            default=['bicycle', 'red sofa', 'vintage leather jacket'],
+            help='Search terms to time.',
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=20,
+            help='Number of timed runs per query.',
+        )
+        parser.add_argument(
+            '--populate',
+            type=int,
+            default=0,
+            help='Insert this many synthetic entries first.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['populate']:
+            self.populate(options['populate'])
+
+        total = Entry.objects.count()
+        self.stdout.write(f'Timing searches over {total} entries, '
+                          f'{options["runs"]} runs each (ms).')
+        self.stdout.write(
+            f'{"query":<40}{"p50":>10}{"p95":>10}{"max":>10}')
+
+        entries = Entry.objects.filter(is_expired=False)
+        for term in options['terms']:
+            ilike = entries.filter(
+                Q(title__icontains=term) | Q(description__icontains=term)
+            ).order_by('-created_at')
+            searched = search_entries(entries, term)
+            runs = {
+                f'search "{term}" page': lambda: list(searched[:30]),
+                f'search "{term}" count': searched.count,
+                f'ilike "{term}" page': lambda: list(ilike[:30]),
+            }
+            for name, run in runs.items():
+                self.report(name, self.time(run, options['runs']))
+
+    def time(self, run, runs):
+        """
+        Return the durations of runs in milliseconds, after a warm up.
+        """
+        run()
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def report(self, name, timings):
+        self.stdout.write(
+            f'{name:<40}{statistics.median(timings):>10.2f}'
+            f'{percentile(timings, 0.95):>10.2f}{max(timings):>10.2f}')
+
+    def populate(self, count):
+        """
+        Insert synthetic entries with one INSERT ... SELECT.
+        """
+        self.stdout.write(f'Inserting {count} entries...')
+        user, created = get_user_model().objects.get_or_create(
+            email='benchmark@example.com')
+        category, created = Category.objects.get_or_create(
+            name='Benchmark')
+        started = time.perf_counter()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(POPULATE_ENTRIES, {
+                'user_id': user.pk,
+                'category_id': category.pk,
+                'count': count,
+                'words': WORDS,
+            })
+            cursor.execute('ANALYZE core_entry')
+        self.stdout.write(
+            f'Inserted in {time.perf_counter() - started:.1f} seconds.')
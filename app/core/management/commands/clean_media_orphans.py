@@ -0,0 +1,185 @@
+"""
+Django command to remove entry image files no row references.
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from core.models import EntryImage, ImageBlob
+from entry.images import FORMATS, variant_path
+
+UPLOADS_DIR = os.path.join('uploads', 'entry')
+
+
+def scan_directory(path):
+    """
+    Return the files of a directory as (path, mtime, size)
+    tuples, and its subdirectories.
+    """
+    files, directories = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                directories.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                files.append((entry.path, stat.st_mtime, stat.st_size))
+
+    return files, directories
+
+
+def walk_files(executor, root):
+    """
+    Yield the files under root, scanning directories in parallel.
+    """
+    pending = {executor.submit(scan_directory, root)}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            files, directories = future.result()
+            yield from files
+            pending.update(executor.submit(scan_directory, directory)
+                           for directory in directories)
+
+
+def variant_image(name):
+    """
+    Return the name of the image a variant file was made from,
+    without the image's extension, None for other files.
+    """
+    directory, filename = os.path.split(name)
+    stem, extension = os.path.splitext(filename)
+    if os.path.basename(directory) != 'variants' or extension not in {
+            f'.{ext}' for _, ext in FORMATS.values()}:
+        return None
+
+    for variant in settings.ENTRY_IMAGE_VARIANTS:
+        if stem.endswith(f'-{variant}'):
+            return os.path.join(os.path.dirname(directory),
+                                stem[:-len(variant) - 1])
+    return None
+
+
+def referenced_names(names):
+    """
+    Return the names of a batch of file names which an entry image
+    or image blob references, as its image or as one of its variants.
+    """
+    images = {variant_image(name) for name in names} - {None}
+    lookup = models.Q(image__in=[*names, *images])
+    for image in images:
+        lookup |= models.Q(image__startswith=f'{image}.')
+    stored = EntryImage.objects.filter(lookup).values_list(
+        'image', flat=True).union(ImageBlob.objects.filter(
+            lookup).values_list('image', flat=True))
+
+    referenced = set()
+    for name in stored:
+        referenced.add(name)
+        for variant in settings.ENTRY_IMAGE_VARIANTS:
+            for image_format in FORMATS:
+                referenced.add(variant_path(name, variant, image_format))
+
+    return referenced.intersection(names)
+
+
+def batches(items, size):
+    """
+    Yield lists of at most size items.
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class Command(BaseCommand):
+    """
+    Django command to delete files under MEDIA_ROOT/uploads/entry
+    that no entry image or image blob references.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report orphaned files without deleting them.',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=3600,
+            help='Keep files modified less than this many seconds ago, '
+                 'they may belong to uploads in progress.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Number of threads scanning and deleting files.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of files checked against the database at once.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        root = os.path.join(settings.MEDIA_ROOT, UPLOADS_DIR)
+        if not os.path.isdir(root):
+            self.stdout.write(f'{root} does not exist.')
+            return
+
+        # files younger than min_age may belong to uploads whose
+        # rows are not written yet
+        cutoff = time.time() - options['min_age']
+        count, size = 0, 0
+        with ThreadPoolExecutor(options['workers']) as executor:
+            files = ((os.path.relpath(path, settings.MEDIA_ROOT), path,
+                      file_size)
+                     for path, mtime, file_size in walk_files(executor, root)
+                     if mtime < cutoff)
+            for batch in batches(files, options['batch_size']):
+                orphans = self.orphans(batch)
+                count += len(orphans)
+                size += sum(file_size for path, file_size in orphans)
+                if options['dry_run']:
+                    for path, file_size in orphans:
+                        self.stdout.write(path)
+                else:
+                    list(executor.map(
+                        remove_file, [path for path, file_size in orphans]))
+
+        if options['dry_run']:
+            self.stdout.write(
+                f'Would delete {count} orphaned files ({size} bytes).')
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {count} orphaned files ({size} bytes).'))
+
+    def orphans(self, batch):
+        """
+        Return the (path, size) pairs of the unreferenced files of
+        a batch of (name, path, size) tuples.
+        """
+        referenced = referenced_names([name for name, _, _ in batch])
+        return [(path, file_size) for name, path, file_size in batch
+                if name not in referenced]
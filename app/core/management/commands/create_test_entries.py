@@ -1,35 +1,347 @@
-from django.core.management.base import BaseCommand, CommandError
-from core.models import Entry, Category
+"""
+Django command to generate synthetic users, entries and images.
+"""
+import hashlib
+import io
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+
+from PIL import Image
+
 from django.contrib.auth import get_user_model
-from decimal import Decimal
-from django.db import IntegrityError
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.models import Category, EntryFacet, ImageBlob, Plan
+from entry.cache import bump_entries_generation
+
+# items, median price and placeholder colour per category,
+# categories are listed from most to least popular
+CATEGORIES = {
+    'Home & Garden': (['sofa', 'table', 'chair', 'bed', 'lamp', 'carpet',
+                       'fridge', 'oven', 'mirror', 'desk'], 150, '#8d6e63'),
+    'Electronics': (['laptop', 'phone', 'tablet', 'camera', 'monitor',
+                     'console', 'headphones', 'printer'], 400, '#455a64'),
+    'Fashion': (['jacket', 'shoes', 'watch', 'bag', 'dress', 'coat',
+                 'sunglasses'], 60, '#ad1457'),
+    'Vehicles': (['sedan', 'hatchback', 'motorcycle', 'pickup', 'scooter',
+                  'bicycle', 'van'], 8000, '#1565c0'),
+    'Hobbies': (['guitar', 'piano', 'tent', 'skateboard', 'books', 'drone',
+                 'telescope'], 120, '#2e7d32'),
+    'Real Estate': (['apartment', 'villa', 'studio', 'office', 'shop',
+                     'land'], 150000, '#6a1b9a'),
+    'Services': (['plumbing', 'tutoring', 'moving', 'cleaning', 'repair',
+                  'design'], 50, '#ef6c00'),
+    'Pets': (['puppy', 'kitten', 'aquarium', 'cage', 'parrot'], 80,
+             '#00838f'),
+}
+
+ADJECTIVES = ['used', 'new', 'vintage', 'cheap', 'clean', 'large', 'small',
+              'wooden', 'leather', 'red', 'black', 'white', 'modern',
+              'classic', 'compact', 'spacious', 'original', 'rare']
+
+CONDITIONS = ['in good condition', 'like new', 'barely used',
+              'needs minor repair', 'well maintained', 'with warranty']
+
+# largest price the entry price column holds
+MAX_PRICE = 99999999.99
+
+
+def placeholder_image(color):
+    """
+    Return the bytes of a small single colour JPEG.
+    """
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def copy_rows(cursor, table, columns, rows):
+    """
+    Load rows of tab separated values into a table with COPY.
+    """
+    data = io.StringIO(''.join(
+        '\t'.join(values) + '\n' for values in rows))
+    cursor.copy_expert(
+        f'COPY {table} ({", ".join(columns)}) FROM STDIN', data)
+
+
+def reserve_ids(cursor, table, count):
+    """
+    Return count new primary keys from the sequence of a table.
+    """
+    cursor.execute(
+        'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+        'FROM generate_series(1, %s)', [table, 'id', count])
+    return [row[0] for row in cursor.fetchall()]
+
+
+class EntryBatchLoader:
+    """
+    Generates batches of entries and images and loads them with COPY.
+
+    Every batch draws from its own random generator, so batches
+    loaded by parallel workers give the same data as sequential ones.
+    """
+
+    def __init__(self, users, categories, seed, days, max_images):
+        self.users = users
+        # a few users post most entries
+        self.user_weights = [1 / (n + 1) ** 0.8 for n in range(len(users))]
+        self.categories = categories
+        self.category_weights = [
+            category['weight'] for category in categories]
+        self.seed = seed
+        self.days = days
+        self.max_images = max_images
+        self.now = timezone.now()
+
+    def load(self, batch, count):
+        """
+        Load a batch of count entries in one transaction.
+        """
+        rand = random.Random(self.seed * 1000003 + batch)
+        batch_users = rand.choices(self.users, self.user_weights, k=count)
+        batch_categories = rand.choices(
+            self.categories, self.category_weights, k=count)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            ids = reserve_ids(cursor, 'core_entry', count)
+            entries = [
+                self.entry_row(rand, pk, user, category)
+                for pk, user, category in zip(
+                    ids, batch_users, batch_categories)
+            ]
+            copy_rows(cursor, 'core_entry', [
+                'id', 'user_id', 'category_id', 'title', 'description',
+                'price', 'phone_number', 'created_at', 'edited_at',
+                'expires_at', 'is_expired',
+            ], entries)
+            if self.max_images:
+                copy_rows(cursor, 'core_entryimage', [
+                    'entry_id', 'blob_id', 'image', 'uploaded_at',
+                    'variants',
+                ], self.image_rows(rand, entries, batch_categories))
+
+        return count
+
+    def entry_row(self, rand, pk, user, category):
+        """
+        Return the COPY values of a random entry.
+        """
+        user_id, days_to_expire = user
+        item = rand.choice(category['items'])
+        adjective = rand.choice(ADJECTIVES)
+        price = rand.lognormvariate(category['mu'], 0.9)
+        # most sellers pick round prices
+        if rand.random() < 0.7:
+            price = round(price, -1)
+        price = min(MAX_PRICE, max(1.0, price))
+        # recent entries are more frequent
+        age = timedelta(days=self.days * rand.random() ** 2)
+        created_at = self.now - age
+        expires_at = created_at + timedelta(days=days_to_expire)
+
+        return (
+            str(pk),
+            str(user_id),
+            str(category['category_id']),
+            f'{adjective} {item}',
+            f'{adjective.capitalize()} {item} {rand.choice(CONDITIONS)}, '
+            f'{rand.choice(ADJECTIVES)} and {rand.choice(ADJECTIVES)}.',
+            f'{price:.2f}',
+            f'+98{rand.randrange(9000000000, 9999999999)}',
+            created_at.isoformat(),
+            (created_at + timedelta(hours=rand.random() * 48)).isoformat(),
+            expires_at.isoformat(),
+            't' if expires_at <= self.now else 'f',
+        )
+
+    def image_rows(self, rand, entries, categories):
+        """
+        Yield the COPY values of placeholder images of entries.
+        """
+        for entry, category in zip(entries, categories):
+            blob_id, name = category['blob']
+            for _ in range(rand.randint(0, self.max_images)):
+                yield (entry[0], str(blob_id), name, entry[7], '{}')
+
+
+_loader = None
+
+
+def init_worker(loader):
+    """
+    Set up a worker process with its own database connection.
+    """
+    global _loader
+    _loader = loader
+    connections.close_all()
+
+
+def load_batch(batch, count):
+    return _loader.load(batch, count)
 
 
 class Command(BaseCommand):
     """
-    Command to create 200 test entries for testing pagination.
+    Command to generate users spread over the plans, entries with
+    realistic category, price and date distributions, and
+    placeholder images, for load and scale testing.
+
+    Entries and images are loaded with COPY in batches, each in its
+    own transaction, optionally in parallel processes. Counters,
+    facets and blob refcounts are recomputed at the end, since COPY
+    bypasses the models.
     """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1,
+            help='Number of users to create.')
+        parser.add_argument(
+            '--entries', type=int, default=200,
+            help='Number of entries to create.')
+        parser.add_argument(
+            '--max-images', type=int, default=0,
+            help='Most placeholder images per entry.')
+        parser.add_argument(
+            '--days', type=int, default=90,
+            help='Entries are created over this many past days.')
+        parser.add_argument(
+            '--batch-size', type=int, default=50000,
+            help='Rows loaded per COPY.')
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Random seed for reproducible data.')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Number of processes loading batches in parallel.')
+
     def handle(self, *args, **options):
-        user = get_user_model().objects.create_user(
-            'test@example.com',
-            'testpass123'
-        )
-        try:
-            for i in range(1, 201):
-                category, created = Category.objects.get_or_create(name='Misc')
-                phone_number = 1111111111
-                Entry.objects.create(
-                    user=user,
-                    title=f'test title {i}',
-                    description=f'test description {i}',
-                    price=Decimal(f'{i}.00'),
-                    phone_number=f'+90{phone_number+i}',
-                    category=category,
-
-                )
-        except IntegrityError:
-            raise CommandError("An error occured")
+        """Entrypoint for command."""
+        if options['users'] < 1:
+            raise CommandError('Create at least one user.')
+        if options['entries'] < 0 or options['batch_size'] < 1:
+            raise CommandError('Entries and batch size must be positive.')
+
+        self.random = random.Random(options['seed'])
+        started = time.perf_counter()
+
+        categories = self.create_categories(options['max_images'])
+        users = self.create_users(options['users'], options['batch_size'])
+        self.create_entries(users, categories, options)
+
+        self.stdout.write('Recounting counters and facets...')
+        get_user_model().objects.reconcile_entry_counts()
+        EntryFacet.objects.rebuild()
+        ImageBlob.objects.reconcile_refcounts()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_entry')
+            cursor.execute('ANALYZE core_entryimage')
+        bump_entries_generation()
 
         self.stdout.write(self.style.SUCCESS(
-            'Operation successful.'
-        ))
+            f'Created {options["users"]} users and {options["entries"]} '
+            f'entries in {time.perf_counter() - started:.1f} seconds.'))
+
+    def create_categories(self, max_images):
+        """
+        Return the categories with their items, price median,
+        placeholder blob and popularity weight.
+        """
+        categories = []
+        for rank, (name, (items, median, color)) in enumerate(
+                CATEGORIES.items(), start=1):
+            category, created = Category.objects.get_or_create(name=name)
+            blob = None
+            if max_images:
+                content = placeholder_image(color)
+                blob = ImageBlob.objects.acquire(
+                    hashlib.sha256(content).hexdigest(), '.jpg',
+                    ContentFile(content))
+            categories.append({
+                'category_id': category.pk,
+                'items': items,
+                'mu': math.log(median),
+                'blob': (blob.pk, blob.image.name) if blob else None,
+                # zipf like popularity
+                'weight': 1 / rank,
+            })
+
+        return categories
+
+    def create_users(self, count, batch_size):
+        """
+        Create users spread over the plans, returning their
+        ids and days to expire.
+        """
+        plans = list(Plan.objects.all()) or [
+            Plan.objects.create(name='Basic')]
+        # users get numbers past the largest user id, keeping
+        # emails and phone numbers of repeated runs unique
+        offset = get_user_model().objects.aggregate(
+            last=Max('pk'))['last'] or 0
+        password = make_password('testpass123')
+
+        self.stdout.write(f'Creating {count} users...')
+        users = [
+            get_user_model()(
+                email=f'test{offset + n}@example.com',
+                password=password,
+                first_name='test',
+                last_name=f'user {offset + n}',
+                phone_number=f'+99{offset + n:010d}',
+                date_of_birth=date(1970, 1, 1) + timedelta(
+                    days=self.random.randrange(365 * 35)),
+                plan=plans[n % len(plans)],
+            )
+            for n in range(1, count + 1)
+        ]
+        users = get_user_model().objects.bulk_create(
+            users, batch_size=batch_size)
+
+        return [(user.pk, user.plan.days_to_expire) for user in users]
+
+    def create_entries(self, users, categories, options):
+        """
+        Load entries and their images with COPY in batches,
+        in parallel worker processes with --workers.
+        """
+        total, batch_size = options['entries'], options['batch_size']
+        seed = options['seed']
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        loader = EntryBatchLoader(users, categories, seed,
+                                  options['days'], options['max_images'])
+        batches = [(batch, min(batch_size, total - start))
+                   for batch, start in enumerate(range(0, total, batch_size))]
+
+        if options['workers'] > 1:
+            # workers must not share the connection of this process
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                options['workers'], initializer=init_worker,
+                initargs=(loader,))
+            futures = [executor.submit(load_batch, *batch)
+                       for batch in batches]
+            results = (future.result() for future in as_completed(futures))
+        else:
+            executor = None
+            results = (loader.load(*batch) for batch in batches)
+
+        created = 0
+        try:
+            for count in results:
+                created += count
+                self.stdout.write(f'Created {created}/{total} entries.')
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
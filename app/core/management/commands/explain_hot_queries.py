@@ -0,0 +1,75 @@
+"""
+Django command to print query plans of the hot queries.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from django.utils import timezone
+
+from core.models import Category, Entry
+
+
+def hot_queries():
+    """
+    Return the hot querysets by name.
+    """
+    user = get_user_model().objects.order_by('pk').first()
+    user_id = user.pk if user else 0
+    category = Category.objects.order_by('pk').first()
+    category_id = category.pk if category else 0
+
+    return {
+        'entry-feed': Entry.objects.filter(
+            is_expired=False).order_by('-created_at', '-id')[:30],
+        'category-feed': Entry.objects.filter(
+            is_expired=False,
+            category_id=category_id).order_by('-created_at', '-id')[:30],
+        'price-range-feed': Entry.objects.filter(
+            is_expired=False,
+            price__gte=100, price__lte=500).order_by('-created_at')[:30],
+        'user-entries': Entry.objects.filter(
+            user_id=user_id).order_by('-created_at')[:30],
+        'expiry-scan': Entry.objects.filter(
+            is_expired=False,
+            expires_at__lte=timezone.now()).order_by('pk')[:1000],
+        'phone-number-lookup': get_user_model().objects.filter(
+            phone_number='+900000000000'),
+    }
+
+
+class Command(BaseCommand):
+    """
+    Django command to print EXPLAIN output of the hot queries,
+    used to confirm they are served by indexes.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Run the queries and report actual timings.',
+        )
+        parser.add_argument(
+            'names',
+            nargs='*',
+            help='Only explain the queries with these names.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        queries = hot_queries()
+        names = options['names'] or list(queries)
+        unknown = set(names) - set(queries)
+        if unknown:
+            raise CommandError(
+                f'Unknown queries: {", ".join(sorted(unknown))}. '
+                f'Choose from: {", ".join(queries)}.')
+
+        for name in names:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name}:'))
+            try:
+                plan = queries[name].explain(analyze=options['analyze'])
+            except DatabaseError as error:
+                raise CommandError(f'Explaining {name} failed: {error}')
+            self.stdout.write(plan)
+            self.stdout.write('')
@@ -0,0 +1,265 @@
+"""
+Django command to load test the entry API under server configurations.
+"""
+import http.client
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.management.commands.benchmark_search import percentile
+from core.models import Category, Entry, Plan
+
+LOADTEST_EMAIL = 'loadtest@example.com'
+
+
+def parse_config(value):
+    """
+    Return the environment of a mode:workers[:threads] configuration.
+    """
+    mode, _, rest = value.partition(':')
+    workers, _, threads = rest.partition(':')
+    if mode not in ('sync', 'gthread', 'uvicorn') or not workers.isdigit() \
+            or (threads and not threads.isdigit()):
+        raise CommandError(f'Invalid configuration {value}, expected '
+                           f'sync|gthread|uvicorn:workers[:threads].')
+    return {
+        'GUNICORN_WORKER_MODE': mode,
+        'WEB_CONCURRENCY': workers,
+        'GUNICORN_THREADS': threads or '1',
+    }
+
+
+class Worker(threading.Thread):
+    """
+    A client sending scenario requests over one keep-alive
+    connection until the deadline.
+    """
+
+    def __init__(self, host, port, request, deadline):
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.request = request
+        self.deadline = deadline
+        self.timings = []
+        self.errors = 0
+
+    def run(self):
+        connection = http.client.HTTPConnection(
+            self.host, self.port, timeout=30)
+        while time.perf_counter() < self.deadline:
+            method, path, body, headers = self.request()
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                status = None
+            duration = time.perf_counter() - started
+            if status is not None and status < 400:
+                self.timings.append(duration * 1000)
+            else:
+                self.errors += 1
+        connection.close()
+
+
+class Command(BaseCommand):
+    """
+    Django command to run the entry list and entry create scenarios
+    against gunicorn under each given worker configuration, or
+    against a running server with --url, reporting throughput and
+    latency to size containers with.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--config',
+            action='append',
+            help='Worker configuration as mode:workers[:threads], '
+                 'repeatable. Defaults to sync:2, gthread:2:4 and '
+                 'uvicorn:2.',
+        )
+        parser.add_argument(
+            '--url',
+            help='Load test a running server instead of starting one.',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=['list', 'create'],
+            help='Scenario to run, repeatable. Defaults to both.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Number of concurrent clients.',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=10,
+            help='Seconds each scenario runs.',
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=8099,
+            help='Port of the started servers.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        scenarios = options['scenario'] or ['list', 'create']
+        token = self.loadtest_token()
+        category = Category.objects.order_by('pk').first() or \
+            Category.objects.create(name='Miscellaneous')
+
+        self.stdout.write(
+            f'{options["concurrency"]} clients, {options["duration"]:g} '
+            f's per scenario, latency in ms.')
+        self.stdout.write(
+            f'{"config":<16}{"scenario":<10}{"requests":>10}{"req/s":>10}'
+            f'{"p50":>9}{"p95":>9}{"p99":>9}{"errors":>8}')
+
+        try:
+            if options['url']:
+                url = urlsplit(options['url'])
+                self.run_scenarios('running', url.hostname,
+                                   url.port or 80, scenarios, token,
+                                   category, options)
+                return
+
+            configs = options['config'] or ['sync:2', 'gthread:2:4',
+                                            'uvicorn:2']
+            for config in configs:
+                environment = parse_config(config)
+                with self.server(environment, options['port']):
+                    self.run_scenarios(config, '127.0.0.1', options['port'],
+                                       scenarios, token, category, options)
+        finally:
+            # created entries are removed with their counters and facets
+            Entry.objects.filter(user=token.user).delete()
+
+    def loadtest_token(self):
+        """
+        Return the token of the load test user, whose plan
+        allows creating any number of entries.
+        """
+        plan, created = Plan.objects.get_or_create(
+            name='Load test', defaults={'max_entries': 10 ** 9})
+        user = get_user_model().objects.filter(email=LOADTEST_EMAIL).first()
+        if user is None:
+            user = get_user_model().objects.create_user(
+                LOADTEST_EMAIL, first_name='load', last_name='test',
+                phone_number='+980000000000', plan=plan)
+        token, created = Token.objects.get_or_create(user=user)
+        return token
+
+    @contextmanager
+    def server(self, environment, port):
+        """
+        Run gunicorn with the environment of a configuration.
+        """
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+             '--bind', f'127.0.0.1:{port}'],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, **environment},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            self.wait_until_ready(process, port)
+            yield
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(60)
+
+    def wait_until_ready(self, process, port, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError('The server exited while starting.')
+            try:
+                connection = http.client.HTTPConnection(
+                    '127.0.0.1', port, timeout=5)
+                connection.request('GET', reverse('metrics'))
+                connection.getresponse().read()
+                connection.close()
+                return
+            except OSError:
+                time.sleep(0.2)
+
+        raise CommandError('The server did not start in time.')
+
+    def run_scenarios(self, name, host, port, scenarios, token, category,
+                      options):
+        headers = {
+            'Authorization': f'Token {token.key}',
+            'Content-Type': 'application/json',
+        }
+        list_url = reverse('entry:entry-list')
+        body = json.dumps({
+            'title': 'load test entry',
+            'description': 'An entry created by the load test.',
+            'price': '100.00',
+            'phone_number': '+980000000000',
+            'category': category.name,
+        })
+        requests = {
+            'list': lambda: ('GET', list_url, None, headers),
+            'create': lambda: ('POST', list_url, body, headers),
+        }
+
+        for scenario in scenarios:
+            # warm up the workers and their connections
+            self.run_clients(host, port, requests[scenario],
+                             options['concurrency'], 1)
+            timings, errors = self.run_clients(
+                host, port, requests[scenario], options['concurrency'],
+                options['duration'])
+            self.report(name, scenario, timings, errors,
+                        options['duration'])
+
+    def run_clients(self, host, port, request, concurrency, duration):
+        deadline = time.perf_counter() + duration
+        workers = [Worker(host, port, request, deadline)
+                   for _ in range(concurrency)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        timings = [timing for worker in workers for timing in worker.timings]
+        return timings, sum(worker.errors for worker in workers)
+
+    def report(self, name, scenario, timings, errors, duration):
+        if not timings:
+            self.stdout.write(f'{name:<16}{scenario:<10}{0:>10}{0:>10.1f}'
+                              f'{"-":>9}{"-":>9}{"-":>9}{errors:>8}')
+            return
+
+        self.stdout.write(
+            f'{name:<16}{scenario:<10}{len(timings):>10}'
+            f'{len(timings) / duration:>10.1f}'
+            f'{statistics.median(timings):>9.1f}'
+            f'{percentile(timings, 0.95):>9.1f}'
+            f'{percentile(timings, 0.99):>9.1f}{errors:>8}')
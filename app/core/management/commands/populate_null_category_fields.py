@@ -1,7 +1,7 @@
-from django.core.management.base import BaseCommand, CommandError
-from core.models import Entry, Category
+from django.core.management.base import BaseCommand
 from django.core.management import call_command
-from django.db import IntegrityError, OperationalError, DatabaseError
+
+from core.backfills import backfills, run_backfill
 
 
 class Command(BaseCommand):
@@ -9,32 +9,27 @@ class Command(BaseCommand):
     Django command to populate null category field
     in existing entry objects.
     """
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of entry ids per update.',
+        )
+
     def handle(self, *args, **options):
         """
         Entrypoint for command.
         """
         call_command('wait_for_db')
-        try:
-            category_obj, created = Category.objects.get_or_create(
-                name="Miscellaneous")
-        except IntegrityError:
-            raise CommandError('Category object creation failed.')
 
         self.stdout.write(
-            'Filtering entry objects with null category field...')
-        try:
-            entries = Entry.objects.filter(category=None)
-        except (OperationalError, DatabaseError):
-            raise CommandError('Filtering entries failed.')
-
-        if entries:
-            for entry in entries:
-                entry.category = category_obj
-                entry.save()
-        else:
-            raise CommandError(
-                'No entries with null category field were found.')
+            'Populating entry objects with null category field...')
+        progress = run_backfill(backfills['entry-category'],
+                                batch_size=options['batch_size'],
+                                restart=True)
 
         self.stdout.write(self.style.SUCCESS(
-            'Operation successful.'
+            f'Operation successful, {progress.rows_updated} '
+            f'entries updated.'
         ))
@@ -0,0 +1,51 @@
+"""
+Django command to report query statistics by fingerprint.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.querystats import load_snapshots, top_fingerprints
+
+
+class Command(BaseCommand):
+    """
+    Django command to report the query fingerprints with the largest
+    total time, count, mean or p95, added up over the statistics
+    every process wrote to QUERY_STATS_DIR since it started.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sort',
+            choices=['total', 'count', 'mean', 'p95'],
+            default='total',
+            help='Order of the fingerprints.',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Number of fingerprints to report.',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Show fingerprints in full instead of shortened.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        directory = settings.QUERY_STATS['DIR']
+        if not directory:
+            raise CommandError('Set QUERY_STATS_DIR to collect statistics.')
+
+        stats = load_snapshots(directory)
+        self.stdout.write(f'{"count":>10}{"total ms":>12}{"mean ms":>10}'
+                          f'{"p95 ms":>10}{"max ms":>10}  fingerprint')
+        for key, item in top_fingerprints(stats, options['sort'],
+                                          options['limit']):
+            if not options['full'] and len(key) > 100:
+                key = key[:97] + '...'
+            self.stdout.write(
+                f'{item.count:>10}{item.total:>12.1f}{item.mean:>10.2f}'
+                f'{item.percentile(0.95):>10.2f}{item.max:>10.2f}  {key}')
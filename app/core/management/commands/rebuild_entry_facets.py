@@ -0,0 +1,20 @@
+"""
+Django command to recount the entry facets.
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import EntryFacet
+
+
+class Command(BaseCommand):
+    """
+    Django command to rebuild the entry facet counts from the
+    active entries, after changing ENTRY_PRICE_BUCKETS or to
+    fix drifted counts.
+    """
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        facets = EntryFacet.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {facets} entry facets.'))
@@ -0,0 +1,18 @@
+"""
+Django command to fix drifted active entry counters.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+    Django command to recount the active entries of users
+    whose active_entries_count drifted.
+    """
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        fixed = get_user_model().objects.reconcile_entry_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Fixed the active entry count of {fixed} users.'))
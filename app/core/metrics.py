@@ -0,0 +1,351 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Observations only update numbers held by the process. With
+METRICS_MULTIPROC_DIR set, every process also writes a snapshot of its
+metrics to that directory at most every METRICS_FLUSH_INTERVAL seconds,
+and the metrics endpoint adds up the snapshots of all processes, such
+as the workers of a gunicorn server and of Celery. The gunicorn master
+combines the snapshots of exited workers into one.
+"""
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from core import snapshots
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75,
+                   1.0, 2.5, 5.0, 7.5, 10.0)
+
+
+class CounterValue:
+    __slots__ = ('lock', 'value')
+
+    def __init__(self, lock):
+        self.lock = lock
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dump(self):
+        return self.value
+
+    def merge(self, value):
+        self.value += value
+
+
+class HistogramValue:
+    __slots__ = ('lock', 'bounds', 'counts', 'sum')
+
+    def __init__(self, lock, bounds):
+        self.lock = lock
+        self.bounds = bounds
+        # the last count is of values above every bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def dump(self):
+        return [list(self.counts), self.sum]
+
+    def merge(self, value):
+        counts, total = value
+        # snapshots written before the buckets changed
+        if len(counts) != len(self.counts):
+            return
+        for index, count in enumerate(counts):
+            self.counts[index] += count
+        self.sum += total
+
+
+class Metric:
+    """
+    A named metric with a value per combination of label values.
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(),
+                 registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        # guards the values, observations stay well under a microsecond
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+        (registry or default_registry).register(self)
+
+    def labels(self, *values):
+        """
+        Return the value of the given label values, which are
+        passed in the order of labelnames.
+        """
+        value = self._values.get(values)
+        if value is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f'{self.name} takes the labels '
+                                 f'{", ".join(self.labelnames)}.')
+            with self._lock:
+                value = self._values.setdefault(values, self.new_value())
+        return value
+
+    def new_value(self):
+        raise NotImplementedError
+
+    def dump(self):
+        with self._lock:
+            values = [[list(labels), value.dump()]
+                      for labels, value in self._values.items()]
+        return {
+            'type': self.type,
+            'documentation': self.documentation,
+            'labelnames': list(self.labelnames),
+            'values': values,
+        }
+
+    def samples(self, values):
+        """
+        Yield the (suffix, labels, value) samples of values.
+        """
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """
+    A total that only goes up.
+    """
+    type = 'counter'
+
+    def new_value(self):
+        return CounterValue(self._lock)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def samples(self, values):
+        for labels, value in values.items():
+            yield '', labels, value.value
+
+
+class Histogram(Metric):
+    """
+    Counts of observations in buckets, with their sum.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS, registry=None):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def new_value(self):
+        return HistogramValue(self._lock, self.bounds)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def samples(self, values):
+        for labels, value in values.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,),
+                                    value.counts):
+                cumulative += count
+                yield '_bucket', labels + (
+                    ('le', format_value(float(bound))),), cumulative
+            yield '_sum', labels, value.sum
+            yield '_count', labels, cumulative
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return f'{value:.1f}'
+    return str(value)
+
+
+def escape(value):
+    return str(value).replace('\\', r'\\').replace(
+        '\n', r'\n').replace('"', r'\"')
+
+
+class Registry:
+    """
+    The metrics of a process.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self._next_flush = 0
+        self._write_failed = False
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'{metric.name} is already registered.')
+        self.metrics[metric.name] = metric
+
+    def dump(self):
+        return {name: metric.dump() for name, metric in self.metrics.items()}
+
+    def flush(self):
+        """
+        Write the snapshot of this process. A failed write is logged
+        once, requests and tasks are not failed over their metrics.
+        """
+        path = snapshots.snapshot_path(settings.METRICS_MULTIPROC_DIR)
+        try:
+            snapshots.write(path, self.dump())
+        except OSError:
+            if not self._write_failed:
+                self._write_failed = True
+                logger.exception('Could not write the metrics snapshot '
+                                 'to %s.', path)
+
+    def maybe_flush(self):
+        """
+        Write the snapshot of this process when multiprocess mode
+        is on and the last one is older than the flush interval.
+        """
+        if not settings.METRICS_MULTIPROC_DIR:
+            return
+        now = time.monotonic()
+        if now >= self._next_flush:
+            self._next_flush = now + settings.METRICS_FLUSH_INTERVAL
+            self.flush()
+
+    def collect(self):
+        """
+        Return the values of this process, or of every process in
+        multiprocess mode added up, by metric name and labels.
+        """
+        if not settings.METRICS_MULTIPROC_DIR:
+            return merge_dumps(self.metrics, [self.dump()])
+
+        self.flush()
+        return merge_dumps(
+            self.metrics, snapshots.read_all(settings.METRICS_MULTIPROC_DIR))
+
+    def exposition(self):
+        """
+        Return the metrics in the Prometheus text format.
+        """
+        collected = self.collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            values = {
+                tuple(zip(metric.labelnames, labels)): value
+                for labels, value in collected.get(name, {}).items()
+            }
+            lines.append(f'# HELP {name} {escape(metric.documentation)}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for suffix, labels, value in metric.samples(values):
+                label_text = ','.join(
+                    f'{label}="{escape(label_value)}"'
+                    for label, label_value in labels)
+                if label_text:
+                    label_text = f'{{{label_text}}}'
+                lines.append(
+                    f'{name}{suffix}{label_text} {format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def merge_dumps(metrics, dumps):
+    """
+    Add up the values of dumps of the known metrics.
+    """
+    merged = {}
+    for dump in dumps:
+        for name, metric_dump in dump.items():
+            metric = metrics.get(name)
+            if metric is None or metric_dump['type'] != metric.type:
+                continue
+            values = merged.setdefault(name, {})
+            for labels, value in metric_dump['values']:
+                labels = tuple(labels)
+                if labels not in values:
+                    values[labels] = metric.new_value()
+                values[labels].merge(value)
+
+    return merged
+
+
+def combine_dumps(dumps):
+    """
+    Add up dumps into one dump, by the types they were written
+    with, to keep the metrics of exited processes in one snapshot.
+    """
+    combined = {}
+    for dump in dumps:
+        for name, metric_dump in dump.items():
+            current = combined.get(name)
+            if current is None or current['type'] != metric_dump['type']:
+                combined[name] = current = dict(metric_dump, values=[])
+            values = {tuple(labels): value
+                      for labels, value in current['values']}
+            for labels, value in metric_dump['values']:
+                labels = tuple(labels)
+                if labels in values:
+                    value = add_values(
+                        metric_dump['type'], values[labels], value)
+                values[labels] = value
+            current['values'] = [[list(labels), value]
+                                 for labels, value in values.items()]
+
+    return combined
+
+
+def add_values(type, value, other):
+    if type == 'counter':
+        return value + other
+    counts, total = value
+    other_counts, other_total = other
+    # snapshots written before the buckets changed
+    if len(counts) != len(other_counts):
+        return other
+    return [[count + other_count
+             for count, other_count in zip(counts, other_counts)],
+            total + other_total]
+
+
+default_registry = Registry()
+
+
+REQUESTS = Counter(
+    'http_requests_total', 'Requests by view, method and status.',
+    ['view', 'method', 'status'])
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Request latency by view and method.',
+    ['view', 'method'])
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Response body sizes by view.', ['view'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576))
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries per request by view.',
+    ['view'], buckets=(0, 1, 2, 5, 10, 20, 50, 100))
+DB_CONNECTIONS = Counter(
+    'db_connections_opened_total', 'Database connections opened by alias.',
+    ['alias'])
+ENTRIES_CREATED = Counter('entries_created_total', 'Entries created.')
+ENTRIES_EXPIRED = Counter('entries_expired_total', 'Entries marked expired.')
+IMAGE_BYTES_STORED = Counter(
+    'entry_image_stored_bytes_total',
+    'Bytes of entry image files written, by original or variant.',
+    ['kind'])
+TASK_DURATION = Histogram(
+    'celery_task_duration_seconds', 'Celery task run time by task and state.',
+    ['task', 'state'], buckets=DEFAULT_BUCKETS + (30.0, 60.0, 300.0))
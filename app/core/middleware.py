@@ -0,0 +1,202 @@
+"""
+Middleware shared by the apps.
+"""
+import hashlib
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import metrics
+from core.routers import replica_reads
+from core.timing import current_timings, start_timings, stop_timings
+
+logger = logging.getLogger('core.performance')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def sticky_key(request):
+    """
+    Return the cache key pinning the client of a request to the
+    primary, or None for requests without credentials.
+    """
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+
+    digest = hashlib.sha256(authorization.encode()).hexdigest()
+    return f'replica:sticky:{digest}'
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Sends the reads of safe API requests to the replicas.
+
+    A client sending an unsafe request is pinned to the primary
+    for REPLICA_STICKY_SECONDS, so it reads its own writes while
+    the replicas catch up.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        key = sticky_key(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            if key is not None:
+                cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+            return response
+
+        use_replicas = request.path.startswith(
+            settings.REPLICA_READ_PATH_PREFIX) and not (
+            key is not None and cache.get(key))
+        with replica_reads(use_replicas):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+
+        key = sticky_key(request)
+        if request.method not in SAFE_METHODS:
+            response = await self.get_response(request)
+            if key is not None:
+                await cache.aset(key, True, settings.REPLICA_STICKY_SECONDS)
+            return response
+
+        use_replicas = request.path.startswith(
+            settings.REPLICA_READ_PATH_PREFIX) and not (
+            key is not None and await cache.aget(key))
+        with replica_reads(use_replicas):
+            return await self.get_response(request)
+
+
+class PerformanceMiddleware:
+    """
+    Measures the total time, database queries, serialization,
+    response rendering and cache lookups of every request.
+
+    The measurements are sent in a Server-Timing header, logged as
+    a JSON line and added to the request metrics. Requests slower
+    than SLOW_REQUEST_MS are logged as warnings, a sample of them
+    with their slowest queries.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        options = settings.REQUEST_PERFORMANCE
+        timings, token = start_timings(options['TOP_QUERIES'])
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_timings(token)
+
+        self.report(request, response, timings, options)
+        return response
+
+    async def __acall__(self, request):
+        options = settings.REQUEST_PERFORMANCE
+        timings, token = start_timings(options['TOP_QUERIES'])
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_timings(token)
+
+        self.report(request, response, timings, options)
+        return response
+
+    def process_template_response(self, request, response):
+        # runs last of the middleware, right before rendering
+        timings = current_timings()
+        if timings is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                timings.render_time += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+
+        return response
+
+    def report(self, request, response, timings, options):
+        """
+        Add the Server-Timing header and log the request.
+        """
+        total = timings.total_time * 1000
+        db = timings.db_time * 1000
+        render = timings.render_time * 1000
+        serialize = timings.serialize_time * 1000
+        app = max(total - db - render - serialize, 0)
+        if options['SERVER_TIMING']:
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={total:.2f}',
+                f'db;dur={db:.2f};desc="{timings.db_count} queries"',
+                f'serialize;dur={serialize:.2f}',
+                f'render;dur={render:.2f}',
+                f'app;dur={app:.2f}',
+                f'cache;desc="{timings.cache_hits} hits '
+                f'{timings.cache_misses} misses"',
+            ])
+
+        match = request.resolver_match
+        view = match.view_name if match else ''
+        self.observe(request, response, view, timings)
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': view or None,
+            'status': response.status_code,
+            'total_ms': round(total, 2),
+            'db_queries': timings.db_count,
+            'db_ms': round(db, 2),
+            'serialize_ms': round(serialize, 2),
+            'render_ms': round(render, 2),
+            'app_ms': round(app, 2),
+            'cache_hits': timings.cache_hits,
+            'cache_misses': timings.cache_misses,
+        }
+        if total < options['SLOW_REQUEST_MS']:
+            logger.info(json.dumps(record))
+            return
+
+        if random.random() < options['SLOW_SAMPLE_RATE']:
+            record['slowest_queries'] = timings.slowest_queries()
+        logger.warning(json.dumps(record))
+
+    def observe(self, request, response, view, timings):
+        """
+        Update the request metrics.
+        """
+        metrics.REQUESTS.labels(
+            view, request.method, str(response.status_code)).inc()
+        metrics.REQUEST_DURATION.labels(view, request.method).observe(
+            timings.total_time)
+        metrics.REQUEST_QUERIES.labels(view).observe(timings.db_count)
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.labels(view).observe(len(response.content))
+        metrics.default_registry.maybe_flush()
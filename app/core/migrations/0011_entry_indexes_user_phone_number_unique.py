@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_remove_entry_address'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(condition=models.Q(('is_expired', False)), fields=['-created_at', '-id'], name='entry_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['user', '-created_at'], name='entry_user_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(condition=models.Q(('phone_number', ''), _negated=True), fields=('phone_number',), name='user_phone_number_unique'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:55
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def populate_expires_at(apps, schema_editor):
+    """
+    Set expiry dates of existing entries from their user's plan.
+    """
+    Plan = apps.get_model('core', 'Plan')
+    Entry = apps.get_model('core', 'Entry')
+    for plan in Plan.objects.all():
+        Entry.objects.filter(user__plan=plan, is_expired=False).update(
+            expires_at=models.F('created_at') + timedelta(
+                days=plan.days_to_expire))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_entry_indexes_user_phone_number_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(condition=models.Q(('is_expired', False)), fields=['expires_at'], name='entry_active_expires_idx'),
+        ),
+        migrations.RunPython(populate_expires_at,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:59
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def populate_active_entries_count(apps, schema_editor):
+    """
+    Count the active entries of existing users.
+    """
+    User = apps.get_model('core', 'User')
+    Entry = apps.get_model('core', 'Entry')
+    active_entries = Entry.objects.filter(
+        user=models.OuterRef('pk'),
+        is_expired=False,
+    ).order_by().values('user').annotate(
+        count=models.Count('pk')).values('count')
+    User.objects.update(active_entries_count=Coalesce(
+        models.Subquery(active_entries), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_entry_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='active_entries_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_active_entries_count,
+                             migrations.RunPython.noop),
+    ]
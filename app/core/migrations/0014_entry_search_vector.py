@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:07
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+SEARCH_VECTOR_TRIGGER = """
+CREATE FUNCTION core_entry_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('pg_catalog.simple',
+                              coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('pg_catalog.simple',
+                              coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_entry_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description, search_vector
+    ON core_entry
+    FOR EACH ROW EXECUTE FUNCTION core_entry_search_vector_update();
+"""
+
+DROP_SEARCH_VECTOR_TRIGGER = """
+DROP TRIGGER core_entry_search_vector_trigger ON core_entry;
+DROP FUNCTION core_entry_search_vector_update();
+"""
+
+# vectors of existing entries are computed by the batched
+# `manage.py backfill entry-search-vector` rather than one UPDATE
+# locking the whole table
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_user_active_entries_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(SEARCH_VECTOR_TRIGGER, DROP_SEARCH_VECTOR_TRIGGER),
+        migrations.AddIndex(
+            model_name='entry',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='entry_search_vector_idx'),
+        ),
+    ]
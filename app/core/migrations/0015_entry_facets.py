@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_entry_facets(apps, schema_editor):
+    """
+    Count the active entries per category and price bucket.
+    """
+    schema_editor.execute("""
+        INSERT INTO core_entryfacet (category_id, price_bucket, count)
+        SELECT category_id, width_bucket(price, %s::numeric[]), count(*)
+        FROM core_entry
+        WHERE NOT is_expired
+        GROUP BY 1, 2
+    """, [settings.ENTRY_PRICE_BUCKETS])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_entry_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntryFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_bucket', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(condition=models.Q(('is_expired', False)), fields=['category', '-created_at', '-id'], name='entry_active_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(condition=models.Q(('is_expired', False)), fields=['price'], name='entry_active_price_idx'),
+        ),
+        migrations.AddField(
+            model_name='entryfacet',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='core.category'),
+        ),
+        migrations.AddConstraint(
+            model_name='entryfacet',
+            constraint=models.UniqueConstraint(fields=('category', 'price_bucket'), name='entry_facet_unique'),
+        ),
+        migrations.RunPython(populate_entry_facets,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_entry_facets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entryimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_image_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackfillProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('next_id', models.BigIntegerField(default=0)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('rows_updated', models.BigIntegerField(default=0)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'backfill progress',
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-17 09:43
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_backfill_progress'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='entryimage',
+            name='image',
+            field=models.ImageField(db_index=True, upload_to=core.models.entry_image_file_path),
+        ),
+        migrations.AlterField(
+            model_name='imageblob',
+            name='image',
+            field=models.ImageField(db_index=True, upload_to=''),
+        ),
+    ]
@@ -4,8 +4,12 @@ Database models.
 
 import uuid
 import os
+from bisect import bisect_right
+from datetime import timedelta
 
-from django.db import models
+from django.db import models, transaction, connection
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -14,6 +18,24 @@ from django.contrib.auth.models import (
     Permission,
 )
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+
+from core import metrics
+
+
+# text search configuration of Entry.search_vector, the vector is
+# maintained by a database trigger created in migration 0014
+ENTRY_SEARCH_CONFIG = 'simple'
+
+
+def price_bucket(price):
+    """
+    Return the facet price bucket of a price, the number of
+    ENTRY_PRICE_BUCKETS lower bounds not above it, like
+    Postgres width_bucket().
+    """
+    return bisect_right(settings.ENTRY_PRICE_BUCKETS, price)
 
 
 def entry_image_file_path(instance, filename):
@@ -38,6 +60,24 @@ class Plan(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """
+        Save the plan, recomputing its entries' expiry dates
+        when days to expire changes.
+        """
+        previous_days_to_expire = None
+        if self.pk is not None:
+            previous_days_to_expire = Plan.objects.filter(
+                pk=self.pk).values_list('days_to_expire', flat=True).first()
+
+        super().save(*args, **kwargs)
+
+        if (previous_days_to_expire is not None
+                and previous_days_to_expire != self.days_to_expire):
+            Entry.objects.filter(
+                user__plan=self,
+                is_expired=False).reset_expiry(self.days_to_expire)
+
 
 class UserManager(BaseUserManager):
     """
@@ -67,6 +107,49 @@ class UserManager(BaseUserManager):
         superuser.save(using=self._db)
         return superuser
 
+    def claim_entry_slot(self, user_id, max_entries=None):
+        """
+        Count a new active entry for the user.
+
+        With max_entries the slot is only claimed while the user
+        has fewer active entries, in a single conditional update.
+        Returns whether the slot was claimed.
+        """
+        users = self.filter(pk=user_id)
+        if max_entries is not None:
+            users = users.filter(active_entries_count__lt=max_entries)
+
+        return users.update(
+            active_entries_count=models.F('active_entries_count') + 1) == 1
+
+    def release_entry_slot(self, user_id):
+        """
+        Stop counting an active entry of the user.
+        """
+        return self.filter(pk=user_id).update(
+            active_entries_count=Greatest(
+                models.F('active_entries_count') - 1, 0))
+
+    def reconcile_entry_counts(self, users=None):
+        """
+        Fix users whose active entry count drifted from their
+        active entries, all users or the users of a queryset.
+        Returns the number of fixed users.
+        """
+        active_entries = Entry.objects.filter(
+            user=models.OuterRef('pk'),
+            is_expired=False,
+        ).order_by().values('user').annotate(
+            count=models.Count('pk')).values('count')
+        actual_count = Coalesce(models.Subquery(active_entries), 0)
+
+        if users is None:
+            users = self.all()
+
+        return users.exclude(
+            active_entries_count=actual_count).update(
+                active_entries_count=actual_count)
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     """
@@ -79,6 +162,9 @@ class User(AbstractBaseUser, PermissionsMixin):
     date_of_birth = models.DateField(null=True)
     date_joined = models.DateTimeField(auto_now_add=True)
     last_login = models.DateTimeField(auto_now=True)
+    # maintained with F() updates, never written by save()
+    active_entries_count = models.PositiveIntegerField(default=0,
+                                                       editable=False)
     plan = models.ForeignKey(
         Plan,
         on_delete=models.SET_NULL,
@@ -106,6 +192,50 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     objects = UserManager()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remember the loaded plan to detect plan changes on save.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_plan_id = instance.__dict__.get('plan_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save the user, recomputing their entries' expiry dates
+        when the plan changes.
+        """
+        plan_changed = (
+            not self._state.adding
+            and self.plan_id != getattr(self, '_loaded_plan_id',
+                                        self.plan_id))
+        # saving a stale counter would undo concurrent updates
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name != 'active_entries_count'
+            ]
+        super().save(*args, **kwargs)
+        self._loaded_plan_id = self.plan_id
+
+        if plan_changed:
+            days_to_expire = self.plan.days_to_expire if self.plan else None
+            self.entries.filter(
+                is_expired=False).reset_expiry(days_to_expire)
+
+    class Meta:
+        constraints = [
+            # checked on every signup by UserSerializer,
+            # blank phone numbers are allowed for many users
+            models.UniqueConstraint(
+                fields=['phone_number'],
+                condition=~models.Q(phone_number=''),
+                name='user_phone_number_unique',
+            ),
+        ]
+
     def is_profile_complete(self):
         """
         Checks the required fields are not null or blank
@@ -131,6 +261,55 @@ class Category(models.Model):
         return self.name
 
 
+class EntryQuerySet(models.QuerySet):
+    """
+    QuerySet for entries.
+    """
+    def reset_expiry(self, days_to_expire):
+        """
+        Recompute expiry dates from the entries creation date.
+        Entries never expire when days_to_expire is None.
+        """
+        if days_to_expire is None:
+            return self.update(expires_at=None)
+
+        return self.update(
+            expires_at=models.F('created_at') + timedelta(
+                days=days_to_expire))
+
+    def expire(self):
+        """
+        Mark the active entries as expired and release their
+        owners' entry slots. Returns the number of expired entries.
+
+        Rows are locked in the order of entry deletes, the entries,
+        then their owners, then their facets.
+        """
+        entries = self.filter(is_expired=False)
+        expired_entries = entries.filter(
+            user=models.OuterRef('pk')).order_by().values('user').annotate(
+                count=models.Count('pk')).values('count')
+
+        with transaction.atomic():
+            list(entries.order_by('pk').select_for_update().values_list(
+                'pk', flat=True))
+            User.objects.filter(pk__in=entries.values('user')).update(
+                active_entries_count=Greatest(
+                    models.F('active_entries_count')
+                    - models.Subquery(expired_entries), 0))
+            EntryFacet.objects.remove_entries(entries)
+            expired = entries.update(is_expired=True)
+
+        metrics.ENTRIES_EXPIRED.inc(expired)
+        return expired
+
+
+class EntryLimitExceeded(Exception):
+    """
+    Raised when a user has no entry slots left in their plan.
+    """
+
+
 class Entry(models.Model):
     """
     Entry object.
@@ -146,14 +325,290 @@ class Entry(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     edited_at = models.DateTimeField(auto_now=True)
     is_expired = models.BooleanField(default=False)
+    expires_at = models.DateTimeField(null=True, blank=True)
     phone_number = models.CharField(max_length=15)
     category = models.ForeignKey(Category,
                                  on_delete=models.CASCADE,
                                  related_name='entries')
+    # weighted title and description, written by a database trigger
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = EntryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # public feed, active entries newest first
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_expired=False),
+                name='entry_active_created_idx',
+            ),
+            # owner listing, a user's entries newest first
+            models.Index(
+                fields=['user', '-created_at'],
+                name='entry_user_created_idx',
+            ),
+            # expiry task, active entries due to expire
+            models.Index(
+                fields=['expires_at'],
+                condition=models.Q(is_expired=False),
+                name='entry_active_expires_idx',
+            ),
+            # filtered feed, active entries of a category newest first
+            models.Index(
+                fields=['category', '-created_at', '-id'],
+                condition=models.Q(is_expired=False),
+                name='entry_active_category_idx',
+            ),
+            # filtered feed, active entries in a price range
+            models.Index(
+                fields=['price'],
+                condition=models.Q(is_expired=False),
+                name='entry_active_price_idx',
+            ),
+            # full text search over title and description
+            GinIndex(
+                fields=['search_vector'],
+                name='entry_search_vector_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remember the loaded facet to keep facet counts on save.
+        """
+        instance = super().from_db(db, field_names, values)
+        if {'category_id', 'price', 'is_expired'} <= instance.__dict__.keys():
+            instance._loaded_facet = instance.facet
+        return instance
+
+    @property
+    def facet(self):
+        """
+        Return the (category id, price bucket) counted for
+        the entry, None for expired entries.
+        """
+        if self.is_expired:
+            return None
+
+        return (self.category_id, price_bucket(self.price))
+
+    def save(self, *args, max_entries=None, **kwargs):
+        """
+        Save the entry, setting its expiry date from the
+        user's plan when it is created.
+
+        New active entries claim one of the user's entry slots,
+        EntryLimitExceeded is raised when the user already has
+        max_entries active entries.
+        """
+        if not self._state.adding:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                loaded_facet = getattr(self, '_loaded_facet', self.facet)
+                if loaded_facet != self.facet:
+                    EntryFacet.objects.adjust(
+                        {loaded_facet: -1, self.facet: 1})
+            self._loaded_facet = self.facet
+            return
+
+        if self.expires_at is None:
+            plan = self.user.plan
+            if plan is not None:
+                self.expires_at = timezone.now() + timedelta(
+                    days=plan.days_to_expire)
+
+        with transaction.atomic():
+            if not self.is_expired and not User.objects.claim_entry_slot(
+                    self.user_id, max_entries):
+                raise EntryLimitExceeded(
+                    f'User has reached the maximum of '
+                    f'{max_entries} entries.')
+
+            super().save(*args, **kwargs)
+            EntryFacet.objects.adjust({self.facet: 1})
+        self._loaded_facet = self.facet
+        metrics.ENTRIES_CREATED.inc()
+
+
+class EntryFacetManager(models.Manager):
+    """
+    Manager for entry facet counts.
+    """
+    upsert_sql = """
+        INSERT INTO core_entryfacet (category_id, price_bucket, count)
+        {values}
+        ON CONFLICT (category_id, price_bucket)
+        DO UPDATE SET count = core_entryfacet.count + EXCLUDED.count
+    """
+
+    def adjust(self, deltas):
+        """
+        Add deltas, a mapping of (category id, price bucket)
+        to a count change, to the facet counts. None keys are
+        ignored.
+        """
+        # rows are locked in key order by every writer, entries moved
+        # between two facets in opposite directions cannot deadlock
+        rows = sorted((*facet, delta) for facet, delta in deltas.items()
+                      if facet is not None and delta)
+        if not rows:
+            return
+
+        values = 'VALUES ' + ', '.join(['(%s, %s, %s)'] * len(rows))
+        with connection.cursor() as cursor:
+            cursor.execute(self.upsert_sql.format(values=values),
+                           [value for row in rows for value in row])
+
+    def remove_entries(self, entries):
+        """
+        Stop counting the active entries of a queryset.
+        """
+        entry_ids, params = entries.filter(
+            is_expired=False).values('pk').query.sql_with_params()
+        select = f"""
+            SELECT category_id, width_bucket(price, %s::numeric[]),
+                   -count(*)
+            FROM core_entry
+            WHERE id IN ({entry_ids})
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(self.upsert_sql.format(values=select),
+                           [settings.ENTRY_PRICE_BUCKETS, *params])
+
+    def rebuild(self):
+        """
+        Recount every facet from the active entries,
+        returning the number of facets.
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('DELETE FROM core_entryfacet')
+            cursor.execute("""
+                INSERT INTO core_entryfacet (category_id, price_bucket, count)
+                SELECT category_id, width_bucket(price, %s::numeric[]),
+                       count(*)
+                FROM core_entry
+                WHERE NOT is_expired
+                GROUP BY 1, 2
+            """, [settings.ENTRY_PRICE_BUCKETS])
+            return cursor.rowcount
+
+
+class EntryFacet(models.Model):
+    """
+    Number of active entries per category and price bucket.
+
+    Kept up to date on entry writes and expiry,
+    EntryFacet.objects.rebuild() recounts drifted facets.
+    """
+    category = models.ForeignKey(Category,
+                                 on_delete=models.CASCADE,
+                                 related_name='facets')
+    price_bucket = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    objects = EntryFacetManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['category', 'price_bucket'],
+                name='entry_facet_unique',
+            ),
+        ]
+
+
+def image_blob_file_path(digest, extension):
+    """
+    Generate the content addressed file path of an ImageBlob.
+    """
+    return os.path.join('uploads', 'entry', 'blobs', digest[:2],
+                        f'{digest}{extension}')
+
+
+class ImageBlobManager(models.Manager):
+    """
+    Manager for image blobs.
+    """
+
+    def acquire(self, digest, extension, file):
+        """
+        Return the blob holding the content of an uploaded file with
+        a reference taken on it, storing the content if it is new.
+        """
+        name = image_blob_file_path(digest, extension)
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO core_imageblob
+                    (sha256, image, size, refcount, created_at)
+                VALUES (%s, %s, %s, 1, now())
+                ON CONFLICT (sha256)
+                DO UPDATE SET refcount = core_imageblob.refcount + 1
+                RETURNING id, image
+            """, [digest, name, file.size])
+            pk, name = cursor.fetchone()
+
+        # the file is written after the reference is taken, the
+        # garbage collector deletes files of unreferenced blobs only
+        storage = self.model._meta.get_field('image').storage
+        if not storage.exists(name):
+            file.seek(0)
+            saved_name = storage.save(name, file)
+            # a concurrent upload stored the same content first
+            if saved_name != name:
+                storage.delete(saved_name)
+            else:
+                metrics.IMAGE_BYTES_STORED.labels('original').inc(file.size)
+
+        return self.model.from_db(
+            self.db, ['id', 'sha256', 'image'], [pk, digest, name])
+
+    def release(self, blob_id):
+        """
+        Drop a reference on a blob.
+        """
+        self.filter(pk=blob_id).update(
+            refcount=Greatest(models.F('refcount') - 1, 0))
+
+    def reconcile_refcounts(self):
+        """
+        Fix blobs whose refcount drifted from the number of entry
+        images referencing them. Returns the number of fixed blobs.
+        """
+        references = EntryImage.objects.filter(
+            blob=models.OuterRef('pk'),
+        ).order_by().values('blob').annotate(
+            count=models.Count('pk')).values('count')
+        actual_count = Coalesce(models.Subquery(references), 0)
+
+        return self.exclude(refcount=actual_count).update(
+            refcount=actual_count)
+
+
+class ImageBlob(models.Model):
+    """
+    Uploaded image content, stored once per sha256 digest
+    and shared by the entry images holding the same content.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    image = models.ImageField(db_index=True)
+    size = models.PositiveBigIntegerField()
+    # number of entry images referencing the blob, unreferenced
+    # blobs are deleted by the collect_image_blobs task
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ImageBlobManager()
+
+    def __str__(self):
+        return self.sha256
+
 
 class EntryImage(models.Model):
     """
@@ -163,8 +618,38 @@ class EntryImage(models.Model):
                               on_delete=models.CASCADE,
                               related_name='images')
     uploaded_at = models.DateTimeField(auto_now_add=True)
-    image = models.ImageField(upload_to=entry_image_file_path)
+    # indexed for clean_media_orphans, which looks up stored files
+    image = models.ImageField(upload_to=entry_image_file_path,
+                              db_index=True)
+    # content of the image, image holds the blob's file name
+    blob = models.ForeignKey(ImageBlob,
+                             on_delete=models.PROTECT,
+                             null=True,
+                             blank=True,
+                             related_name='entry_images')
+    # storage paths of the resized images by variant and format,
+    # written by the generate_image_variants task
+    variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
-        return (f"""Image for Entry {self.entry.id}, uploaded on
+        return (f"""Image for Entry {self.entry_id}, uploaded on
                 {self.uploaded_at.strftime('%Y-%m-%d %H:%M:%S')}""")
+
+
+class BackfillProgress(models.Model):
+    """
+    Progress of a backfill through the primary keys of its table.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    # first id of the next batch and last id to process
+    next_id = models.BigIntegerField(default=0)
+    last_id = models.BigIntegerField(default=0)
+    rows_updated = models.BigIntegerField(default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'backfill progress'
+
+    def __str__(self):
+        return self.name
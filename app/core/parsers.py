@@ -0,0 +1,46 @@
+"""
+Parsers for the APIs.
+"""
+import codecs
+import io
+
+from django.conf import settings
+
+from rest_framework.parsers import JSONParser
+
+from core.renderers import ORJSONRenderer, orjson
+
+# orjson reads integers beyond 64 bits as floats, bodies with runs
+# of 19 digits are left to JSONParser. digits are mapped to zeros
+# and searched for in C, a regular expression costs more than the
+# parsing.
+DIGITS = bytes.maketrans(b'123456789', b'000000000')
+LONG_INTEGER = b'0' * 19
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser parsing with orjson when it is installed.
+
+    Bodies which are not utf-8, hold long integers or are refused
+    by orjson are parsed by JSONParser, for the same data, NaN
+    handling and error messages.
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """
+        Parses the incoming bytestream as JSON and returns the resulting data.
+        """
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if LONG_INTEGER not in body.translate(DIGITS):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,271 @@
+"""
+Aggregated statistics of database queries by fingerprint.
+
+Every database connection, in web and Celery processes alike, gets an
+execute wrapper timing its queries. Queries are grouped by
+fingerprint, their SQL with literals and placeholder lists collapsed,
+so the queries of an N+1 pattern add up to one busy fingerprint.
+
+Queries slower than SLOW_QUERY_MS are logged right away. Every
+FLUSH_INTERVAL seconds, after a request or a task rather than inside
+a query, a process logs its busiest fingerprints and, with DIR set,
+writes its statistics there for `manage.py querystats`.
+"""
+import json
+import logging
+import math
+import re
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+
+from core import snapshots
+
+logger = logging.getLogger('core.querystats')
+
+# durations are counted in buckets growing by a quarter from 0.05 ms,
+# percentiles are the upper bound of their bucket
+BUCKET_BASE = 0.05
+BUCKET_GROWTH = 1.25
+
+NORMALIZERS = [
+    # string literals, including escaped quotes
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    # numbers not part of a name
+    (re.compile(r'(?<![\w".])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b', re.I), '?'),
+    (re.compile(r'%s|%\(\w+\)s'), '?'),
+    # lists of values, such as IN (?, ?, ?) and VALUES (?, ?), (?, ?)
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?+)'),
+    (re.compile(r'\(\?\+\)(?:\s*,\s*\(\?\+\))+'), '(?+)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """
+    Return the SQL of a query with its values replaced by ?.
+    """
+    for pattern, replacement in NORMALIZERS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def bucket_index(duration_ms):
+    if duration_ms <= BUCKET_BASE:
+        return 0
+    return int(math.log(duration_ms / BUCKET_BASE, BUCKET_GROWTH)) + 1
+
+
+def bucket_bound(index):
+    return BUCKET_BASE * BUCKET_GROWTH ** index
+
+
+class FingerprintStats:
+    """
+    Count, total and largest time and a duration histogram
+    of the queries of a fingerprint.
+    """
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self, count=0, total=0.0, max=0.0, buckets=None):
+        self.count = count
+        self.total = total
+        self.max = max
+        self.buckets = buckets or {}
+
+    def add(self, duration_ms):
+        self.count += 1
+        self.total += duration_ms
+        self.max = max(self.max, duration_ms)
+        index = bucket_index(duration_ms)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def percentile(self, fraction):
+        """
+        Return the upper bound of the bucket holding the percentile,
+        never above the largest duration.
+        """
+        rank = math.ceil(self.count * fraction)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(bucket_bound(index), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def dump(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'max': self.max,
+            'buckets': dict(self.buckets),
+        }
+
+    @classmethod
+    def load(cls, data):
+        return cls(data['count'], data['total'], data['max'], {
+            int(index): count for index, count in data['buckets'].items()})
+
+
+class QueryStats:
+    """
+    Query statistics of a process, also the execute wrapper
+    installed on its connections.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._next_flush = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, (time.perf_counter() - started) * 1000,
+                        context['connection'].alias)
+
+    def record(self, sql, duration_ms, alias='default'):
+        """
+        Add a query to the statistics of its fingerprint.
+        """
+        options = settings.QUERY_STATS
+        key = fingerprint(sql)
+        with self._lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = FingerprintStats()
+            stats.add(duration_ms)
+
+        if duration_ms >= options['SLOW_QUERY_MS']:
+            logger.warning(json.dumps({
+                'slow_query': key,
+                'alias': alias,
+                'duration_ms': round(duration_ms, 2),
+            }))
+
+    def maybe_flush(self):
+        """
+        Flush the statistics when the last flush, or the first
+        call, is older than the flush interval.
+        """
+        options = settings.QUERY_STATS
+        if not options['ENABLED']:
+            return
+        now = time.monotonic()
+        if self._next_flush is None:
+            self._next_flush = now + options['FLUSH_INTERVAL']
+        elif now >= self._next_flush:
+            self._next_flush = now + options['FLUSH_INTERVAL']
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {key: stats.dump() for key, stats in self.stats.items()}
+
+    def flush(self):
+        """
+        Log the busiest fingerprints, and write the statistics
+        of this process to QUERY_STATS['DIR'] when set.
+        """
+        options = settings.QUERY_STATS
+        snapshot = self.snapshot()
+        stats = {key: FingerprintStats.load(data)
+                 for key, data in snapshot.items()}
+        for key, item in top_fingerprints(stats, 'total', options['TOP']):
+            logger.info(json.dumps({
+                'fingerprint': key,
+                'count': item.count,
+                'total_ms': round(item.total, 2),
+                'p95_ms': round(item.percentile(0.95), 2),
+            }))
+
+        directory = options['DIR']
+        if not directory:
+            return
+        try:
+            snapshots.write(snapshots.snapshot_path(directory), snapshot)
+        except OSError as exc:
+            # statistics are left out rather than failing a request
+            logger.warning(json.dumps({
+                'query_stats_error': str(exc),
+                'dir': directory,
+            }))
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+
+
+def top_fingerprints(stats, order, limit):
+    """
+    Return the (fingerprint, stats) pairs with the largest
+    total, count, mean or p95.
+    """
+    keys = {
+        'total': lambda item: item[1].total,
+        'count': lambda item: item[1].count,
+        'mean': lambda item: item[1].mean,
+        'p95': lambda item: item[1].percentile(0.95),
+    }
+    return sorted(stats.items(), key=keys[order], reverse=True)[:limit]
+
+
+def load_snapshots(directory):
+    """
+    Return the statistics written by every process to a
+    directory, added up by fingerprint.
+    """
+    return merge_snapshots(snapshots.read_all(directory))
+
+
+def merge_snapshots(items):
+    """
+    Return the statistics of snapshots added up by fingerprint.
+    """
+    merged = {}
+    for snapshot in items:
+        for key, data in snapshot.items():
+            stats = FingerprintStats.load(data)
+            if key in merged:
+                merged[key].merge(stats)
+            else:
+                merged[key] = stats
+
+    return merged
+
+
+def combine_snapshots(items):
+    """
+    Add up snapshots into one, to keep the statistics of exited
+    processes in one snapshot.
+    """
+    return {key: stats.dump()
+            for key, stats in merge_snapshots(items).items()}
+
+
+query_stats = QueryStats()
+
+
+def install(connection):
+    """
+    Time the queries of a connection, once however often it reconnects.
+    """
+    if settings.QUERY_STATS['ENABLED'] and \
+            query_stats not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_stats)
@@ -0,0 +1,47 @@
+"""
+Renderers for the APIs.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer rendering with orjson when it is installed.
+
+    The output is the output of JSONRenderer byte for byte: dates,
+    times and dataclasses are passed to the encoder class like the
+    types orjson does not know, and ascii, indented or pretty output
+    and data orjson refuses are rendered by JSONRenderer. Floats are
+    the exception, orjson writes 1e-05 as 0.00001 and NaN as null,
+    the API responses hold decimals as strings and no floats.
+    """
+    options = 0 if orjson is None else (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into JSON, returning a bytestring.
+        """
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if (orjson is None or data is None or indent is not None
+                or self.ensure_ascii or not self.compact):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default,
+                               option=self.options)
+        except orjson.JSONEncodeError:
+            # non string keys, integers beyond 64 bits, errors of
+            # the encoder class
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+
+        # escaped like JSONRenderer to keep a javascript subset
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029')
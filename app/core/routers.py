@@ -0,0 +1,64 @@
+"""
+Database routing of reads to replicas.
+
+Reads go to the primary unless they run in a replica_reads() block,
+which the replica middleware opens for safe API requests. Writes,
+Celery tasks and management commands therefore always use the
+primary.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads(allowed=True):
+    """
+    Send the reads of a block to the replicas, or to the
+    primary when allowed is false.
+    """
+    token = _replica_reads.set(allowed)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def primary_reads():
+    """
+    Send the reads of a block to the primary.
+    """
+    return replica_reads(False)
+
+
+def replica_reads_allowed():
+    """
+    Return whether reads currently go to the replicas.
+    """
+    return bool(_replica_reads.get() and settings.DATABASE_REPLICAS)
+
+
+class ReplicaRouter:
+    """
+    Routes allowed reads to a random replica and everything
+    else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if replica_reads_allowed():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,83 @@
+"""
+Signal handlers for the core models, database connections
+and Celery tasks.
+"""
+import time
+
+from celery.signals import task_postrun, task_prerun
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from core import metrics, querystats, timing
+from core.models import Category, Entry, EntryFacet, EntryImage, ImageBlob
+
+# start times of the running tasks of a worker process
+_task_started = {}
+
+
+@receiver(post_delete, sender=Entry)
+def release_entry_slot(sender, instance, origin=None, **kwargs):
+    """
+    Release the entry slot and facet count of a deleted active entry.
+
+    Entries deleted with their category keep the facet count, the
+    facets of the category are deleted in the same cascade and
+    adjusting them would insert a facet row for a missing category.
+    """
+    if instance.is_expired:
+        return
+
+    get_user_model().objects.release_entry_slot(instance.user_id)
+    origin = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin is not Category:
+        EntryFacet.objects.adjust({instance.facet: -1})
+
+
+@receiver(post_delete, sender=EntryImage)
+def release_image_blob(sender, instance, **kwargs):
+    """
+    Drop the reference of a deleted entry image on its blob.
+    """
+    if instance.blob_id is not None:
+        ImageBlob.objects.release(instance.blob_id)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """
+    Count opened database connections and time their queries.
+    """
+    metrics.DB_CONNECTIONS.labels(connection.alias).inc()
+    querystats.install(connection)
+    timing.install(connection)
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def observe_task_duration(task_id=None, task=None, state=None, **kwargs):
+    """
+    Record the run time of a finished Celery task.
+    """
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        metrics.TASK_DURATION.labels(task.name, state or '').observe(
+            time.perf_counter() - started)
+    metrics.default_registry.maybe_flush()
+
+
+@receiver(request_finished)
+@task_postrun.connect
+def flush_query_stats(**kwargs):
+    """
+    Flush the query statistics of the process once its request
+    or task is done, writing them never fails a query.
+    """
+    querystats.query_stats.maybe_flush()
@@ -0,0 +1,96 @@
+"""
+JSON snapshots written by every process to a shared directory.
+
+Metrics and query statistics are kept per process. Each process
+writes its own snapshot, named after its host and pid, and readers
+add up the snapshots of the directory. Snapshots of exited processes
+are combined into one snapshot per host by retire(), which keeps the
+number of files bounded while workers are recycled.
+"""
+import json
+import os
+import socket
+import threading
+
+# snapshot of the exited processes of a host
+EXITED = 'exited'
+
+
+def snapshot_path(directory, pid=None):
+    """
+    Return the snapshot path of a process of this host,
+    the current one by default.
+    """
+    return os.path.join(
+        directory, f'{socket.gethostname()}-{pid or os.getpid()}.json')
+
+
+def write(path, data):
+    """
+    Replace the snapshot at path with data, never leaving a
+    partly written one. OSError is raised when it cannot be written.
+    """
+    temporary = f'{path}.{threading.get_ident()}.tmp'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(temporary, 'w') as snapshot:
+        json.dump(data, snapshot)
+    os.replace(temporary, path)
+
+
+def read(path):
+    """
+    Return the data of a snapshot, None when it is missing
+    or replaced while being read.
+    """
+    try:
+        with open(path) as snapshot:
+            return json.load(snapshot)
+    except (OSError, ValueError):
+        return None
+
+
+def read_all(directory):
+    """
+    Return the data of every snapshot of a directory.
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    snapshots = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json'):
+            data = read(os.path.join(directory, name))
+            if data is not None:
+                snapshots.append(data)
+    return snapshots
+
+
+def retire(directory, pid, combine):
+    """
+    Combine the snapshot of an exited process of this host into
+    the snapshot of the exited processes and remove it. combine
+    returns the data adding up a list of snapshot data.
+
+    Called by a single process, such as the gunicorn master.
+    """
+    path = snapshot_path(directory, pid)
+    data = read(path)
+    if data is None:
+        return
+
+    exited = snapshot_path(directory, EXITED)
+    write(exited, combine([read(exited) or {}, data]))
+    os.remove(path)
+
+
+def clear(directory):
+    """
+    Remove the snapshots of every process of this host.
+    """
+    if not os.path.isdir(directory):
+        return
+
+    prefix = f'{socket.gethostname()}-'
+    for name in os.listdir(directory):
+        if name.startswith(prefix):
+            os.remove(os.path.join(directory, name))
@@ -1,10 +1,41 @@
 from unittest.mock import patch
+from io import StringIO
+from decimal import Decimal
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
 
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import (
+    LiveServerTestCase,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+
+from core.backfills import backfills, run_backfill
+from core.querystats import FingerprintStats
+from core.management.commands.explain_hot_queries import hot_queries
+from core.management.commands.loadtest import parse_config
+from core.models import (
+    BackfillProgress,
+    Category,
+    Entry,
+    EntryFacet,
+    EntryImage,
+    ImageBlob,
+    Plan,
+)
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -34,3 +65,518 @@ class WaitForDbTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class ExplainHotQueriesTests(TestCase):
+    """
+    Test explain hot queries command.
+    """
+
+    def test_explain_all_hot_queries(self):
+        """
+        Test a plan is printed for every hot query.
+        """
+        out = StringIO()
+        call_command('explain_hot_queries', stdout=out)
+
+        output = out.getvalue()
+        for name in hot_queries():
+            self.assertIn(f'{name}:', output)
+        self.assertIn('Scan', output)
+
+    def test_explain_unknown_query_error(self):
+        """
+        Test explaining an unknown query raises CommandError.
+        """
+        with self.assertRaises(CommandError):
+            call_command('explain_hot_queries', 'no-such-query',
+                         stdout=StringIO())
+
+
+class ReconcileEntryCountsTests(TestCase):
+    """
+    Test reconcile entry counts command.
+    """
+
+    def test_reconcile_fixes_drifted_counts(self):
+        """
+        Test drifted counters are set to the active entry count.
+        """
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test12345')
+        other_user = get_user_model().objects.create_user(
+            'other@example.com', 'test12345')
+        category = Category.objects.create(name='cat')
+        for is_expired in [False, False, True]:
+            Entry.objects.create(
+                user=user,
+                title='test entry',
+                description='a test description for entry',
+                price=Decimal('150.00'),
+                phone_number='+906667775454',
+                category=category,
+                is_expired=is_expired,
+            )
+        get_user_model().objects.filter(pk=user.pk).update(
+            active_entries_count=7)
+        get_user_model().objects.filter(pk=other_user.pk).update(
+            active_entries_count=1)
+
+        out = StringIO()
+        call_command('reconcile_entry_counts', stdout=out)
+
+        self.assertIn('2 users', out.getvalue())
+        user.refresh_from_db()
+        other_user.refresh_from_db()
+        self.assertEqual(user.active_entries_count, 2)
+        self.assertEqual(other_user.active_entries_count, 0)
+
+
+class RebuildEntryFacetsTests(TestCase):
+    """
+    Test rebuild entry facets command.
+    """
+
+    def test_rebuild_entry_facets(self):
+        """
+        Test facets are recounted from active entries.
+        """
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test12345')
+        category = Category.objects.create(name='cat')
+        for is_expired in [False, False, True]:
+            Entry.objects.create(
+                user=user,
+                title='test entry',
+                description='a test description for entry',
+                price=Decimal('150.00'),
+                phone_number='+906667775454',
+                category=category,
+                is_expired=is_expired,
+            )
+        EntryFacet.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_entry_facets', stdout=out)
+
+        self.assertIn('Rebuilt 1 entry facets.', out.getvalue())
+        facet = EntryFacet.objects.get()
+        self.assertEqual((facet.category, facet.count), (category, 2))
+
+
+class CleanMediaOrphansTests(TestCase):
+    """
+    Test clean media orphans command.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test12345')
+        entry = Entry.objects.create(
+            user=user,
+            title='test entry',
+            description='a test description for entry',
+            price=Decimal('150.00'),
+            phone_number='+906667775454',
+            category=Category.objects.create(name='cat'),
+        )
+        EntryImage.objects.create(entry=entry,
+                                  image='uploads/entry/kept.jpg')
+        ImageBlob.objects.create(sha256='a' * 64, size=1,
+                                 image='uploads/entry/blobs/aa/blob.jpg')
+
+        self.kept = [
+            'uploads/entry/kept.jpg',
+            'uploads/entry/variants/kept-thumbnail.webp',
+            'uploads/entry/blobs/aa/blob.jpg',
+            # recent files may belong to uploads in progress
+            'uploads/entry/uploading.jpg',
+        ]
+        self.orphans = [
+            'uploads/entry/orphan.jpg',
+            'uploads/entry/variants/orphan-medium.jpg',
+            'uploads/entry/blobs/bb/orphan.png',
+        ]
+        for name in self.kept + self.orphans:
+            path = os.path.join(self.media_root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(b'data')
+            if name != 'uploads/entry/uploading.jpg':
+                os.utime(path, (0, 0))
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def test_dry_run_reports_orphans(self):
+        """
+        Test a dry run lists orphans and deletes nothing.
+        """
+        out = StringIO()
+        call_command('clean_media_orphans', '--dry-run', stdout=out)
+
+        self.assertIn('Would delete 3 orphaned files (12 bytes).',
+                      out.getvalue())
+        for name in self.kept + self.orphans:
+            self.assertTrue(self.exists(name))
+
+    def test_orphans_are_deleted(self):
+        """
+        Test only old unreferenced files are deleted.
+        """
+        out = StringIO()
+        call_command('clean_media_orphans', '--workers', '2', stdout=out)
+
+        self.assertIn('Deleted 3 orphaned files', out.getvalue())
+        for name in self.kept:
+            self.assertTrue(self.exists(name))
+        for name in self.orphans:
+            self.assertFalse(self.exists(name))
+
+    def test_files_checked_in_batches(self):
+        """
+        Test files are checked against the database with one query
+        per batch, finding the same orphans.
+        """
+        out = StringIO()
+        with self.assertNumQueries(3):
+            call_command('clean_media_orphans', '--batch-size', '2',
+                         '--workers', '1', stdout=out)
+
+        self.assertIn('Deleted 3 orphaned files', out.getvalue())
+        for name in self.kept:
+            self.assertTrue(self.exists(name))
+        for name in self.orphans:
+            self.assertFalse(self.exists(name))
+
+
+class CreateTestEntriesTests(TestCase):
+    """
+    Test create test entries command.
+    """
+
+    def test_create_test_entries(self):
+        """
+        Test users, entries and images are created with
+        counters, facets and refcounts matching them.
+        """
+        call_command('create_test_entries', users=3, entries=50,
+                     max_images=2, batch_size=20, seed=1,
+                     stdout=StringIO())
+
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertEqual(Entry.objects.count(), 50)
+        self.assertFalse(Entry.objects.filter(expires_at=None).exists())
+        self.assertFalse(Entry.objects.filter(search_vector=None).exists())
+        active = Entry.objects.filter(is_expired=False).count()
+        self.assertEqual(sum(get_user_model().objects.values_list(
+            'active_entries_count', flat=True)), active)
+        self.assertEqual(sum(EntryFacet.objects.values_list(
+            'count', flat=True)), active)
+        self.assertEqual(sum(ImageBlob.objects.values_list(
+            'refcount', flat=True)), EntryImage.objects.count())
+
+    def test_seed_reproduces_entries(self):
+        """
+        Test runs with the same seed create the same entries.
+        """
+        def titles():
+            return list(Entry.objects.order_by('pk').values_list(
+                'title', 'price'))
+
+        call_command('create_test_entries', entries=30, batch_size=7,
+                     seed=5, stdout=StringIO())
+        first = titles()
+        Entry.objects.all().delete()
+        call_command('create_test_entries', entries=30, batch_size=7,
+                     seed=5, stdout=StringIO())
+
+        self.assertEqual(titles(), first)
+
+
+# the command closes connections the test case keeps in a transaction
+@patch('django.db.backends.base.base.BaseDatabaseWrapper.close')
+@patch('django.db.backends.base.base.BaseDatabaseWrapper.'
+       'close_if_unusable_or_obsolete')
+class BenchmarkRequestsTests(TestCase):
+    """
+    Test benchmark requests command.
+    """
+
+    def test_benchmark_requests(self, patched_close_old, patched_close):
+        """
+        Test a row is reported per connection max age.
+        """
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test12345')
+        Entry.objects.create(
+            user=user,
+            title='test entry',
+            description='a test description for entry',
+            price=Decimal('150.00'),
+            phone_number='+906667775454',
+            category=Category.objects.create(name='cat'),
+        )
+        out = StringIO()
+        call_command('benchmark_requests', host='testserver', requests=3,
+                     conn_max_age=[0, 60], stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[2].startswith('0 '))
+        self.assertTrue(lines[3].startswith('60 '))
+
+    def test_benchmark_requests_without_user_error(self, patched_close_old,
+                                                   patched_close):
+        """
+        Test benchmarking without users raises CommandError.
+        """
+        with self.assertRaises(CommandError):
+            call_command('benchmark_requests', stdout=StringIO())
+
+
+class BackfillTests(TestCase):
+    """
+    Test backfill command.
+    """
+
+    def setUp(self):
+        plan = Plan.objects.create(name='Basic', days_to_expire=10)
+        self.user = get_user_model().objects.create_user(
+            'test@example.com', 'test12345', plan=plan)
+        category = Category.objects.create(name='cat')
+        self.entries = [
+            Entry.objects.create(
+                user=self.user,
+                title=f'test entry {n}',
+                description='a test description for entry',
+                price=Decimal('150.00'),
+                phone_number='+906667775454',
+                category=category,
+            )
+            for n in range(5)
+        ]
+        Entry.objects.update(expires_at=None)
+
+    def test_backfill_expires_at(self):
+        """
+        Test expiry dates are set in batches without
+        touching edited_at.
+        """
+        edited = dict(Entry.objects.values_list('pk', 'edited_at'))
+        out = StringIO()
+
+        call_command('backfill', 'entry-expires-at', '--batch-size', '2',
+                     stdout=out)
+
+        self.assertIn('5 rows updated', out.getvalue())
+        for entry in Entry.objects.all():
+            self.assertEqual(entry.expires_at,
+                             entry.created_at + timedelta(days=10))
+            self.assertEqual(entry.edited_at, edited[entry.pk])
+        progress = BackfillProgress.objects.get(name='entry-expires-at')
+        self.assertIsNotNone(progress.completed_at)
+
+    def test_backfill_resumes(self):
+        """
+        Test an interrupted backfill continues after the
+        last finished batch.
+        """
+        def interrupt(progress, rate):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            run_backfill(backfills['entry-expires-at'], batch_size=2,
+                         report=interrupt)
+        progress = BackfillProgress.objects.get(name='entry-expires-at')
+        self.assertEqual(progress.rows_updated, 2)
+        self.assertEqual(Entry.objects.filter(expires_at=None).count(), 3)
+
+        progress = run_backfill(backfills['entry-expires-at'], batch_size=2)
+
+        self.assertEqual(progress.rows_updated, 5)
+        self.assertFalse(Entry.objects.filter(expires_at=None).exists())
+
+    def test_backfill_active_entries_count(self):
+        """
+        Test drifted counters are recounted.
+        """
+        get_user_model().objects.update(active_entries_count=0)
+
+        call_command('backfill', 'user-active-entries-count',
+                     stdout=StringIO())
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.active_entries_count, 5)
+
+    def test_backfill_search_vector(self):
+        """
+        Test search vectors are recomputed.
+        """
+        out = StringIO()
+        call_command('backfill', 'entry-search-vector', stdout=out)
+
+        self.assertIn('5 rows updated', out.getvalue())
+        self.assertEqual(Entry.objects.filter(
+            search_vector=SearchQuery('entry', config='simple')).count(), 5)
+
+    def test_backfill_unknown_error(self):
+        """
+        Test running an unknown backfill raises CommandError.
+        """
+        with self.assertRaises(CommandError):
+            call_command('backfill', 'no-such-backfill', stdout=StringIO())
+
+    def test_populate_null_category_fields(self):
+        """
+        Test the category backfill runs through the old command.
+        """
+        out = StringIO()
+        with patch('core.management.commands.wait_for_db.Command.check'):
+            call_command('populate_null_category_fields', stdout=out)
+
+        self.assertIn('Operation successful, 0 entries updated.',
+                      out.getvalue())
+
+
+class QueryStatsTests(SimpleTestCase):
+    """
+    Test querystats command.
+    """
+
+    def test_querystats_requires_dir(self):
+        """
+        Test the report needs a statistics directory.
+        """
+        with override_settings(QUERY_STATS=dict(settings.QUERY_STATS,
+                                                DIR=None)), \
+                self.assertRaises(CommandError):
+            call_command('querystats', stdout=StringIO())
+
+    def test_querystats_report(self):
+        """
+        Test the command reports the statistics of every process.
+        """
+        directory = tempfile.mkdtemp()
+        for process, durations in (('a', [1, 2]), ('b', [30])):
+            stats = FingerprintStats()
+            for duration in durations:
+                stats.add(duration)
+            with open(os.path.join(directory, f'{process}.json'),
+                      'w') as file:
+                json.dump({'SELECT ?': stats.dump()}, file)
+
+        out = StringIO()
+        with override_settings(QUERY_STATS=dict(settings.QUERY_STATS,
+                                                DIR=directory)):
+            call_command('querystats', sort='count', stdout=out)
+
+        row = out.getvalue().splitlines()[1].split()
+        self.assertEqual(row[:2], ['3', '33.0'])
+        self.assertEqual(row[-2:], ['SELECT', '?'])
+
+
+class LoadTestTests(LiveServerTestCase):
+    """
+    Test loadtest command.
+    """
+
+    def test_parse_config(self):
+        """
+        Test worker configurations are parsed into gunicorn settings.
+        """
+        self.assertEqual(parse_config('gthread:2:4'), {
+            'GUNICORN_WORKER_MODE': 'gthread',
+            'WEB_CONCURRENCY': '2',
+            'GUNICORN_THREADS': '4',
+        })
+        self.assertEqual(parse_config('uvicorn:3')['GUNICORN_THREADS'], '1')
+        for value in ('eventlet:2', 'sync', 'sync:two', 'gthread:2:x'):
+            with self.assertRaises(CommandError):
+                parse_config(value)
+
+    def test_loadtest_running_server(self):
+        """
+        Test the scenarios run against a server and clean up after.
+        """
+        Category.objects.create(name='Electronics')
+        out = StringIO()
+        with self.assertLogs('core.performance', 'INFO'):
+            call_command('loadtest', url=self.live_server_url,
+                         concurrency=2, duration=0.5, stdout=out)
+
+        rows = [line.split() for line in out.getvalue().splitlines()[2:]]
+        self.assertEqual([row[1] for row in rows], ['list', 'create'])
+        for row in rows:
+            self.assertGreater(int(row[2]), 0)
+            self.assertEqual(row[-1], '0')
+        self.assertFalse(Entry.objects.exists())
+
+
+class BenchmarkAsyncTests(TransactionTestCase):
+    """
+    Test benchmark_async command.
+    """
+
+    def test_benchmark_async(self):
+        """
+        Test the sync and async servers are timed on the newest entry.
+        """
+        user = get_user_model().objects.create_user(
+            'bench@example.com', 'testpass123')
+        category = Category.objects.create(name='Electronics')
+        Entry.objects.create(user=user, title='entry', description='d',
+                             price=Decimal('1.00'), category=category)
+        out = StringIO()
+        call_command('benchmark_async', requests=6, concurrency=3,
+                     threads=2, latency=1, host='testserver', stdout=out)
+
+        rows = [line.split() for line in out.getvalue().splitlines()[2:]]
+        self.assertEqual([row[0] for row in rows], ['wsgi', 'asgi', 'asgi'])
+        self.assertEqual(rows[2][:3], ['asgi', 'async', 'views'])
+
+    def test_benchmark_async_without_user_error(self):
+        """
+        Test the benchmark needs a user.
+        """
+        with self.assertRaises(CommandError):
+            call_command('benchmark_async', stdout=StringIO())
+
+
+class BenchmarkJsonTests(TestCase):
+    """
+    Test benchmark_json command.
+    """
+
+    def test_benchmark_json(self):
+        """
+        Test pages are timed rendering and parsing alike.
+        """
+        user = get_user_model().objects.create_user(
+            'bench@example.com', 'testpass123')
+        category = Category.objects.create(name='Electronics')
+        for number in range(3):
+            Entry.objects.create(user=user, title=f'entry {number}',
+                                 description='d', price=Decimal('1.50'),
+                                 category=category)
+        out = StringIO()
+        call_command('benchmark_json', 2, 30, runs=1, host='testserver',
+                     stdout=out)
+
+        steps = [line[:30].strip() for line in out.getvalue().splitlines()]
+        self.assertIn('2 entries render orjson', steps)
+        self.assertIn('3 entries parse orjson', steps)
+        self.assertIn('3 entries serialize', steps)
+
+    def test_benchmark_json_without_entries_error(self):
+        """
+        Test the benchmark needs entries.
+        """
+        with self.assertRaises(CommandError):
+            call_command('benchmark_json', stdout=StringIO())
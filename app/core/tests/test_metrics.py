@@ -0,0 +1,197 @@
+"""
+Tests for metrics.
+"""
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from core import metrics, snapshots
+from core.metrics import Counter, Histogram, Registry
+from entry.tasks import mark_expired_entries
+from entry.tests.test_entry_api import ENTRIES_URL, create_entry, create_user
+
+METRICS_URL = reverse('metrics')
+
+
+class RegistryTests(SimpleTestCase):
+    """
+    Tests for the metrics registry.
+    """
+
+    def setUp(self):
+        self.registry = Registry()
+        self.counter = Counter('jobs_total', 'Jobs run.', ['queue'],
+                               registry=self.registry)
+        self.histogram = Histogram('job_seconds', 'Job run time.',
+                                   buckets=(0.1, 1), registry=self.registry)
+
+    def test_exposition(self):
+        """
+        Test metrics are rendered in the Prometheus text format.
+        """
+        self.counter.labels('a"b').inc(2)
+        for value in (0.05, 0.1, 0.5, 3):
+            self.histogram.observe(value)
+
+        self.assertEqual(self.registry.exposition().splitlines(), [
+            '# HELP job_seconds Job run time.',
+            '# TYPE job_seconds histogram',
+            'job_seconds_bucket{le="0.1"} 2',
+            'job_seconds_bucket{le="1.0"} 3',
+            'job_seconds_bucket{le="+Inf"} 4',
+            'job_seconds_sum 3.65',
+            'job_seconds_count 4',
+            '# HELP jobs_total Jobs run.',
+            '# TYPE jobs_total counter',
+            'jobs_total{queue="a\\"b"} 2',
+        ])
+
+    def test_wrong_labels_error(self):
+        """
+        Test passing the wrong number of labels raises ValueError.
+        """
+        with self.assertRaises(ValueError):
+            self.counter.labels('a', 'b')
+
+    def test_processes_added_up(self):
+        """
+        Test the snapshots of every process are added up
+        in multiprocess mode.
+        """
+        directory = tempfile.mkdtemp()
+        other = Registry()
+        Counter('jobs_total', 'Jobs run.', ['queue'],
+                registry=other).labels('a').inc(3)
+        Histogram('job_seconds', 'Job run time.', buckets=(0.1, 1),
+                  registry=other).observe(0.5)
+        with open(os.path.join(directory, 'other-1.json'), 'w') as file:
+            json.dump(other.dump(), file)
+        self.counter.labels('a').inc()
+        self.counter.labels('b').inc()
+
+        with override_settings(METRICS_MULTIPROC_DIR=directory):
+            lines = self.registry.exposition().splitlines()
+
+        self.assertIn('jobs_total{queue="a"} 4', lines)
+        self.assertIn('jobs_total{queue="b"} 1', lines)
+        self.assertIn('job_seconds_count 1', lines)
+        self.assertEqual(len(os.listdir(directory)), 2)
+
+    def test_exited_processes_combined(self):
+        """
+        Test the snapshots of exited processes are combined into
+        one, keeping their totals.
+        """
+        directory = tempfile.mkdtemp()
+        for pid, queue in ((101, 'a'), (102, 'a'), (103, 'b')):
+            other = Registry()
+            Counter('jobs_total', 'Jobs run.', ['queue'],
+                    registry=other).labels(queue).inc(pid)
+            Histogram('job_seconds', 'Job run time.', buckets=(0.1, 1),
+                      registry=other).observe(0.5)
+            snapshots.write(snapshots.snapshot_path(directory, pid),
+                            other.dump())
+            snapshots.retire(directory, pid, metrics.combine_dumps)
+        snapshots.retire(directory, 104, metrics.combine_dumps)
+        self.counter.labels('a').inc()
+
+        with override_settings(METRICS_MULTIPROC_DIR=directory):
+            lines = self.registry.exposition().splitlines()
+
+        self.assertIn('jobs_total{queue="a"} 204', lines)
+        self.assertIn('jobs_total{queue="b"} 103', lines)
+        self.assertIn('job_seconds_bucket{le="1.0"} 3', lines)
+        self.assertIn('job_seconds_sum 1.5', lines)
+        self.assertEqual(len(os.listdir(directory)), 2)
+
+    def test_snapshot_write_error_logged_once(self):
+        """
+        Test snapshots which cannot be written are logged once.
+        """
+        directory = os.path.join(tempfile.mkstemp()[1], 'metrics')
+
+        with override_settings(METRICS_MULTIPROC_DIR=directory), \
+                self.assertLogs('core.metrics', 'ERROR') as logs:
+            self.registry.flush()
+            self.registry.flush()
+
+        self.assertEqual(len(logs.records), 1)
+
+
+class MetricsTests(TestCase):
+    """
+    Tests for the application metrics.
+    """
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_metrics_endpoint(self):
+        """
+        Test request metrics are exposed by view.
+        """
+        self.client.get(ENTRIES_URL)
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        self.assertRegex(
+            res.content.decode(),
+            r'http_requests_total\{view="entry:entry-list",method="GET",'
+            r'status="200"\} \d+')
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token_required(self):
+        """
+        Test the metrics require the token when one is set.
+        """
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client.get(METRICS_URL,
+                              HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(res.status_code, 200)
+
+    def test_entries_counted(self):
+        """
+        Test created and expired entries and task run
+        times are counted.
+        """
+        created = metrics.ENTRIES_CREATED.labels().value
+        expired = metrics.ENTRIES_EXPIRED.labels().value
+        task = metrics.TASK_DURATION.labels(
+            mark_expired_entries.name, 'SUCCESS')
+        runs = sum(task.counts)
+
+        create_entry(user=self.user,
+                     expires_at=timezone.now() - timedelta(minutes=1))
+        mark_expired_entries.apply()
+
+        self.assertEqual(metrics.ENTRIES_CREATED.labels().value, created + 1)
+        self.assertEqual(metrics.ENTRIES_EXPIRED.labels().value, expired + 1)
+        self.assertEqual(sum(task.counts), runs + 1)
+
+    def test_snapshot_write_error_not_failing_requests(self):
+        """
+        Test requests succeed when the snapshot cannot be written.
+        """
+        directory = os.path.join(tempfile.mkstemp()[1], 'metrics')
+
+        with override_settings(METRICS_MULTIPROC_DIR=directory), \
+                patch.object(metrics.default_registry, '_next_flush', 0), \
+                patch.object(metrics.default_registry, '_write_failed',
+                             False), \
+                self.assertLogs('core.metrics', 'ERROR'):
+            res = self.client.get(ENTRIES_URL)
+
+        self.assertEqual(res.status_code, 200)
@@ -1,10 +1,14 @@
 """"
 Tests for models.
 """
+import re
 from unittest.mock import patch
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from decimal import Decimal
+from datetime import timedelta
 from core import models
 
 
@@ -103,3 +107,180 @@ class ModelTests(TestCase):
         mock_uuid.return_value = uuid
         file_path = models.entry_image_file_path(None, 'example.jpg')
         self.assertEqual(file_path, f'uploads/entry/{uuid}.jpg')
+
+    def test_entry_expires_at_set_from_plan(self):
+        """
+        Test new entries expire after their user's plan days to expire.
+        """
+        plan = models.Plan.objects.create(name='Basic', days_to_expire=10)
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test12345', plan=plan)
+        category = models.Category.objects.create(name='cat')
+        entry = models.Entry.objects.create(
+            user=user,
+            title='test entry',
+            description='a test description for entry',
+            price=Decimal('150.00'),
+            phone_number='+906667775454',
+            category=category
+        )
+        self.assertAlmostEqual(entry.expires_at,
+                               entry.created_at + timedelta(days=10),
+                               delta=timedelta(seconds=1))
+
+    def test_entry_without_plan_never_expires(self):
+        """
+        Test entries of users without a plan have no expiry date.
+        """
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test12345')
+        category = models.Category.objects.create(name='cat')
+        entry = models.Entry.objects.create(
+            user=user,
+            title='test entry',
+            description='a test description for entry',
+            price=Decimal('150.00'),
+            phone_number='+906667775454',
+            category=category
+        )
+        self.assertIsNone(entry.expires_at)
+
+    def test_entry_expires_at_recomputed_on_plan_changes(self):
+        """
+        Test expiry dates follow plan and user plan changes.
+        """
+        plan = models.Plan.objects.create(name='Basic', days_to_expire=10)
+        premium = models.Plan.objects.create(name='Premium',
+                                             days_to_expire=60)
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test12345', plan=plan)
+        category = models.Category.objects.create(name='cat')
+        entry = models.Entry.objects.create(
+            user=user,
+            title='test entry',
+            description='a test description for entry',
+            price=Decimal('150.00'),
+            phone_number='+906667775454',
+            category=category
+        )
+
+        plan.days_to_expire = 20
+        plan.save()
+        entry.refresh_from_db()
+        self.assertEqual(entry.expires_at - entry.created_at,
+                         timedelta(days=20))
+
+        user = get_user_model().objects.get(pk=user.pk)
+        user.plan = premium
+        user.save()
+        entry.refresh_from_db()
+        self.assertEqual(entry.expires_at - entry.created_at,
+                         timedelta(days=60))
+
+        user.plan = None
+        user.save()
+        entry.refresh_from_db()
+        self.assertIsNone(entry.expires_at)
+
+    def test_active_entries_count_follows_entries(self):
+        """
+        Test the active entry counter follows creates, deletes
+        and expiry of entries.
+        """
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test12345')
+        category = models.Category.objects.create(name='cat')
+        entries = [models.Entry.objects.create(
+            user=user,
+            title='test entry',
+            description='a test description for entry',
+            price=Decimal('150.00'),
+            phone_number='+906667775454',
+            category=category,
+        ) for _ in range(3)]
+        user.refresh_from_db()
+        self.assertEqual(user.active_entries_count, 3)
+
+        entries[0].delete()
+        models.Entry.objects.filter(pk=entries[1].pk).expire()
+        user.refresh_from_db()
+        self.assertEqual(user.active_entries_count, 1)
+
+        entries[1].refresh_from_db()
+        entries[1].delete()
+        user.refresh_from_db()
+        self.assertEqual(user.active_entries_count, 1)
+
+    def test_entry_rows_locked_in_delete_order(self):
+        """
+        Test expiry and deletes lock entries before their owners,
+        and owners before facets.
+        """
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test12345')
+        category = models.Category.objects.create(name='cat')
+        entries = [models.Entry.objects.create(
+            user=user,
+            title='test entry',
+            description='a test description for entry',
+            price=Decimal('150.00'),
+            phone_number='+906667775454',
+            category=category,
+        ) for _ in range(2)]
+
+        def locked_tables(run):
+            with CaptureQueriesContext(connection) as queries:
+                run()
+            tables = []
+            for query in queries:
+                sql = query['sql'].strip()
+                if sql.startswith('SELECT') and 'FOR UPDATE' not in sql:
+                    continue
+                written = re.match(
+                    r'(?:SELECT .*? FROM|UPDATE|DELETE FROM|INSERT INTO) '
+                    r'"?(core_\w+)', sql)
+                if written and written.group(1) not in tables:
+                    tables.append(written.group(1))
+            return tables
+
+        order = ['core_entry', 'core_user', 'core_entryfacet']
+        self.assertEqual(locked_tables(
+            models.Entry.objects.filter(pk=entries[0].pk).expire), order)
+        self.assertEqual(locked_tables(entries[1].delete), order)
+
+    def test_entry_limit_exceeded(self):
+        """
+        Test entries are not saved past max_entries.
+        """
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test12345')
+        category = models.Category.objects.create(name='cat')
+        entry_fields = {
+            'user': user,
+            'title': 'test entry',
+            'description': 'a test description for entry',
+            'price': Decimal('150.00'),
+            'phone_number': '+906667775454',
+            'category': category,
+        }
+        models.Entry(**entry_fields).save(max_entries=1)
+
+        with self.assertRaises(models.EntryLimitExceeded):
+            models.Entry(**entry_fields).save(max_entries=1)
+
+        self.assertEqual(models.Entry.objects.count(), 1)
+        user.refresh_from_db()
+        self.assertEqual(user.active_entries_count, 1)
+
+    def test_user_save_keeps_active_entries_count(self):
+        """
+        Test saving a stale user does not overwrite the counter.
+        """
+        user = get_user_model().objects.create_user(
+            'test@example.com', 'test12345')
+        get_user_model().objects.claim_entry_slot(user.pk)
+
+        user.first_name = 'name'
+        user.save()
+        user.refresh_from_db()
+        self.assertEqual(user.active_entries_count, 1)
@@ -0,0 +1,87 @@
+"""
+Tests for the api parsers.
+"""
+import io
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from core.parsers import ORJSONParser
+
+
+class ORJSONParserTests(SimpleTestCase):
+    """
+    Tests for parsing like JSONParser.
+    """
+
+    def parse(self, parser, body, encoding='utf-8'):
+        """
+        Return the data or the error parsing a body.
+        """
+        try:
+            return parser.parse(io.BytesIO(body),
+                                parser_context={'encoding': encoding})
+        except ParseError as exc:
+            return exc.detail
+
+    def assertSameParsing(self, body, encoding='utf-8'):
+        """
+        Assert the body parses like with JSONParser.
+        """
+        expected = self.parse(JSONParser(), body, encoding)
+        parsed = self.parse(ORJSONParser(), body, encoding)
+
+        self.assertEqual(parsed, expected)
+        self.assertEqual(repr(parsed), repr(expected))
+        return parsed
+
+    def test_bodies(self):
+        """
+        Test bodies parse like with JSONParser.
+        """
+        data = self.assertSameParsing(
+            '{"title": "ünïcödé 🚲", "price": "10.50", "count": 3, '
+            '"ratio": 0.1, "small": 1e-05, "tags": [null, true], '
+            '"title": "last"}'.encode())
+
+        self.assertEqual(data['title'], 'last')
+        self.assertSameParsing(b'  [1, -0, 1E5, 9223372036854775807]  ')
+
+    def test_long_integers(self):
+        """
+        Test integers beyond 64 bits parse like with JSONParser.
+        """
+        data = self.assertSameParsing(
+            b'{"id": 123456789012345678901234567890}')
+
+        self.assertEqual(data['id'], 123456789012345678901234567890)
+
+    def test_errors(self):
+        """
+        Test invalid bodies raise the errors of JSONParser.
+        """
+        for body in (b'', b'{"a": 1,}', b'{"a": NaN}', b'\xff',
+                     b'\xef\xbb\xbf{}', b'"\\ud800"', b'[1e400]'):
+            with self.subTest(body=body):
+                self.assertSameParsing(body)
+
+        self.assertIsInstance(self.parse(ORJSONParser(), b'[1,]'), str)
+
+    def test_other_encodings(self):
+        """
+        Test bodies in other encodings parse like with JSONParser.
+        """
+        data = self.assertSameParsing('{"a": "é"}'.encode('latin-1'),
+                                      encoding='latin-1')
+
+        self.assertEqual(data, {'a': 'é'})
+
+    def test_without_orjson(self):
+        """
+        Test bodies parse with JSONParser without orjson.
+        """
+        with patch('core.parsers.orjson', None):
+            self.assertSameParsing(b'{"a": [1, 2]}')
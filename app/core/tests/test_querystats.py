@@ -0,0 +1,197 @@
+"""
+Tests for query statistics.
+"""
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from rest_framework import status
+
+from core import snapshots
+from core.models import Category
+from core.querystats import (
+    FingerprintStats,
+    QueryStats,
+    combine_snapshots,
+    fingerprint,
+    load_snapshots,
+    query_stats,
+)
+from entry.tests.test_entry_api import ENTRIES_URL
+
+
+class FingerprintTests(SimpleTestCase):
+    """
+    Tests for query fingerprints.
+    """
+
+    def test_values_replaced(self):
+        """
+        Test literals, placeholders and value lists are collapsed.
+        """
+        self.assertEqual(
+            fingerprint("SELECT a  FROM t WHERE b = 'it''s' AND c = 12.5 "
+                        "AND d IN (%s, %s, %s) AND t2.e = -3 LIMIT 21"),
+            'SELECT a FROM t WHERE b = ? AND c = ? AND d IN (?+) '
+            'AND t2.e = ? LIMIT ?')
+        self.assertEqual(
+            fingerprint('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'),
+            fingerprint('INSERT INTO t (a, b) VALUES (%s, %s)'))
+
+    def test_names_kept(self):
+        """
+        Test digits in names are kept.
+        """
+        self.assertEqual(fingerprint('SELECT "t1"."col2" FROM t1'),
+                         'SELECT "t1"."col2" FROM t1')
+
+
+class FingerprintStatsTests(SimpleTestCase):
+    """
+    Tests for fingerprint statistics.
+    """
+
+    def test_percentile(self):
+        """
+        Test percentiles are within a bucket of the exact value.
+        """
+        stats = FingerprintStats()
+        for duration in range(1, 101):
+            stats.add(float(duration))
+
+        self.assertEqual(stats.count, 100)
+        self.assertEqual(stats.mean, 50.5)
+        self.assertEqual(stats.max, 100)
+        self.assertGreaterEqual(stats.percentile(0.95), 95)
+        self.assertLessEqual(stats.percentile(0.95), 95 * 1.25)
+        self.assertEqual(stats.percentile(1), 100)
+
+    def test_merge(self):
+        """
+        Test merged statistics add up.
+        """
+        first, second = FingerprintStats(), FingerprintStats()
+        first.add(1.0)
+        second.add(3.0)
+        second.add(5.0)
+        first.merge(FingerprintStats.load(
+            json.loads(json.dumps(second.dump()))))
+
+        self.assertEqual(first.count, 3)
+        self.assertEqual(first.total, 9.0)
+        self.assertEqual(first.max, 5.0)
+        self.assertEqual(sum(first.buckets.values()), 3)
+
+
+class QueryStatsTests(TestCase):
+    """
+    Tests for collecting query statistics.
+    """
+
+    def test_connection_queries_recorded(self):
+        """
+        Test queries of the connection are added up by fingerprint.
+        """
+        self.assertIn(query_stats, connection.execute_wrappers)
+        query_stats.reset()
+        for name in ('a', 'b', 'c'):
+            Category.objects.filter(name=name).exists()
+
+        counts = [stats.count for key, stats in query_stats.stats.items()
+                  if 'core_category' in key]
+        self.assertEqual(counts, [3])
+
+    @override_settings(QUERY_STATS=dict(settings.QUERY_STATS,
+                                        SLOW_QUERY_MS=10))
+    def test_slow_query_logged(self):
+        """
+        Test queries slower than SLOW_QUERY_MS are logged.
+        """
+        stats = QueryStats()
+        with self.assertLogs('core.querystats', 'WARNING') as logs:
+            stats.record('SELECT 1', 5)
+            stats.record('SELECT 2', 20)
+
+        self.assertEqual(len(logs.records), 1)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['slow_query'], 'SELECT ?')
+        self.assertEqual(record['duration_ms'], 20)
+
+    def test_flush(self):
+        """
+        Test the statistics are logged and written to DIR.
+        """
+        directory = tempfile.mkdtemp()
+        stats = QueryStats()
+        stats.record('SELECT * FROM t WHERE id = 1', 2)
+        stats.record('SELECT * FROM t WHERE id = 2', 4)
+
+        with override_settings(QUERY_STATS=dict(settings.QUERY_STATS,
+                                                DIR=directory)), \
+                self.assertLogs('core.querystats', 'INFO') as logs:
+            stats.flush()
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['count'], 2)
+        self.assertEqual(len(os.listdir(directory)), 1)
+        loaded = load_snapshots(directory)
+        self.assertEqual(loaded['SELECT * FROM t WHERE id = ?'].total, 6)
+
+    def test_exited_processes_combined(self):
+        """
+        Test the statistics of exited processes are combined
+        into one snapshot.
+        """
+        directory = tempfile.mkdtemp()
+        for pid, duration in ((101, 2), (102, 4)):
+            stats = QueryStats()
+            stats.record('SELECT * FROM t WHERE id = 1', duration)
+            snapshots.write(snapshots.snapshot_path(directory, pid),
+                            stats.snapshot())
+            snapshots.retire(directory, pid, combine_snapshots)
+
+        self.assertEqual(len(os.listdir(directory)), 1)
+        loaded = load_snapshots(directory)['SELECT * FROM t WHERE id = ?']
+        self.assertEqual((loaded.count, loaded.total, loaded.max), (2, 6, 4))
+
+    def test_flush_write_error_logged(self):
+        """
+        Test statistics which cannot be written are logged.
+        """
+        directory = os.path.join(tempfile.mkstemp()[1], 'stats')
+        stats = QueryStats()
+        stats.record('SELECT 1', 2)
+
+        with override_settings(QUERY_STATS=dict(settings.QUERY_STATS,
+                                                DIR=directory)), \
+                self.assertLogs('core.querystats', 'WARNING') as logs:
+            stats.flush()
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['dir'], directory)
+        self.assertIn('query_stats_error', record)
+
+    def test_flushed_after_requests(self):
+        """
+        Test statistics are flushed after a request, not
+        while its queries run.
+        """
+        directory = os.path.join(tempfile.mkstemp()[1], 'stats')
+        with override_settings(QUERY_STATS=dict(
+                settings.QUERY_STATS, DIR=directory, FLUSH_INTERVAL=0)), \
+                patch.object(query_stats, '_next_flush', 0), \
+                patch.object(query_stats, 'flush',
+                             wraps=query_stats.flush) as flush, \
+                self.assertLogs('core.querystats', 'WARNING'):
+            Category.objects.create(name='cat')
+            flush.assert_not_called()
+
+            res = self.client.get(ENTRIES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        flush.assert_called_once_with()
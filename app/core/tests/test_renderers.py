@@ -0,0 +1,153 @@
+"""
+Tests for the api renderers.
+"""
+import dataclasses
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import EntryImage
+from core.renderers import ORJSONRenderer
+from entry.tests.test_entry_api import (
+    ENTRIES_URL,
+    create_entry,
+    create_user,
+    detail_url,
+)
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    y: int
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def keys(self):
+        return ['x', 'y']
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """
+    Tests for rendering like JSONRenderer.
+    """
+
+    def assertSameRendering(self, data, accepted_media_type=None,
+                            renderer_context=None):
+        """
+        Assert the data renders like with JSONRenderer.
+        """
+        expected = JSONRenderer().render(
+            data, accepted_media_type, renderer_context)
+        rendered = ORJSONRenderer().render(
+            data, accepted_media_type, renderer_context)
+
+        self.assertEqual(rendered, expected)
+        return rendered
+
+    def test_values(self):
+        """
+        Test values render like with JSONRenderer.
+        """
+        self.assertSameRendering({
+            'price': Decimal('10.50'),
+            'utc': datetime(2024, 1, 2, 3, 4, 5, 6, tzinfo=timezone.utc),
+            'offset': datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone(
+                timedelta(hours=3, minutes=30))),
+            'naive': datetime(2024, 1, 2, 3, 4),
+            'date': date(2024, 1, 2),
+            'time': time(3, 4, 5, 600),
+            'duration': timedelta(days=1, seconds=2),
+            'uuid': uuid.UUID(int=1),
+            'lazy': _('This field is required.'),
+            'text': 'ünïcödé 🚲 "quoted" \\ / \n\t\x00\x1f',
+            'separators': 'line\u2028 paragraph\u2029',
+            'nested': [(1, 2), {'a': None, 'b': True}, []],
+            'iterated': {'a': 1, 'b': 2}.keys(),
+            'point': Point(1, 2),
+            'integers': [0, -1, 2 ** 63, 2 ** 64 - 1],
+            'bytes': b'blob',
+        })
+        self.assertSameRendering(['list'])
+        self.assertSameRendering('string')
+        self.assertEqual(self.assertSameRendering(None), b'')
+
+    def test_unsupported_data(self):
+        """
+        Test data orjson refuses renders like with JSONRenderer.
+        """
+        self.assertSameRendering({1: 'integer key', None: 'null key'})
+        self.assertSameRendering({'long': 2 ** 64, 'negative': -2 ** 63 - 1})
+        with self.assertRaises(TypeError):
+            ORJSONRenderer().render({'object': object()})
+
+    def test_indent(self):
+        """
+        Test indented output renders like with JSONRenderer.
+        """
+        data = {'a': [1, {'b': 'c'}]}
+
+        rendered = self.assertSameRendering(
+            data, 'application/json; indent=4')
+        self.assertIn(b'\n    ', rendered)
+        self.assertSameRendering(data, renderer_context={'indent': 2})
+
+    def test_ascii(self):
+        """
+        Test ascii output renders like with JSONRenderer.
+        """
+        with patch.object(JSONRenderer, 'ensure_ascii', True):
+            rendered = self.assertSameRendering({'text': 'ünïcödé'})
+
+        self.assertIn(b'\\u00fc', rendered)
+
+    def test_without_orjson(self):
+        """
+        Test data renders with JSONRenderer without orjson.
+        """
+        with patch('core.renderers.orjson', None):
+            self.assertSameRendering({'price': Decimal('1.00')})
+
+
+class ORJSONRenderedResponseTests(TestCase):
+    """
+    Tests for entry responses rendered like with JSONRenderer.
+    """
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}')
+        self.entry = create_entry(user=self.user, title='entry1',
+                                  price=Decimal('1234.50'))
+        EntryImage.objects.create(
+            image='uploads/entry/photo.jpg',
+            entry=self.entry,
+            variants={'thumbnail': {
+                'webp': 'uploads/entry/variants/photo-thumbnail.webp',
+                'jpeg': 'uploads/entry/variants/photo-thumbnail.jpg',
+            }})
+
+    def test_entry_responses(self):
+        """
+        Test entry lists and details with prices, dates and image
+        urls render like with JSONRenderer.
+        """
+        for url in (ENTRIES_URL, detail_url(self.entry.id)):
+            res = self.client.get(url)
+
+            self.assertEqual(ORJSONRenderer().render(res.data),
+                             JSONRenderer().render(res.data))
+            self.assertEqual(res.content, JSONRenderer().render(res.data))
+            self.assertIn(b'"price":"1234.50"', res.content)
+            self.assertIn(b'photo-thumbnail.webp', res.content)
@@ -0,0 +1,193 @@
+"""
+Tests for routing reads to replicas.
+"""
+from unittest.mock import patch
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.middleware import ReplicaRoutingMiddleware
+from core.routers import (
+    ReplicaRouter,
+    primary_reads,
+    replica_reads,
+    replica_reads_allowed,
+)
+from entry.tasks import mark_expired_entries
+from entry.tests.test_entry_api import (
+    ENTRIES_URL,
+    create_entry,
+    create_user,
+    detail_url,
+)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTests(TestCase):
+    """
+    Tests for the replica router.
+    """
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_use_primary_by_default(self):
+        """
+        Test reads outside replica blocks go to the primary.
+        """
+        self.assertFalse(replica_reads_allowed())
+        self.assertEqual(self.router.db_for_read(Token), 'default')
+
+    def test_replica_reads(self):
+        """
+        Test reads in replica blocks go to a replica and
+        writes to the primary.
+        """
+        with replica_reads():
+            self.assertIn(self.router.db_for_read(Token),
+                          ['replica1', 'replica2'])
+            self.assertEqual(self.router.db_for_write(Token), 'default')
+            with primary_reads():
+                self.assertEqual(self.router.db_for_read(Token), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """
+        Test reads go to the primary without replicas.
+        """
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Token), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        """
+        Test migrations only run on the primary.
+        """
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'core'))
+
+    def test_expiry_task_reads_primary(self):
+        """
+        Test the expiry task never touches a replica, the
+        replica aliases do not exist in tests.
+        """
+        user = create_user()
+        create_entry(user=user,
+                     expires_at=timezone.now() - timedelta(minutes=1))
+
+        result = mark_expired_entries()
+
+        self.assertEqual(result['expired'], 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingMiddlewareTests(TestCase):
+    """
+    Tests for the replica routing middleware.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.allowed = []
+
+        def get_response(request):
+            self.allowed.append(replica_reads_allowed())
+            return HttpResponse()
+
+        self.middleware = ReplicaRoutingMiddleware(get_response)
+
+    def request(self, method, path='/api/entry/entries/',
+                authorization='Token a'):
+        self.middleware(getattr(self.factory, method)(
+            path, HTTP_AUTHORIZATION=authorization))
+        return self.allowed[-1]
+
+    def test_safe_api_requests_read_replicas(self):
+        """
+        Test safe API requests read from the replicas.
+        """
+        self.assertTrue(self.request('get'))
+        self.assertTrue(self.request('head'))
+        self.assertFalse(self.request('get', path='/admin/'))
+        self.assertFalse(replica_reads_allowed())
+
+    def test_writes_pin_client_to_primary(self):
+        """
+        Test a client reads from the primary after a write
+        until the sticky period ends.
+        """
+        self.assertFalse(self.request('post'))
+        self.assertFalse(self.request('get'))
+        self.assertTrue(self.request('get', authorization='Token b'))
+
+        cache.clear()
+        self.assertTrue(self.request('get'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """
+        Test requests read from the primary without replicas.
+        """
+        self.assertFalse(self.request('get'))
+
+    async def test_async_requests(self):
+        """
+        Test async requests are routed like sync requests.
+        """
+        async def get_response(request):
+            self.allowed.append(replica_reads_allowed())
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        for method, authorization, allowed in [
+                ('get', 'Token a', True),
+                ('post', 'Token a', False),
+                ('get', 'Token a', False),
+                ('get', 'Token b', True)]:
+            await middleware(getattr(self.factory, method)(
+                ENTRIES_URL, HTTP_AUTHORIZATION=authorization))
+            self.assertEqual(self.allowed[-1], allowed)
+
+
+@override_settings(
+    DATABASE_REPLICAS=['default'],
+    ENTRY_RESPONSE_CACHE={'ALIAS': 'default', 'TIMEOUT': 0},
+)
+@patch('core.routers.random.choice', side_effect=lambda aliases: aliases[0])
+class ReplicaRoutingApiTests(TestCase):
+    """
+    Tests for the routing of API requests, with the
+    primary standing in for a replica.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.entry = create_entry(user=self.user)
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_list_reads_replica(self, patched_choice):
+        """
+        Test listing entries reads from a replica.
+        """
+        self.client.get(ENTRIES_URL)
+
+        self.assertTrue(patched_choice.called)
+
+    def test_reads_after_update_use_primary(self, patched_choice):
+        """
+        Test the client reads its own update from the primary.
+        """
+        self.client.patch(detail_url(self.entry.id), {'title': 'new'})
+        res = self.client.get(detail_url(self.entry.id))
+
+        self.assertEqual(res.data['title'], 'new')
+        self.assertFalse(patched_choice.called)
@@ -0,0 +1,154 @@
+"""
+Tests for request performance measurements.
+"""
+import json
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.timing import (
+    RequestTimings,
+    start_timings,
+    stop_timings,
+    time_serialization,
+)
+from entry.tests.test_entry_api import ENTRIES_URL, create_entry, create_user
+
+PERFORMANCE = {
+    'SERVER_TIMING': True,
+    'SLOW_REQUEST_MS': 60000,
+    'SLOW_SAMPLE_RATE': 1,
+    'TOP_QUERIES': 2,
+}
+
+
+def server_timing(response):
+    """
+    Return the Server-Timing metrics of a response by name.
+    """
+    metrics = {}
+    for metric in response['Server-Timing'].split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+
+    return metrics
+
+
+class RequestTimingsTests(SimpleTestCase):
+    """
+    Tests for request timings.
+    """
+
+    def test_slowest_queries_kept(self):
+        """
+        Test only the slowest queries are kept, slowest first.
+        """
+        timings = RequestTimings(top_queries=2)
+        for sql, duration in [('a', 0.1), ('b', 0.3), ('c', 0.2)]:
+            timings.record_query(sql, duration)
+
+        self.assertEqual(timings.db_count, 3)
+        self.assertAlmostEqual(timings.db_time, 0.6)
+        self.assertEqual(timings.slowest_queries(),
+                         [('b', 300.0), ('c', 200.0)])
+
+    def test_serialization_without_queries(self):
+        """
+        Test queries run while serializing count as database time only.
+        """
+        timings, token = start_timings()
+        try:
+            with patch('core.timing.time.perf_counter',
+                       side_effect=[10.0, 10.5]), time_serialization():
+                timings.record_query('a', 0.2)
+        finally:
+            stop_timings(token)
+
+        self.assertAlmostEqual(timings.serialize_time, 0.3)
+        self.assertAlmostEqual(timings.db_time, 0.2)
+
+
+@override_settings(REQUEST_PERFORMANCE=PERFORMANCE)
+class PerformanceMiddlewareTests(TestCase):
+    """
+    Tests for the performance middleware.
+    """
+
+    def setUp(self):
+        cache.clear()
+        user = create_user()
+        create_entry(user=user)
+        token = Token.objects.create(user=user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_server_timing_header(self):
+        """
+        Test the queries, rendering and cache lookups of a
+        request are reported in the Server-Timing header.
+        """
+        with self.assertNumQueries(4):
+            res = self.client.get(ENTRIES_URL)
+        metrics = server_timing(res)
+
+        self.assertEqual(metrics['db']['desc'], '"4 queries"')
+        self.assertGreater(float(metrics['serialize']['dur']), 0)
+        self.assertGreater(float(metrics['render']['dur']), 0)
+        self.assertGreaterEqual(float(metrics['total']['dur']),
+                                float(metrics['db']['dur']))
+        # token and response lookups
+        self.assertEqual(metrics['cache']['desc'], '"0 hits 2 misses"')
+
+        res = self.client.get(ENTRIES_URL)
+        metrics = server_timing(res)
+
+        self.assertEqual(metrics['db']['desc'], '"0 queries"')
+        self.assertEqual(metrics['serialize']['dur'], '0.00')
+        self.assertEqual(metrics['cache']['desc'], '"2 hits 0 misses"')
+
+    def test_request_logged(self):
+        """
+        Test requests are logged as JSON lines without queries.
+        """
+        with self.assertLogs('core.performance', 'INFO') as logs:
+            self.client.get(ENTRIES_URL)
+
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'entry:entry-list')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['db_queries'], 4)
+        self.assertGreater(record['serialize_ms'], 0)
+        self.assertAlmostEqual(
+            record['app_ms'], record['total_ms'] - record['db_ms']
+            - record['serialize_ms'] - record['render_ms'], delta=0.05)
+        self.assertNotIn('slowest_queries', record)
+
+    @override_settings(REQUEST_PERFORMANCE={
+        **PERFORMANCE, 'SLOW_REQUEST_MS': 0})
+    def test_slow_request_logged_with_queries(self):
+        """
+        Test slow requests are logged as warnings with
+        their slowest queries.
+        """
+        with self.assertLogs('core.performance', 'WARNING') as logs:
+            self.client.get(ENTRIES_URL)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(len(record['slowest_queries']), 2)
+        sql, duration = record['slowest_queries'][0]
+        self.assertIn('SELECT', sql)
+
+    @override_settings(REQUEST_PERFORMANCE={
+        **PERFORMANCE, 'SERVER_TIMING': False})
+    def test_server_timing_disabled(self):
+        """
+        Test the header is left out when disabled.
+        """
+        res = self.client.get(ENTRIES_URL)
+
+        self.assertNotIn('Server-Timing', res)
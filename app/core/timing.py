@@ -0,0 +1,140 @@
+"""
+Per request performance measurements.
+
+The performance middleware starts a RequestTimings for every request.
+Database queries are timed by an execute wrapper installed on every
+connection, which finds the timings of the request through a context
+variable, also in the threads running the queries of async requests.
+Code serving from caches reports hits and misses with record_cache(),
+views serialize responses within time_serialization().
+"""
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Time, queries, serialization and cache lookups of one request.
+    """
+
+    def __init__(self, top_queries=5):
+        self.started = time.perf_counter()
+        self.db_count = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.serialize_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.top_queries = top_queries
+        # min heap of the slowest (duration, order, sql)
+        self._queries = []
+        self._order = itertools.count()
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Execute wrapper timing a query.
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record_query(sql, time.perf_counter() - started)
+
+    def record_query(self, sql, duration):
+        self.db_count += 1
+        self.db_time += duration
+        # parameters are left out, they may hold personal data
+        item = (duration, next(self._order), sql)
+        if len(self._queries) < self.top_queries:
+            heapq.heappush(self._queries, item)
+        elif self.top_queries:
+            heapq.heappushpop(self._queries, item)
+
+    def slowest_queries(self):
+        """
+        Return the slowest queries as (sql, milliseconds), slowest first.
+        """
+        return [(sql, round(duration * 1000, 2)) for duration, _, sql
+                in sorted(self._queries, reverse=True)]
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+
+def current_timings():
+    """
+    Return the timings of the current request or None.
+    """
+    return _current.get()
+
+
+def start_timings(top_queries=5):
+    """
+    Start timing a request, returning the timings and the token
+    resetting them with stop_timings().
+    """
+    timings = RequestTimings(top_queries)
+    return timings, _current.set(timings)
+
+
+def stop_timings(token):
+    _current.reset(token)
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    Execute wrapper timing a query for the current request.
+    """
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    return timings(execute, sql, params, many, context)
+
+
+def install(connection):
+    """
+    Time the queries of a connection, once however often it reconnects.
+    """
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+def record_cache(hit):
+    """
+    Count a cache hit or miss for the current request.
+    """
+    timings = _current.get()
+    if timings is None:
+        return
+
+    if hit:
+        timings.cache_hits += 1
+    else:
+        timings.cache_misses += 1
+
+
+@contextmanager
+def time_serialization():
+    """
+    Count the time spent in the block as serialization time of the
+    current request, less the queries run in it.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    db_time = timings.db_time
+    try:
+        yield
+    finally:
+        timings.serialize_time += max(
+            time.perf_counter() - started - (timings.db_time - db_time), 0)
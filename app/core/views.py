@@ -0,0 +1,28 @@
+"""
+Views for the core app.
+"""
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from core.metrics import default_registry
+
+EXPOSITION_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Return the metrics in the Prometheus text format, requiring
+    METRICS_TOKEN as a bearer token when it is set.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        if not hmac.compare_digest(
+                request.META.get('HTTP_AUTHORIZATION', ''), expected):
+            return HttpResponseForbidden()
+
+    return HttpResponse(default_registry.exposition(),
+                        content_type=EXPOSITION_CONTENT_TYPE)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EntryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'entry'
+
+    def ready(self):
+        from entry import signals  # noqa
@@ -0,0 +1,221 @@
+"""
+Async views for the entry read APIs, served under ASGI.
+
+They answer GET and HEAD of the entry list, entry detail and category
+list like the sync views, whose view classes they reuse for querysets,
+serializers and responses, but await the cache and the database
+instead of blocking a thread. Other methods, and requests negotiating
+another renderer than JSON, are passed on to the sync views.
+"""
+import time
+from functools import partial
+
+from asgiref.sync import sync_to_async
+
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse
+
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from core.timing import current_timings, time_serialization
+from entry.cache import acached_response
+from entry.categories import category_registry
+from entry.conditional import (
+    acached_entry_validators,
+    aconditional_response,
+    alist_validators,
+)
+from entry.views import category_response
+
+
+class AsyncReadView:
+    """
+    Base of the async views, wrapping the view function of a
+    sync view. Subclasses implement read().
+    """
+    read_methods = ('GET', 'HEAD')
+
+    def __init__(self, sync_view):
+        self.sync_view = sync_view
+
+    @classmethod
+    def as_view(cls, sync_view):
+        """
+        Return the async view function for a sync view function.
+        """
+        async def view(request, *args, **kwargs):
+            self = cls(sync_view)
+            return await self.dispatch(request, *args, **kwargs)
+
+        view.view_class = cls
+        # token authenticated like the sync views
+        view.csrf_exempt = True
+        return view
+
+    def sync_instance(self, request, *args, **kwargs):
+        """
+        Return the sync view class instance set up to answer a
+        request, as its view function would set it up.
+        """
+        view = self.sync_view.cls(**self.sync_view.initkwargs)
+        actions = getattr(self.sync_view, 'actions', None)
+        if actions is not None:
+            if 'get' in actions and 'head' not in actions:
+                actions = {**actions, 'head': actions['get']}
+            view.action_map = actions
+            for method, action in actions.items():
+                setattr(view, method, getattr(view, action))
+        view.setup(request, *args, **kwargs)
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in self.read_methods:
+            return await sync_to_async(self.sync_view)(
+                request, *args, **kwargs)
+
+        view = self.sync_instance(request, *args, **kwargs)
+        drf_request = view.initialize_request(request, *args, **kwargs)
+        view.request = drf_request
+        view.headers = view.default_response_headers
+        view.format_kwarg = view.get_format_suffix(**kwargs)
+        try:
+            renderer, media_type = view.perform_content_negotiation(
+                drf_request)
+        except exceptions.NotAcceptable:
+            renderer = None
+        if not isinstance(renderer, JSONRenderer):
+            # the browsable api renders in the sync view
+            return await sync_to_async(self.sync_view)(
+                request, *args, **kwargs)
+
+        drf_request.accepted_renderer = renderer
+        drf_request.accepted_media_type = media_type
+        try:
+            drf_request.version, drf_request.versioning_scheme = \
+                view.determine_version(drf_request, *args, **kwargs)
+            await self.authenticate(drf_request)
+            view.check_permissions(drf_request)
+            view.check_throttles(drf_request)
+            response = await self.read(view, drf_request, *args, **kwargs)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+
+        response = view.finalize_response(
+            drf_request, response, *args, **kwargs)
+        return self.render(response)
+
+    async def authenticate(self, request):
+        """
+        Authenticate a request like Request.user does on first access.
+        """
+        for authenticator in request.authenticators:
+            try:
+                user_auth_tuple = await authenticator.aauthenticate(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+
+        request._not_authenticated()
+
+    def render(self, response):
+        """
+        Return a rendered copy of a response. The handler renders
+        deferred responses in a thread, rendered ones are sent as is.
+        """
+        if not isinstance(response, Response):
+            return response
+
+        started = time.perf_counter()
+        response.render()
+        timings = current_timings()
+        if timings is not None:
+            timings.render_time += time.perf_counter() - started
+
+        return HttpResponse(response.content, status=response.status_code,
+                            headers=response.headers)
+
+    async def read(self, view, request, *args, **kwargs):
+        raise NotImplementedError('read() must be implemented.')
+
+    async def filter_queryset(self, view, queryset):
+        """
+        Filter a queryset with the backends of the view, awaiting
+        the ones filtering asynchronously.
+        """
+        for backend in view.filter_backends:
+            backend = backend()
+            if hasattr(backend, 'afilter_queryset'):
+                queryset = await backend.afilter_queryset(
+                    view.request, queryset, view)
+            else:
+                queryset = backend.filter_queryset(
+                    view.request, queryset, view)
+        return queryset
+
+
+class EntryListView(AsyncReadView):
+    """
+    Async entry list, cached for every user.
+    """
+
+    async def read(self, view, request, *args, **kwargs):
+        queryset = await self.filter_queryset(view, view.get_queryset())
+        get_response = partial(acached_response, request, 'list',
+                               partial(self.list, view, queryset))
+        return await aconditional_response(
+            request, await alist_validators(request), get_response)
+
+    async def list(self, view, queryset):
+        page = await view.paginator.apaginate_queryset(
+            queryset, view.request, view)
+        with time_serialization():
+            serializer = view.get_serializer(page, many=True)
+            return view.get_paginated_response(serializer.data)
+
+
+class EntryDetailView(AsyncReadView):
+    """
+    Async entry detail, cached for every user.
+    """
+
+    async def read(self, view, request, *args, **kwargs):
+        queryset = view.get_queryset().filter(pk=kwargs['pk'])
+        get_response = partial(acached_response, request, 'retrieve',
+                               partial(self.retrieve, view))
+        return await aconditional_response(
+            request,
+            await acached_entry_validators(request, 'retrieve', queryset),
+            get_response)
+
+    async def retrieve(self, view):
+        queryset = await self.filter_queryset(view, view.get_queryset())
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        try:
+            entry = await queryset.aget(
+                **{view.lookup_field: view.kwargs[lookup_url_kwarg]})
+        except queryset.model.DoesNotExist:
+            raise Http404(f'No {queryset.model._meta.object_name} '
+                          f'matches the given query.')
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+
+        view.check_object_permissions(view.request, entry)
+        with time_serialization():
+            return Response(view.get_serializer(entry).data)
+
+
+class CategoryListView(AsyncReadView):
+    """
+    Async category list from the category registry.
+    """
+
+    async def read(self, view, request, *args, **kwargs):
+        return category_response(
+            request, await category_registry.asnapshot())
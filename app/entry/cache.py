@@ -0,0 +1,178 @@
+"""
+Response cache for the public entry endpoints.
+
+Entry list and retrieve responses are the same for every
+authenticated user. They are cached under keys holding the
+entries generation, a counter bumped on every change to entries
+or their images, so a bump makes every cached response unreachable.
+Responses are cached from the primary for a short while after a
+bump, replicas may not have the change yet.
+"""
+import hashlib
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from rest_framework.response import Response
+
+from core.routers import primary_reads, replica_reads_allowed
+from core.timing import record_cache
+
+GENERATION_KEY = 'entries:generation'
+CHANGED_AT_KEY = 'entries:changed-at'
+
+
+def response_cache():
+    """
+    Return the cache holding entry responses.
+    """
+    return caches[settings.ENTRY_RESPONSE_CACHE['ALIAS']]
+
+
+def entries_generation():
+    """
+    Return the current entries generation.
+    """
+    # a time based start never repeats a generation after eviction
+    return response_cache().get_or_set(GENERATION_KEY, time.time_ns, None)
+
+
+async def aentries_generation():
+    """
+    Async variant of entries_generation.
+    """
+    return await response_cache().aget_or_set(
+        GENERATION_KEY, time.time_ns, None)
+
+
+def entries_changed_at():
+    """
+    Return the time of the last entries generation bump, None
+    before the first bump.
+    """
+    return response_cache().get(CHANGED_AT_KEY)
+
+
+async def aentries_changed_at():
+    """
+    Async variant of entries_changed_at.
+    """
+    return await response_cache().aget(CHANGED_AT_KEY)
+
+
+def _bump_generation():
+    cache = response_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), None)
+    cache.set(CHANGED_AT_KEY, time.time(), None)
+
+
+def bump_entries_generation():
+    """
+    Make every cached entry response stale.
+
+    The generation is bumped again on commit so responses
+    cached from data read before the commit are dropped too.
+    """
+    _bump_generation()
+    transaction.on_commit(_bump_generation)
+
+
+def fill_reads():
+    """
+    Return a context for the reads filling the response cache,
+    sending them to the primary when entries changed recently.
+    """
+    if replica_reads_allowed():
+        changed_at = response_cache().get(CHANGED_AT_KEY, 0)
+        if time.time() - changed_at < settings.REPLICA_STICKY_SECONDS:
+            return primary_reads()
+
+    return nullcontext()
+
+
+async def afill_reads():
+    """
+    Async variant of fill_reads.
+    """
+    if replica_reads_allowed():
+        changed_at = await response_cache().aget(CHANGED_AT_KEY, 0)
+        if time.time() - changed_at < settings.REPLICA_STICKY_SECONDS:
+            return primary_reads()
+
+    return nullcontext()
+
+
+def request_digest(request, action):
+    params = sorted(request.query_params.lists())
+    return hashlib.md5(repr(
+        (action, request.get_host(), request.path, params)
+    ).encode()).hexdigest()
+
+
+def response_cache_key(request, action):
+    """
+    Return the cache key of a request to a view action.
+    """
+    digest = request_digest(request, action)
+    return f'entries:response:{entries_generation()}:{digest}'
+
+
+async def aresponse_cache_key(request, action):
+    """
+    Async variant of response_cache_key.
+    """
+    digest = request_digest(request, action)
+    return f'entries:response:{await aentries_generation()}:{digest}'
+
+
+def cached_response(request, action, get_response):
+    """
+    Return the cached response of a view action, calling
+    get_response and caching successful responses on misses.
+    """
+    timeout = settings.ENTRY_RESPONSE_CACHE['TIMEOUT']
+    if not timeout:
+        return get_response()
+
+    cache = response_cache()
+    key = response_cache_key(request, action)
+    data = cache.get(key)
+    record_cache(data is not None)
+    if data is not None:
+        return Response(data)
+
+    with fill_reads():
+        response = get_response()
+    if response.status_code == 200:
+        cache.set(key, response.data, timeout)
+
+    return response
+
+
+async def acached_response(request, action, get_response):
+    """
+    Async variant of cached_response, get_response is awaited.
+    """
+    timeout = settings.ENTRY_RESPONSE_CACHE['TIMEOUT']
+    if not timeout:
+        return await get_response()
+
+    cache = response_cache()
+    key = await aresponse_cache_key(request, action)
+    data = await cache.aget(key)
+    record_cache(data is not None)
+    if data is not None:
+        return Response(data)
+
+    with await afill_reads():
+        response = await get_response()
+    if response.status_code == 200:
+        await cache.aset(key, response.data, timeout)
+
+    return response
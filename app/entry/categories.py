@@ -0,0 +1,121 @@
+"""
+In-process registry of entry categories.
+"""
+import hashlib
+import json
+import threading
+import secrets
+
+from asgiref.sync import sync_to_async
+
+from django.core.cache import cache
+
+from core.models import Category
+from core.routers import primary_reads
+
+
+class CategoryRegistry:
+    """
+    Process wide snapshot of the category table.
+
+    The snapshot is loaded once and reused until its version
+    differs from the version key in the shared cache, which is
+    replaced whenever a category is saved or deleted.
+    """
+    version_key = 'category-registry:version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def shared_version(self):
+        """
+        Return the current version from the shared cache.
+        """
+        return cache.get_or_set(self.version_key,
+                                lambda: secrets.token_hex(16), None)
+
+    def snapshot(self):
+        """
+        Return the current snapshot, loading it when stale.
+        """
+        version = self.shared_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot['version'] == version:
+            return snapshot
+
+        return self.load(version)
+
+    async def asnapshot(self):
+        """
+        Async variant of snapshot, a stale snapshot is loaded
+        in a thread.
+        """
+        version = await cache.aget_or_set(
+            self.version_key, lambda: secrets.token_hex(16), None)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot['version'] == version:
+            return snapshot
+
+        return await sync_to_async(self.load)(version)
+
+    def load(self, version):
+        """
+        Load the snapshot of a version from the database.
+        """
+        # the snapshot is kept until the next change
+        with self._lock, primary_reads():
+            rows = list(Category.objects.order_by('pk').values_list(
+                'id', 'name'))
+            data = [{'id': pk, 'name': name} for pk, name in rows]
+            self._snapshot = {
+                'version': version,
+                'by_name': {name: pk for pk, name in rows},
+                'data': data,
+                'etag': hashlib.md5(
+                    json.dumps(data).encode()).hexdigest(),
+            }
+            return self._snapshot
+
+    def get(self, name):
+        """
+        Return the category with the given name or None.
+        """
+        return self.category(self.snapshot(), name)
+
+    async def aget(self, name):
+        """
+        Async variant of get.
+        """
+        return self.category(await self.asnapshot(), name)
+
+    def category(self, snapshot, name):
+        pk = snapshot['by_name'].get(name)
+        if pk is None:
+            return None
+
+        return Category.from_db('default', ['id', 'name'], [pk, name])
+
+    @property
+    def data(self):
+        """
+        Return the categories serialized as by CategorySerializer.
+        """
+        return self.snapshot()['data']
+
+    @property
+    def etag(self):
+        """
+        Return an entity tag of the serialized categories.
+        """
+        return self.snapshot()['etag']
+
+    def invalidate(self):
+        """
+        Drop the snapshot of this and every other process.
+        """
+        self._snapshot = None
+        cache.set(self.version_key, secrets.token_hex(16), None)
+
+
+category_registry = CategoryRegistry()
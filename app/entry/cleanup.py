@@ -0,0 +1,73 @@
+"""
+Removal of entry image files after their rows are deleted.
+
+Files are never deleted inline. The names of the files freed by a
+transaction are collected and handed to Celery in batches once it
+commits, and the tasks skip files still referenced by a row.
+"""
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+_local = threading.local()
+
+
+class FileCleanup:
+    """
+    Files to remove once the current transaction commits.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.collect_blobs = False
+
+    def __call__(self):
+        from entry.tasks import collect_image_blobs, delete_media_files
+
+        batch_size = settings.MEDIA_CLEANUP_BATCH_SIZE
+        for start in range(0, len(self.names), batch_size):
+            delete_media_files.delay(self.names[start:start + batch_size])
+        if self.collect_blobs:
+            collect_image_blobs.delay()
+
+
+def pending_cleanup():
+    """
+    Return the cleanup run when the current transaction commits.
+    """
+    cleanup = getattr(_local, 'cleanup', None)
+    # callbacks are dropped when a transaction rolls back
+    if not any(callback is cleanup
+               for _, callback, *_ in connection.run_on_commit):
+        cleanup = _local.cleanup = FileCleanup()
+        transaction.on_commit(cleanup)
+
+    return cleanup
+
+
+def schedule_file_deletion(name):
+    """
+    Delete an entry image file and its variants after commit.
+    """
+    if not name:
+        return
+
+    if connection.in_atomic_block:
+        pending_cleanup().names.append(name)
+    else:
+        cleanup = FileCleanup()
+        cleanup.names.append(name)
+        cleanup()
+
+
+def schedule_blob_collection():
+    """
+    Collect unreferenced image blobs after commit.
+    """
+    if connection.in_atomic_block:
+        pending_cleanup().collect_blobs = True
+    else:
+        cleanup = FileCleanup()
+        cleanup.collect_blobs = True
+        cleanup()
@@ -0,0 +1,196 @@
+"""
+Conditional GET support for the public entry endpoints.
+
+Entry validators are computed from the entry's edited_at and its
+images' uploaded_at with one aggregate query, which is cached under the
+entries generation like the responses, so 304 answers need no
+serialization. List validators are the entries generation and the time
+it was bumped, which every change to entries and their images moves,
+expiry and deletion included, so they need no query at all.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from core.timing import record_cache
+from entry.cache import (
+    aentries_changed_at,
+    aentries_generation,
+    afill_reads,
+    aresponse_cache_key,
+    entries_changed_at,
+    entries_generation,
+    fill_reads,
+    request_digest,
+    response_cache,
+    response_cache_key,
+)
+
+
+def list_validators(request):
+    """
+    Return the ETag and Last-Modified timestamp of an entry list.
+    """
+    return generation_validators(
+        request, entries_generation(), entries_changed_at())
+
+
+async def alist_validators(request):
+    """
+    Async variant of list_validators.
+    """
+    return generation_validators(
+        request, await aentries_generation(), await aentries_changed_at())
+
+
+def generation_validators(request, generation, changed_at):
+    etag = hashlib.md5(repr(
+        (request_digest(request, 'list'), generation)
+    ).encode()).hexdigest()
+    # sent once the second of the last bump is over, a later bump
+    # in the same second would not move it. none before the first bump
+    last_modified = None
+    if changed_at is not None and int(changed_at) < int(time.time()):
+        last_modified = int(changed_at)
+
+    return quote_etag(etag), last_modified
+
+
+def entry_validators(request, queryset):
+    """
+    Return the ETag and Last-Modified timestamp of the entries in
+    queryset, or None when there are no entries.
+    """
+    try:
+        values = queryset.aggregate(**validator_aggregates())
+    except (TypeError, ValueError, ValidationError):
+        # malformed lookups are answered by the view
+        return None
+
+    return validators_from_values(request, values)
+
+
+async def aentry_validators(request, queryset):
+    """
+    Async variant of entry_validators.
+    """
+    try:
+        values = await queryset.aaggregate(**validator_aggregates())
+    except (TypeError, ValueError, ValidationError):
+        return None
+
+    return validators_from_values(request, values)
+
+
+def validator_aggregates():
+    return {
+        'entry_count': Count('pk', distinct=True),
+        'image_count': Count('images'),
+        'last_edited': Max('edited_at'),
+        'last_uploaded': Max('images__uploaded_at'),
+    }
+
+
+def validators_from_values(request, values):
+    if not values['entry_count']:
+        return None
+
+    params = sorted(request.query_params.lists())
+    etag = hashlib.md5(repr(
+        (request.path, params, sorted(values.items()))
+    ).encode()).hexdigest()
+    last_modified = max(
+        value for value in (values['last_edited'], values['last_uploaded'])
+        if value is not None)
+
+    return quote_etag(etag), int(last_modified.timestamp())
+
+
+def cached_entry_validators(request, action, queryset):
+    """
+    Return the validators of a request to a view action,
+    cached until the entries generation changes.
+    """
+    timeout = settings.ENTRY_RESPONSE_CACHE['TIMEOUT']
+    if not timeout:
+        return entry_validators(request, queryset)
+
+    cache = response_cache()
+    key = response_cache_key(request, f'{action}:validators')
+    validators = cache.get(key)
+    record_cache(validators is not None)
+    if validators is None:
+        with fill_reads():
+            validators = entry_validators(request, queryset) or ()
+        cache.set(key, validators, timeout)
+
+    return validators or None
+
+
+async def acached_entry_validators(request, action, queryset):
+    """
+    Async variant of cached_entry_validators.
+    """
+    timeout = settings.ENTRY_RESPONSE_CACHE['TIMEOUT']
+    if not timeout:
+        return await aentry_validators(request, queryset)
+
+    cache = response_cache()
+    key = await aresponse_cache_key(request, f'{action}:validators')
+    validators = await cache.aget(key)
+    record_cache(validators is not None)
+    if validators is None:
+        with await afill_reads():
+            validators = await aentry_validators(request, queryset) or ()
+        await cache.aset(key, validators, timeout)
+
+    return validators or None
+
+
+def conditional_response(request, validators, get_response):
+    """
+    Return 304 Not Modified when the client has the current
+    entries, otherwise the response of get_response with
+    ETag and Last-Modified headers from validators.
+    """
+    if validators is None:
+        return get_response()
+
+    etag, last_modified = validators
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = get_response()
+        if response.status_code != 200:
+            return response
+
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+async def aconditional_response(request, validators, get_response):
+    """
+    Async variant of conditional_response, get_response is awaited.
+    """
+    if validators is None:
+        return await get_response()
+
+    etag, last_modified = validators
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = await get_response()
+        if response.status_code != 200:
+            return response
+
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
@@ -0,0 +1,158 @@
+"""
+Filter backends for entry APIs.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, IntegerField
+from django.db.models.functions import Cast
+
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+from core.models import ENTRY_SEARCH_CONFIG
+from entry.categories import category_registry
+
+# search results are ordered by relevance, then newest first
+SEARCH_ORDERING = ('-rank', '-created_at', '-id')
+
+
+def search_entries(queryset, terms):
+    """
+    Filter entries matching the search terms, ranked by relevance.
+
+    Only the newest ENTRY_SEARCH_CANDIDATES matches are ranked and
+    returned, a common word matches a large share of the entries.
+    The rank is scaled to an integer to keep cursor positions exact.
+    """
+    query = SearchQuery(terms, search_type='websearch',
+                        config=ENTRY_SEARCH_CONFIG)
+    # ids grow with creation, walking them backwards reads
+    # the table in insertion order
+    candidates = queryset.filter(search_vector=query).order_by(
+        '-id').values('pk')[:settings.ENTRY_SEARCH_CANDIDATES]
+    return queryset.filter(pk__in=candidates).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query) * 1000000,
+                  IntegerField()),
+    ).order_by(*SEARCH_ORDERING)
+
+
+class EntrySearchFilter(BaseFilterBackend):
+    """
+    Full text search over entry title and description.
+    """
+    search_param = 'search'
+
+    def get_search_terms(self, request):
+        return request.query_params.get(self.search_param, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        return search_entries(queryset, terms)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.search_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Search in entry title and description, '
+                               'the newest matches are ordered by '
+                               'relevance.',
+                'schema': {'type': 'string'},
+            },
+        ]
+
+
+class EntryFieldFilterSerializer(serializers.Serializer):
+    """
+    Serializer validating entry filter query parameters.
+    """
+    category = serializers.CharField(required=False)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2,
+                                         min_value=Decimal(0), required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2,
+                                         min_value=Decimal(0), required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+
+
+class EntryFieldFilter(BaseFilterBackend):
+    """
+    Filter entries by category name, price range and creation date.
+    """
+    lookups = {
+        'min_price': 'price__gte',
+        'max_price': 'price__lte',
+        'created_after': 'created_at__gte',
+        'created_before': 'created_at__lt',
+    }
+
+    def get_filters(self, request):
+        """
+        Return the validated filter parameters of the request.
+        """
+        serializer = EntryFieldFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        return serializer.validated_data
+
+    def filter_queryset(self, request, queryset, view):
+        filters = self.get_filters(request)
+        category = None
+        if 'category' in filters:
+            category = category_registry.get(filters['category'])
+
+        return self.filter_fields(queryset, filters, category)
+
+    async def afilter_queryset(self, request, queryset, view):
+        """
+        Async variant of filter_queryset.
+        """
+        filters = self.get_filters(request)
+        category = None
+        if 'category' in filters:
+            category = await category_registry.aget(filters['category'])
+
+        return self.filter_fields(queryset, filters, category)
+
+    def filter_fields(self, queryset, filters, category):
+        """
+        Filter entries by the validated parameters and the
+        category they name.
+        """
+        if 'category' in filters:
+            if category is None:
+                return queryset.none()
+            queryset = queryset.filter(category_id=category.pk)
+
+        return queryset.filter(**{
+            lookup: filters[param]
+            for param, lookup in self.lookups.items()
+            if param in filters
+        })
+
+    def get_schema_operation_parameters(self, view):
+        descriptions = {
+            'category': ('string', 'Only entries of the named category.'),
+            'min_price': ('number', 'Only entries at this price or above.'),
+            'max_price': ('number', 'Only entries at this price or below.'),
+            'created_after': ('string', 'Only entries created at or '
+                                        'after this ISO 8601 time.'),
+            'created_before': ('string', 'Only entries created before '
+                                         'this ISO 8601 time.'),
+        }
+        return [
+            {
+                'name': name,
+                'required': False,
+                'in': 'query',
+                'description': description,
+                'schema': {'type': schema_type},
+            }
+            for name, (schema_type, description) in descriptions.items()
+        ]
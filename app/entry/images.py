@@ -0,0 +1,81 @@
+"""
+Resized variants of entry images.
+
+Every variant is written in each of ENTRY_IMAGE_FORMATS under a path
+derived from the original file name, so building the variants of an
+image again overwrites the same files.
+"""
+import io
+import os
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from core import metrics
+
+# Pillow format name and file extension per variant format
+FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+
+def variant_path(name, variant, image_format):
+    """
+    Return the storage path of a variant of the image at name.
+    """
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    extension = FORMATS[image_format][1]
+
+    return os.path.join(directory, 'variants',
+                        f'{stem}-{variant}.{extension}')
+
+
+def open_image(file, size):
+    """
+    Return the RGB image in file, decoded at no less than size.
+    """
+    image = Image.open(file)
+    # JPEG images are decoded at a reduced scale when possible
+    image.draft('RGB', size)
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+
+    return image.convert('RGB')
+
+
+def build_variants(field_file):
+    """
+    Write the resized variants of an image field file and return
+    their storage paths by variant name and format.
+    """
+    sizes = sorted(settings.ENTRY_IMAGE_VARIANTS.items(),
+                   key=lambda item: item[1], reverse=True)
+    storage = field_file.storage
+    with field_file.open('rb'):
+        image = open_image(field_file, sizes[0][1])
+
+    variants = {}
+    # each variant is resized from the previous, larger one
+    for variant, size in sizes:
+        image.thumbnail(size, Image.LANCZOS)
+        variants[variant] = {}
+        for image_format in settings.ENTRY_IMAGE_FORMATS:
+            buffer = io.BytesIO()
+            image.save(buffer, format=FORMATS[image_format][0],
+                       quality=settings.ENTRY_IMAGE_QUALITY)
+            path = variant_path(field_file.name, variant, image_format)
+            storage.delete(path)
+            variants[variant][image_format] = storage.save(
+                path, ContentFile(buffer.getvalue()))
+            metrics.IMAGE_BYTES_STORED.labels('variant').inc(
+                buffer.tell())
+
+    return variants
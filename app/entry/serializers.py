@@ -7,6 +7,7 @@ from core.models import (
     Category,
     EntryImage,
 )
+from entry.categories import category_registry
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -19,16 +20,42 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
+def variant_urls(image, variant, context):
+    """
+    Return the urls of a variant of an entry image by format,
+    or None while the variant is not built.
+    """
+    paths = image.variants.get(variant)
+    if not paths:
+        return None
+
+    request = context.get('request')
+    urls = {}
+    for image_format, path in paths.items():
+        url = image.image.storage.url(path)
+        urls[image_format] = (request.build_absolute_uri(url)
+                              if request is not None else url)
+    return urls
+
+
 class EntryImageSerializer(serializers.ModelSerializer):
     """
     Serializer for uploading images to entries.
     """
+    variants = serializers.SerializerMethodField()
+
     class Meta:
         model = EntryImage
-        fields = ['id', 'image', 'uploaded_at']
-        read_only_fields = ['id', 'uploaded_at']
+        fields = ['id', 'image', 'uploaded_at', 'variants']
+        read_only_fields = ['id', 'uploaded_at', 'variants']
         extra_kwargs = {'image': {'required': 'True'}}
 
+    def get_variants(self, obj):
+        return {
+            variant: variant_urls(obj, variant, self.context)
+            for variant in obj.variants
+        }
+
 
 class EntrySerializer(serializers.ModelSerializer):
     """
@@ -37,13 +64,25 @@ class EntrySerializer(serializers.ModelSerializer):
     category = serializers.CharField()
     images = EntryImageSerializer(many=True,
                                   required=False)
+    thumbnail = serializers.SerializerMethodField()
 
     class Meta:
         model = Entry
         fields = ['id', 'title', 'price', 'created_at',
-                  'is_expired', 'category', 'images']
+                  'is_expired', 'category', 'images', 'thumbnail']
         read_only_fields = ['id', 'created_at', 'is_expired']
 
+    def get_thumbnail(self, obj):
+        """
+        Return the thumbnail urls of the first entry image.
+        """
+        # images are prefetched, pick the first without a query
+        images = sorted(obj.images.all(), key=lambda image: image.pk)
+        if not images:
+            return None
+
+        return variant_urls(images[0], 'thumbnail', self.context)
+
     def create(self, validated_data):
         """
         Create and return a new entry.
@@ -53,13 +92,14 @@ class EntrySerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {'category': 'This field is required.'})
 
-        try:
-            category_obj = Category.objects.get(name=category_name)
-        except Category.DoesNotExist:
+        category_obj = category_registry.get(category_name)
+        if category_obj is None:
             raise serializers.ValidationError(
                 {'category': 'The specified category does not exist.'})
 
-        entry = Entry.objects.create(**validated_data, category=category_obj)
+        max_entries = validated_data.pop('max_entries', None)
+        entry = Entry(**validated_data, category=category_obj)
+        entry.save(max_entries=max_entries)
 
         return entry
 
@@ -69,10 +109,8 @@ class EntrySerializer(serializers.ModelSerializer):
         """
         category_name = validated_data.pop('category', None)
         if category_name is not None:
-            try:
-                category_obj = Category.objects.get(
-                    name=category_name)
-            except Category.DoesNotExist:
+            category_obj = category_registry.get(category_name)
+            if category_obj is None:
                 raise serializers.ValidationError(
                     {"category": "The specified category does not exist."})
             instance.category = category_obj
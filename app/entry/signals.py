@@ -0,0 +1,44 @@
+"""
+Signal handlers for the entry app.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import Category, Entry, EntryImage
+from entry.cache import bump_entries_generation
+from entry.categories import category_registry
+from entry.cleanup import schedule_blob_collection, schedule_file_deletion
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_registry(sender, instance, **kwargs):
+    """
+    Drop category snapshots when a category changes, again
+    on commit so no process keeps a snapshot read before it.
+    """
+    category_registry.invalidate()
+    transaction.on_commit(category_registry.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Entry)
+@receiver([post_save, post_delete], sender=EntryImage)
+def invalidate_entry_responses(sender, instance, **kwargs):
+    """
+    Drop cached entry responses when entries, their images
+    or categories change.
+    """
+    bump_entries_generation()
+
+
+@receiver(post_delete, sender=EntryImage)
+def delete_image_files(sender, instance, **kwargs):
+    """
+    Remove the files of a deleted entry image after commit, blob
+    files are removed once no image references the blob.
+    """
+    if instance.blob_id is None:
+        schedule_file_deletion(instance.image.name)
+    else:
+        schedule_blob_collection()
@@ -1,14 +1,153 @@
+import logging
+import time
+from functools import partial
+
 from celery import shared_task
+from PIL import Image, UnidentifiedImageError
+from django.conf import settings
+from django.db import transaction
 from django.utils.timezone import now
-from core.models import Entry
+from django.db.models import Exists, OuterRef
+from core.models import Entry, EntryImage, ImageBlob
+from entry.cache import bump_entries_generation
+from entry.images import FORMATS, build_variants, variant_path
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task
-def mark_expired_entries():
-    entries = Entry.objects.filter(is_expired=False,
-                                   user__plan__isnull=False,
-                                   user__plan__isblank=False)
-    for entry in entries:
-        if (now() - entry.created_at).days >= entry.user.plan.days_to_expire:
-            entry.is_expired = True
-            entry.save()
+def mark_expired_entries(batch_size=None):
+    """
+    Mark entries past their expiry date as expired.
+
+    Due entries are expired with bulk updates of at most
+    batch_size rows, each batch in its own transaction.
+    """
+    batch_size = batch_size or settings.ENTRY_EXPIRY_BATCH_SIZE
+    cutoff = now()
+    started = time.monotonic()
+    expired = 0
+
+    while True:
+        with transaction.atomic():
+            ids = list(Entry.objects.filter(
+                is_expired=False,
+                expires_at__lte=cutoff,
+            ).order_by('pk').select_for_update(
+                skip_locked=True).values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+
+            expired += Entry.objects.filter(pk__in=ids).expire()
+
+    if expired:
+        bump_entries_generation()
+
+    duration = time.monotonic() - started
+    logger.info('Marked %d entries as expired in %.3f seconds.',
+                expired, duration)
+
+    return {'expired': expired, 'duration': round(duration, 3)}
+
+
+@shared_task(acks_late=True, autoretry_for=(OSError,),
+             retry_backoff=True, max_retries=3)
+def generate_image_variants(image_id):
+    """
+    Build the resized variants of an entry image.
+
+    Variants are written to fixed paths, so a retried or repeated
+    run replaces the files of the previous one.
+    """
+    image = EntryImage.objects.filter(pk=image_id).first()
+    if image is None:
+        return None
+
+    # images sharing a blob share its variants
+    variants = None
+    if image.blob_id is not None:
+        variants = EntryImage.objects.filter(
+            blob_id=image.blob_id,
+        ).exclude(variants={}).values_list('variants', flat=True).first()
+
+    try:
+        variants = variants or build_variants(image.image)
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        logger.warning('Entry image %d is not a usable image.', image_id)
+        return None
+
+    # the image may have been deleted while it was processed
+    if EntryImage.objects.filter(pk=image_id).update(variants=variants):
+        bump_entries_generation()
+
+    return variants
+
+
+def enqueue_image_variants(images):
+    """
+    Build the variants of the images once the
+    transaction creating them commits.
+    """
+    for image in images:
+        transaction.on_commit(
+            partial(generate_image_variants.delay, image.pk))
+
+
+@shared_task
+def collect_image_blobs(batch_size=None):
+    """
+    Delete image blobs no entry image references, with their
+    files and variant files.
+
+    Blobs are locked while their files are deleted, so an upload
+    taking a new reference on one waits and then stores it again.
+    """
+    batch_size = batch_size or settings.IMAGE_BLOB_GC_BATCH_SIZE
+    collected = 0
+
+    while True:
+        with transaction.atomic():
+            blobs = list(ImageBlob.objects.filter(refcount=0).exclude(
+                Exists(EntryImage.objects.filter(blob=OuterRef('pk'))),
+            ).order_by('pk').select_for_update(
+                skip_locked=True).values_list('pk', 'image')[:batch_size])
+            if not blobs:
+                break
+
+            storage = ImageBlob._meta.get_field('image').storage
+            for pk, name in blobs:
+                storage.delete(name)
+                for variant in settings.ENTRY_IMAGE_VARIANTS:
+                    for image_format in FORMATS:
+                        storage.delete(
+                            variant_path(name, variant, image_format))
+            ImageBlob.objects.filter(
+                pk__in=[pk for pk, name in blobs]).delete()
+            collected += len(blobs)
+
+    logger.info('Collected %d unreferenced image blobs.', collected)
+    return collected
+
+
+@shared_task
+def delete_media_files(names):
+    """
+    Delete entry image files and their variant files, skipping
+    files an entry image or image blob still references.
+    """
+    referenced = set(EntryImage.objects.filter(
+        image__in=names).values_list('image', flat=True))
+    referenced.update(ImageBlob.objects.filter(
+        image__in=names).values_list('image', flat=True))
+
+    storage = EntryImage._meta.get_field('image').storage
+    deleted = 0
+    for name in set(names) - referenced:
+        storage.delete(name)
+        for variant in settings.ENTRY_IMAGE_VARIANTS:
+            for image_format in FORMATS:
+                storage.delete(variant_path(name, variant, image_format))
+        deleted += 1
+
+    logger.info('Deleted the files of %d entry images.', deleted)
+    return deleted
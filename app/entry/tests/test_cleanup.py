@@ -0,0 +1,119 @@
+"""
+Tests for entry image file cleanup.
+"""
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from core.models import EntryImage, ImageBlob
+from entry.tasks import delete_media_files
+from entry.tests.test_entry_api import (
+    create_user,
+    create_entry,
+)
+from entry.tests.test_tasks import MEDIA_ROOT
+
+
+@patch('entry.tasks.collect_image_blobs.delay')
+@patch('entry.tasks.delete_media_files.delay')
+class FileCleanupTests(TestCase):
+    """
+    Tests for removing files after entry images are deleted.
+    """
+    def setUp(self):
+        self.entry = create_entry(user=create_user())
+
+    def create_images(self, count):
+        return [
+            EntryImage.objects.create(entry=self.entry,
+                                      image=f'uploads/entry/{n}.jpg')
+            for n in range(count)
+        ]
+
+    @override_settings(MEDIA_CLEANUP_BATCH_SIZE=2)
+    def test_files_are_deleted_in_batches_on_commit(
+            self, patched_delete, patched_collect):
+        """
+        Test deleting an entry sends its image files to cleanup
+        tasks in batches once the transaction commits.
+        """
+        self.create_images(3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.entry.delete()
+            patched_delete.assert_not_called()
+
+        names = [name for call in patched_delete.call_args_list
+                 for name in call.args[0]]
+        self.assertEqual(patched_delete.call_count, 2)
+        self.assertEqual(sorted(names), [
+            'uploads/entry/0.jpg',
+            'uploads/entry/1.jpg',
+            'uploads/entry/2.jpg',
+        ])
+        patched_collect.assert_not_called()
+
+    def test_blob_images_trigger_collection(
+            self, patched_delete, patched_collect):
+        """
+        Test deleting images stored as blobs collects blobs instead.
+        """
+        blob = ImageBlob.objects.create(
+            sha256='a' * 64, image='uploads/entry/a.jpg', size=1,
+            refcount=1)
+        EntryImage.objects.create(entry=self.entry, blob=blob,
+                                  image=blob.image.name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.entry.delete()
+
+        patched_delete.assert_not_called()
+        patched_collect.assert_called_once_with()
+
+    def test_rolled_back_delete_removes_nothing(
+            self, patched_delete, patched_collect):
+        """
+        Test files of deletions rolled back are kept.
+        """
+        self.create_images(1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.entry.delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        patched_delete.assert_not_called()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DeleteMediaFilesTests(TestCase):
+    """
+    Tests for the delete media files task.
+    """
+    def test_referenced_files_are_kept(self):
+        """
+        Test files still referenced by a row are not deleted.
+        """
+        entry = create_entry(user=create_user())
+        image = EntryImage(entry=entry)
+        image.image.save('kept.jpg', ContentFile(b'kept'))
+        orphan = EntryImage(entry=entry)
+        orphan.image.save('orphan.jpg', ContentFile(b'orphan'))
+        storage = orphan.image.storage
+        variant = 'uploads/entry/variants/' + orphan.image.name.split(
+            '/')[-1].replace('.jpg', '-thumbnail.webp')
+        storage.save(variant, ContentFile(b'variant'))
+        orphan_name = orphan.image.name
+        EntryImage.objects.filter(pk=orphan.pk).delete()
+
+        deleted = delete_media_files([image.image.name, orphan_name])
+
+        self.assertEqual(deleted, 1)
+        self.assertTrue(storage.exists(image.image.name))
+        self.assertFalse(storage.exists(orphan_name))
+        self.assertFalse(storage.exists(variant))
@@ -2,7 +2,9 @@
 Tests for entry epi.
 """
 from decimal import Decimal
+import hashlib
 import tempfile
+import itertools
 import os
 from datetime import date
 
@@ -15,15 +17,19 @@ from core.models import (
     Entry,
     Category,
     Plan,
-    EntryImage
+    EntryImage,
+    ImageBlob,
 )
 from entry.serializers import (
     EntrySerializer,
     EntryDetailSerializer,
     CategorySerializer,
 )
+from entry.categories import category_registry
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.core.files.images import ImageFile
@@ -48,6 +54,9 @@ def image_upload_url(entry_id):
     return reverse('entry:entry-upload-image', args=[entry_id])
 
 
+PHONE_NUMBERS = (f'+90666777{n:04d}' for n in itertools.count())
+
+
 def create_user(**params) -> object:
     """
     Helper function to create and return a new user.
@@ -58,7 +67,8 @@ def create_user(**params) -> object:
         'password': 'testpass123',
         'first_name': 'fname',
         'last_name': 'lname',
-        'phone_number': '+906667775454',
+        # phone numbers are unique among users
+        'phone_number': next(PHONE_NUMBERS),
         'date_of_birth': date.fromisoformat("2000-01-01"),
         'plan': plan,
     }
@@ -150,6 +160,35 @@ class PrivateEntryApiTests(TestCase):
         listed_entry = res.data['results'][0]
         self.assertNotEqual(listed_entry['images'], [])
 
+    def test_listed_entries_have_thumbnails(self):
+        """
+        Test listed entries have the thumbnail of their first image
+        once its variants are built.
+        """
+        entry = create_entry(user=self.user, title='test entry')
+        create_entry(user=self.user, title='no images')
+        EntryImage.objects.create(
+            image='uploads/entry/photo.jpg',
+            entry=entry,
+            variants={'thumbnail': {
+                'webp': 'uploads/entry/variants/photo-thumbnail.webp',
+                'jpeg': 'uploads/entry/variants/photo-thumbnail.jpg',
+            }})
+        EntryImage.objects.create(image='uploads/entry/later.jpg',
+                                  entry=entry)
+
+        res = self.client.get(ENTRIES_URL)
+
+        thumbnails = {listed['title']: listed['thumbnail']
+                      for listed in res.data['results']}
+        self.assertIsNone(thumbnails['no images'])
+        self.assertEqual(thumbnails['test entry'], {
+            'webp': 'http://testserver/static/media/uploads/entry/'
+                    'variants/photo-thumbnail.webp',
+            'jpeg': 'http://testserver/static/media/uploads/entry/'
+                    'variants/photo-thumbnail.jpg',
+        })
+
     def test_list_user_entries_successful(self):
         """
         Test listing use entries successful.
@@ -227,6 +266,27 @@ class PrivateEntryApiTests(TestCase):
 
         self.assertEqual(entry.user.plan.name, 'Basic')
 
+    def test_create_entry_resolves_category_without_query(self):
+        """
+        Test creating an entry looks the category up in the registry.
+        """
+        category_obj = Category.objects.create(name='cat1')
+        category_registry.snapshot()
+        payload = {
+            'title': 'test entry',
+            'description': 'a test description for entry',
+            'price': Decimal('150.00'),
+            'phone_number': '+906667775454',
+            'category': category_obj.name,
+        }
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.post(ENTRIES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['category'], category_obj.name)
+        for query in context.captured_queries:
+            self.assertNotIn('"core_category"', query['sql'])
+
     def create_entry_without_category_error(self):
         """
         Test creating a entry without a category returns error.
@@ -263,6 +323,28 @@ class PrivateEntryApiTests(TestCase):
         entries_count = Entry.objects.filter(user=self.user).count()
         self.assertEqual(entries_count, plan.max_entries)
 
+    def test_expired_entries_do_not_count_to_max_entries(self):
+        """
+        Test expired entries free their slot for new entries.
+        """
+        plan, created = Plan.objects.get_or_create(name='Basic')
+        category_obj = Category.objects.create(name='cat1')
+        entries = [create_entry(user=self.user)
+                   for _ in range(plan.max_entries)]
+        Entry.objects.filter(pk=entries[0].pk).expire()
+
+        payload = {
+            'title': 'test entry',
+            'description': 'a test description for entry',
+            'price': Decimal('150.00'),
+            'phone_number': '+906667775454',
+            'category': category_obj.name
+        }
+        res = self.client.post(ENTRIES_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.active_entries_count, plan.max_entries)
+
     def test_partial_update(self):
         """
         Test partial update is successful.
@@ -455,6 +537,141 @@ class ImageUploadTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertFalse(self.entry.images.all().exists())
 
+    def jpeg(self):
+        """
+        Return a temporary JPEG file.
+        """
+        temp_file = tempfile.NamedTemporaryFile(suffix=".jpg")
+        Image.new('RGB', (10, 10)).save(temp_file, format='JPEG')
+        temp_file.seek(0)
+        return temp_file
+
+    def test_upload_counts_existing_images(self):
+        """
+        Test images already on the entry count against the plan limit.
+        """
+        max_entry_images = self.user.plan.max_entry_images
+        EntryImage.objects.bulk_create([
+            EntryImage(entry=self.entry, image=f'uploads/entry/{n}.jpg')
+            for n in range(max_entry_images - 1)
+        ])
+        url = image_upload_url(self.entry.id)
+
+        res = self.client.post(url, {'images': [self.jpeg(), self.jpeg()]},
+                               format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data, {'message': 'Maximum images allowed: 1'})
+        self.assertEqual(self.entry.images.count(), max_entry_images - 1)
+
+        res = self.client.post(url, {'images': [self.jpeg()]},
+                               format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.entry.images.count(), max_entry_images)
+
+    def test_upload_to_full_entry_error(self):
+        """
+        Test uploads to entries holding max_entry_images images are
+        rejected with the image count message, whatever their size.
+        """
+        max_entry_images = self.user.plan.max_entry_images
+        EntryImage.objects.bulk_create([
+            EntryImage(entry=self.entry, image=f'uploads/entry/{n}.jpg')
+            for n in range(max_entry_images)
+        ])
+        url = image_upload_url(self.entry.id)
+        large_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+        large_file.write(b'\xff\xd8\xff' + b'\0' * 2048)
+        large_file.seek(0)
+
+        for images in ([self.jpeg()], [large_file]):
+            with override_settings(ENTRY_IMAGE_MAX_UPLOAD_SIZE=1024):
+                res = self.client.post(url, {'images': images},
+                                       format='multipart')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(res.data, {
+                'message': 'Maximum images allowed: 0'})
+        self.assertEqual(self.entry.images.count(), max_entry_images)
+
+    def test_upload_entry_and_image_count_in_one_query(self):
+        """
+        Test the entry and its image count are read with one query.
+        """
+        url = image_upload_url(self.entry.id)
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.post(url, {'images': [self.jpeg()]},
+                             format='multipart')
+
+        selects = [query for query in context.captured_queries
+                   if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+        self.assertIn('COUNT', selects[0]['sql'])
+
+    @override_settings(ENTRY_IMAGE_MAX_UPLOAD_SIZE=1024)
+    def test_upload_too_large_image_error(self):
+        """
+        Test images over the size limit are rejected.
+        """
+        url = image_upload_url(self.entry.id)
+        large_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+        large_file.write(b'\xff\xd8\xff' + b'\0' * 2048)
+        large_file.seek(0)
+
+        res = self.client.post(url, {'images': [large_file]},
+                               format='multipart')
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(self.entry.images.exists())
+
+    def test_identical_uploads_share_a_blob(self):
+        """
+        Test identical images are stored once and referenced
+        by every entry image holding them.
+        """
+        other_entry = create_entry(user=self.user)
+        image_file = self.jpeg()
+        content = image_file.read()
+
+        for entry in [self.entry, other_entry, self.entry]:
+            image_file.seek(0)
+            res = self.client.post(image_upload_url(entry.id),
+                                   {'images': [image_file]},
+                                   format='multipart')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        blob = ImageBlob.objects.get()
+        self.assertEqual(blob.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(blob.refcount, 3)
+        self.assertEqual(
+            set(EntryImage.objects.values_list('image', flat=True)),
+            {blob.image.name})
+        with blob.image.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+
+        other_entry.delete()
+
+        blob.refresh_from_db()
+        self.assertEqual(blob.refcount, 2)
+
+    def test_upload_not_an_image_error(self):
+        """
+        Test files not starting like an image are rejected.
+        """
+        url = image_upload_url(self.entry.id)
+        text_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+        text_file.write(b'just some text pretending to be a photo')
+        text_file.seek(0)
+
+        res = self.client.post(url, {'images': [self.jpeg(), text_file]},
+                               format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(self.entry.images.exists())
+
 
 class UserWithIncompleteProfileTests(TestCase):
     """
@@ -509,3 +726,88 @@ class CategoryApiTests(TestCase):
         categories = Category.objects.all()
         serializer = CategorySerializer(categories, many=True)
         self.assertEqual(res.data, serializer.data)
+
+    def test_list_categories_from_registry(self):
+        """
+        Test categories are listed without queries once loaded
+        and reloaded after a category changes.
+        """
+        Category.objects.create(name='cat1')
+        self.client.get(CATEGORY_LIST_URL)
+        with self.assertNumQueries(0):
+            res = self.client.get(CATEGORY_LIST_URL)
+        self.assertEqual(len(res.data), 1)
+
+        Category.objects.create(name='cat2')
+        res = self.client.get(CATEGORY_LIST_URL)
+        self.assertEqual([category['name'] for category in res.data],
+                         ['cat1', 'cat2'])
+
+    def test_list_categories_not_modified(self):
+        """
+        Test listing categories with a matching ETag returns 304.
+        """
+        Category.objects.create(name='cat1')
+        res = self.client.get(CATEGORY_LIST_URL)
+        etag = res['ETag']
+
+        res = self.client.get(CATEGORY_LIST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Category.objects.create(name='cat2')
+        res = self.client.get(CATEGORY_LIST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+
+class EntryCursorPaginationTests(TestCase):
+    """
+    Tests for keyset pagination of entry lists.
+    """
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(35):
+            create_entry(user=self.user, title=f'entry {i}')
+
+    def test_cursor_pagination_walks_all_entries(self):
+        """
+        Test following next cursors returns every entry once, in order.
+        """
+        res = self.client.get(ENTRIES_URL, {'pagination': 'cursor'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', res.data)
+        self.assertEqual(len(res.data['results']), 30)
+        self.assertIsNone(res.data['previous'])
+
+        ids = [entry['id'] for entry in res.data['results']]
+        res = self.client.get(res.data['next'])
+        self.assertEqual(len(res.data['results']), 5)
+        self.assertIsNone(res.data['next'])
+        self.assertIsNotNone(res.data['previous'])
+        ids += [entry['id'] for entry in res.data['results']]
+
+        expected = Entry.objects.order_by(
+            '-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_cursor_pagination_runs_no_count_query(self):
+        """
+        Test cursor pages do not count the whole table.
+        """
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(USER_ENTRIES_URL, {'pagination': 'cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for query in context.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_page_number_pagination_is_default(self):
+        """
+        Test page number pagination is kept for existing clients.
+        """
+        res = self.client.get(ENTRIES_URL, {'page': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 35)
+        self.assertEqual(len(res.data['results']), 5)
@@ -0,0 +1,173 @@
+"""
+Tests for the async entry views.
+"""
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import include, path
+
+from core.models import Category, Entry
+from entry.urls import async_urlpatterns
+from entry.tests.test_entry_api import (
+    CATEGORY_LIST_URL,
+    ENTRIES_URL,
+    create_entry,
+    create_user,
+    detail_url,
+)
+from user.authentication import token_cache
+
+urlpatterns = [
+    path('api/entry/', include((async_urlpatterns, 'entry'))),
+]
+
+NO_CACHE = {'ALIAS': 'default', 'TIMEOUT': 0}
+COMPARED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Allow',
+                    'Vary', 'WWW-Authenticate')
+
+
+class AsyncEntryViewTests(TestCase):
+    """
+    Tests for the async entry views answering like the sync views.
+    """
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        self.async_client = AsyncClient()
+        self.entry = create_entry(user=self.user, title='entry1')
+        create_entry(user=self.user, title='entry2', price=Decimal('5'))
+
+    def async_request(self, method, url, **kwargs):
+        """
+        Send a request to the async views.
+        """
+        async def send():
+            return await getattr(self.async_client, method)(url, **kwargs)
+
+        kwargs.setdefault('headers', {}).setdefault(
+            'authorization', f'Token {self.token}')
+        with override_settings(ROOT_URLCONF=__name__):
+            return async_to_sync(send)()
+
+    def async_get(self, url, **headers):
+        return self.async_request('get', url, headers=headers)
+
+    def assertSameResponse(self, url, **headers):
+        """
+        Assert the async and sync views answer a url alike.
+        """
+        res = self.async_get(url, **headers)
+        extra = {f'HTTP_{name.upper().replace("-", "_")}': value
+                 for name, value in headers.items()}
+        expected = self.client.get(url, **extra)
+
+        self.assertEqual(res.status_code, expected.status_code)
+        self.assertEqual(res.content, expected.content)
+        for header in COMPARED_HEADERS:
+            self.assertEqual(res.get(header), expected.get(header), header)
+        return res
+
+    @override_settings(ENTRY_RESPONSE_CACHE=NO_CACHE)
+    def test_list_matches_sync(self):
+        """
+        Test listing entries answers like the sync view.
+        """
+        res = self.assertSameResponse(ENTRIES_URL)
+        self.assertEqual(res.json()['count'], 2)
+        self.assertIn('serialize;dur=', res['Server-Timing'])
+
+        self.assertSameResponse(f'{ENTRIES_URL}?category=test+cat'
+                                f'&min_price=100')
+        self.assertSameResponse(f'{ENTRIES_URL}?category=unknown')
+        self.assertSameResponse(f'{ENTRIES_URL}?pagination=cursor')
+        self.assertSameResponse(f'{ENTRIES_URL}?page=5')
+        self.assertSameResponse(f'{ENTRIES_URL}?min_price=x')
+
+    @override_settings(ENTRY_RESPONSE_CACHE=NO_CACHE)
+    def test_retrieve_matches_sync(self):
+        """
+        Test retrieving entries answers like the sync view.
+        """
+        self.assertSameResponse(detail_url(self.entry.id))
+        self.assertSameResponse(detail_url(self.entry.id + 100))
+        self.assertSameResponse(
+            f'{detail_url(self.entry.id)}?category=unknown')
+
+    def test_category_list_matches_sync(self):
+        """
+        Test listing categories answers like the sync view.
+        """
+        etag = self.assertSameResponse(CATEGORY_LIST_URL)['ETag']
+
+        res = self.assertSameResponse(CATEGORY_LIST_URL, if_none_match=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_authentication_required(self):
+        """
+        Test requests without a valid token are refused like
+        by the sync view.
+        """
+        self.client.credentials()
+        res = self.assertSameResponse(ENTRIES_URL, authorization='')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+        self.assertSameResponse(ENTRIES_URL, authorization='Token invalid')
+        self.assertSameResponse(ENTRIES_URL, authorization='Token a b')
+
+    def test_cached_responses_shared(self):
+        """
+        Test the async views answer from the responses and
+        validators cached by the sync views, and the other way round.
+        """
+        etag = self.client.get(ENTRIES_URL)['ETag']
+        Entry.objects.filter(pk=self.entry.pk).update(title='changed')
+
+        res = self.async_get(ENTRIES_URL)
+        self.assertEqual(res['ETag'], etag)
+        self.assertNotIn('changed', res.content.decode())
+
+        res = self.async_get(ENTRIES_URL, if_none_match=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        url = detail_url(self.entry.id)
+        content = self.async_get(url).content
+        self.assertEqual(self.client.get(url).content, content)
+
+    def test_other_methods_use_sync_view(self):
+        """
+        Test writes are answered by the sync views.
+        """
+        Category.objects.create(name='Electronics')
+        payload = {
+            'title': 'created',
+            'description': 'created through the async urls',
+            'price': '10.00',
+            'phone_number': '+906667775454',
+            'category': 'Electronics',
+        }
+        res = self.async_request('post', ENTRIES_URL, data=payload,
+                                 content_type='application/json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Entry.objects.filter(title='created').exists())
+
+    def test_other_renderers_use_sync_view(self):
+        """
+        Test requests not accepting json are answered by the sync views.
+        """
+        res = self.assertSameResponse(ENTRIES_URL, accept='application/xml')
+
+        self.assertEqual(res.status_code, status.HTTP_406_NOT_ACCEPTABLE)
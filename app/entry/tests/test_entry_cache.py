@@ -0,0 +1,146 @@
+"""
+Tests for the entry response cache.
+"""
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+from PIL import Image
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from entry.cache import CHANGED_AT_KEY
+from entry.tasks import mark_expired_entries
+from entry.tests.test_entry_api import (
+    ENTRIES_URL,
+    create_user,
+    create_entry,
+    detail_url,
+    image_upload_url,
+)
+
+
+class EntryResponseCacheTests(TestCase):
+    """
+    Tests for caching entry list and retrieve responses.
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.entry = create_entry(user=self.user, title='entry1')
+
+    def test_list_served_from_cache(self):
+        """
+        Test a repeated list request runs no queries.
+        """
+        res = self.client.get(ENTRIES_URL)
+        with self.assertNumQueries(0):
+            cached_res = self.client.get(ENTRIES_URL)
+
+        self.assertEqual(cached_res.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached_res.data, res.data)
+
+    def test_retrieve_served_from_cache(self):
+        """
+        Test a repeated retrieve request runs no queries.
+        """
+        url = detail_url(self.entry.id)
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            res = self.client.get(url)
+
+        self.assertEqual(res.data['title'], 'entry1')
+
+    def test_query_params_are_cached_apart(self):
+        """
+        Test different pages are different cache entries.
+        """
+        self.client.get(ENTRIES_URL)
+        res = self.client.get(ENTRIES_URL, {'pagination': 'cursor'})
+
+        self.assertNotIn('count', res.data)
+
+    def test_entry_changes_invalidate_cache(self):
+        """
+        Test created and updated entries are listed after a cached list.
+        """
+        self.client.get(ENTRIES_URL)
+        create_entry(user=self.user, title='entry2')
+        self.client.patch(detail_url(self.entry.id), {'title': 'new title'})
+
+        res = self.client.get(ENTRIES_URL)
+        titles = [entry['title'] for entry in res.data['results']]
+        self.assertEqual(titles, ['entry2', 'new title'])
+
+    def test_expiry_invalidates_cache(self):
+        """
+        Test expired entries are not served from the cache.
+        """
+        self.client.get(ENTRIES_URL)
+        self.entry.expires_at = timezone.now() - timedelta(minutes=1)
+        self.entry.save()
+        mark_expired_entries()
+
+        res = self.client.get(ENTRIES_URL)
+        self.assertEqual(res.data['results'], [])
+
+    def test_image_upload_invalidates_cache(self):
+        """
+        Test uploaded images are listed after a cached retrieve.
+        """
+        url = detail_url(self.entry.id)
+        self.client.get(url)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            self.client.post(image_upload_url(self.entry.id),
+                             {'images': [image_file]}, format='multipart')
+
+        res = self.client.get(url)
+        self.assertEqual(len(res.data['images']), 1)
+        for image in self.entry.images.all():
+            image.image.delete()
+
+    def test_not_found_is_not_cached(self):
+        """
+        Test missing entries are not cached.
+        """
+        url = detail_url(self.entry.id + 1)
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    @override_settings(ENTRY_RESPONSE_CACHE={'ALIAS': 'default',
+                                             'TIMEOUT': 0})
+    def test_cache_disabled(self):
+        """
+        Test responses are not cached with a zero timeout.
+        """
+        self.client.get(ENTRIES_URL)
+        with self.assertNumQueries(3):
+            self.client.get(ENTRIES_URL)
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_cache_filled_from_primary_after_change(self):
+        """
+        Test responses are cached from the primary while replicas
+        may lag behind a change, and from replicas afterwards.
+        """
+        url = detail_url(self.entry.id)
+        with patch('core.routers.random.choice',
+                   side_effect=lambda aliases: aliases[0]) as choice:
+            self.client.get(url)
+            self.assertFalse(choice.called)
+
+            cache.set(CHANGED_AT_KEY, 0, None)
+            self.client.get(ENTRIES_URL)
+            self.assertTrue(choice.called)
@@ -0,0 +1,157 @@
+"""
+Tests for conditional GET on entry endpoints.
+"""
+from datetime import timedelta
+from unittest.mock import patch
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.http import http_date
+
+from core.models import Entry, EntryImage
+from entry.tasks import mark_expired_entries
+from entry.tests.test_entry_api import (
+    ENTRIES_URL,
+    create_user,
+    create_entry,
+    detail_url,
+)
+
+
+class EntryConditionalGetTests(TestCase):
+    """
+    Tests for ETag and Last-Modified on entry list and retrieve.
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.entry = create_entry(user=self.user, title='entry1')
+
+    def test_retrieve_not_modified(self):
+        """
+        Test retrieving with a matching ETag returns 304 without a body.
+        """
+        url = detail_url(self.entry.id)
+        res = self.client.get(url)
+        self.assertEqual(res['Last-Modified'],
+                         http_date(self.entry.edited_at.timestamp()))
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_retrieve_modified_since(self):
+        """
+        Test retrieving with If-Modified-Since returns 304 until
+        the entry changes.
+        """
+        url = detail_url(self.entry.id)
+        res = self.client.get(url)
+        last_modified = res['Last-Modified']
+
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_image_upload_changes_etag(self):
+        """
+        Test new images give the entry a new ETag.
+        """
+        url = detail_url(self.entry.id)
+        etag = self.client.get(url)['ETag']
+        EntryImage.objects.create(entry=self.entry,
+                                  image='uploads/entry/x.jpg')
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_list_not_modified_before_serialization(self):
+        """
+        Test a list with a matching ETag returns 304 from the cache.
+        """
+        etag = self.client.get(ENTRIES_URL)['ETag']
+
+        with self.assertNumQueries(0), patch(
+                'entry.views.cached_response') as patched_response:
+            res = self.client.get(ENTRIES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        patched_response.assert_not_called()
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_list_etag_changes_with_entries(self):
+        """
+        Test list ETags change with entries and query params.
+        """
+        etag = self.client.get(ENTRIES_URL)['ETag']
+        self.assertNotEqual(
+            self.client.get(ENTRIES_URL, {'page': 1})['ETag'], etag)
+
+        create_entry(user=self.user, title='entry2')
+        res = self.client.get(ENTRIES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_missing_entry_has_no_validators(self):
+        """
+        Test retrieving a missing entry returns 404 without an ETag.
+        """
+        res = self.client.get(detail_url(self.entry.id + 1))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('ETag', res)
+
+    def test_list_modified_since(self):
+        """
+        Test list Last-Modified moves with every change, deletion
+        and expiry included, once the second of the change is over.
+        """
+        with patch('time.time') as now:
+            now.return_value = 1000.5
+            entry = create_entry(user=self.user, title='entry2')
+            now.return_value = 1000.7
+            self.assertNotIn('Last-Modified', self.client.get(ENTRIES_URL))
+
+            now.return_value = 1002
+            last_modified = self.client.get(ENTRIES_URL)['Last-Modified']
+            self.assertEqual(last_modified, http_date(1000))
+            res = self.client.get(ENTRIES_URL,
+                                  HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            now.return_value = 1002.2
+            entry.delete()
+            now.return_value = 1003
+            res = self.client.get(ENTRIES_URL,
+                                  HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            last_modified = res['Last-Modified']
+            self.assertEqual(last_modified, http_date(1002))
+
+            self.entry.expires_at = timezone.now() - timedelta(minutes=1)
+            Entry.objects.filter(pk=self.entry.pk).update(
+                expires_at=self.entry.expires_at)
+            now.return_value = 1003.5
+            mark_expired_entries()
+            now.return_value = 1004
+            res = self.client.get(ENTRIES_URL,
+                                  HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.data['results'], [])
+
+    def test_list_validators_without_queries(self):
+        """
+        Test list validators are not computed from the entries.
+        """
+        etag = self.client.get(f'{ENTRIES_URL}?pagination=cursor')['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(f'{ENTRIES_URL}?pagination=cursor',
+                                  HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
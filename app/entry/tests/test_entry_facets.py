@@ -0,0 +1,219 @@
+"""
+Tests for entry filters and facet counts.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Category, Entry, EntryFacet, price_bucket
+from entry.tests.test_entry_api import (
+    ENTRIES_URL,
+    create_user,
+    create_entry,
+)
+
+FACETS_URL = reverse('entry:entry-facets')
+
+
+def facet_counts():
+    """
+    Return the non zero facet counts by (category name, price bucket).
+    """
+    return {
+        (name, bucket): count
+        for name, bucket, count in EntryFacet.objects.filter(
+            count__gt=0).values_list('category__name', 'price_bucket', 'count')
+    }
+
+
+class EntryFilterTests(TestCase):
+    """
+    Tests for filtering entries.
+    """
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.cars = Category.objects.create(name='cars')
+
+    def titles(self, params):
+        res = self.client.get(ENTRIES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [entry['title'] for entry in res.data['results']]
+
+    def test_filter_by_category(self):
+        """
+        Test filtering entries by category name.
+        """
+        create_entry(user=self.user, title='sedan', category=self.cars)
+        create_entry(user=self.user, title='sofa')
+
+        self.assertEqual(self.titles({'category': 'cars'}), ['sedan'])
+        self.assertEqual(self.titles({'category': 'boats'}), [])
+
+    def test_filter_by_price_range(self):
+        """
+        Test filtering entries by minimum and maximum price.
+        """
+        for price in ['50.00', '150.00', '450.00']:
+            create_entry(user=self.user, title=price, price=Decimal(price))
+
+        self.assertEqual(
+            self.titles({'min_price': '100', 'max_price': '450'}),
+            ['450.00', '150.00'])
+
+    def test_filter_by_creation_date(self):
+        """
+        Test filtering entries by creation date.
+        """
+        old = create_entry(user=self.user, title='old')
+        Entry.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=10))
+        create_entry(user=self.user, title='new')
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+
+        self.assertEqual(self.titles({'created_after': since}), ['new'])
+        self.assertEqual(self.titles({'created_before': since}), ['old'])
+
+    def test_invalid_filter_error(self):
+        """
+        Test invalid filter values return an error.
+        """
+        res = self.client.get(ENTRIES_URL, {'min_price': 'cheap'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('min_price', res.data)
+
+
+class EntryFacetTests(TestCase):
+    """
+    Tests for entry facet counts.
+    """
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.cars = Category.objects.create(name='cars')
+
+    def test_facets_follow_entry_writes(self):
+        """
+        Test facet counts follow created, updated and deleted entries.
+        """
+        entry = create_entry(user=self.user, price=Decimal('150.00'))
+        create_entry(user=self.user, price=Decimal('150.00'))
+        bucket = price_bucket(Decimal('150.00'))
+        self.assertEqual(facet_counts(), {('test cat', bucket): 2})
+
+        entry = Entry.objects.get(pk=entry.pk)
+        entry.category = self.cars
+        entry.price = Decimal('20000.00')
+        entry.save()
+        self.assertEqual(facet_counts(), {
+            ('test cat', bucket): 1,
+            ('cars', price_bucket(Decimal('20000.00'))): 1,
+        })
+
+        entry.delete()
+        self.assertEqual(facet_counts(), {('test cat', bucket): 1})
+
+    def test_facets_drop_expired_entries(self):
+        """
+        Test expired entries are not counted.
+        """
+        create_entry(user=self.user)
+        entry = create_entry(user=self.user, category=self.cars)
+
+        Entry.objects.filter(pk=entry.pk).expire()
+        self.assertEqual(list(facet_counts()), [
+            ('test cat', price_bucket(Decimal('150.00')))])
+
+        # saving an expired entry or deleting it changes nothing
+        entry.refresh_from_db()
+        entry.save()
+        entry.delete()
+        self.assertEqual(sum(facet_counts().values()), 1)
+
+    def test_facets_adjusted_in_key_order(self):
+        """
+        Test facet rows are written in (category, bucket) order.
+        """
+        cars, bikes = self.cars.id, Category.objects.create(name='bikes').id
+        deltas = {(bikes, 2): 1, (cars, 9): 2, (cars, 3): 1,
+                  None: 1, (cars, 1): 0}
+
+        with CaptureQueriesContext(connection) as queries:
+            EntryFacet.objects.adjust(deltas)
+
+        self.assertEqual(len(queries), 1)
+        self.assertIn(f'VALUES ({cars}, 3, 1), ({cars}, 9, 2), '
+                      f'({bikes}, 2, 1)', queries[0]['sql'])
+
+    def test_delete_category_with_active_entries(self):
+        """
+        Test deleting categories deletes their entries and facets
+        and releases the entry slots.
+        """
+        create_entry(user=self.user)
+        create_entry(user=self.user, category=self.cars)
+        create_entry(user=self.user, category=self.cars)
+        bikes = Category.objects.create(name='bikes')
+        create_entry(user=self.user, category=bikes)
+
+        self.cars.delete()
+        Category.objects.filter(name='bikes').delete()
+        connection.check_constraints()
+
+        self.assertEqual(facet_counts(), {
+            ('test cat', price_bucket(Decimal('150.00'))): 1})
+        self.assertEqual(Entry.objects.count(), 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.active_entries_count, 1)
+
+    def test_rebuild_matches_incremental_counts(self):
+        """
+        Test rebuilding facets gives the incremental counts.
+        """
+        for price in ['10.00', '150.00', '150.00', '2000000.00']:
+            create_entry(user=self.user, price=Decimal(price))
+        create_entry(user=self.user, category=self.cars, is_expired=True)
+        counts = facet_counts()
+
+        EntryFacet.objects.update(count=42)
+        EntryFacet.objects.rebuild()
+
+        self.assertEqual(facet_counts(), counts)
+
+    def test_list_facets(self):
+        """
+        Test listing category and price bucket counts.
+        """
+        create_entry(user=self.user, price=Decimal('50.00'))
+        create_entry(user=self.user, price=Decimal('150.00'))
+        create_entry(user=self.user, price=Decimal('150.00'),
+                     category=self.cars)
+
+        res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['categories'], [
+            {'name': 'cars', 'count': 1},
+            {'name': 'test cat', 'count': 2},
+        ])
+        self.assertEqual(res.data['price_buckets'], [
+            {'min': 0, 'max': 100, 'count': 1},
+            {'min': 100, 'max': 500, 'count': 2},
+        ])
+
+        res = self.client.get(FACETS_URL, {'category': 'cars'})
+
+        self.assertEqual(res.data['price_buckets'], [
+            {'min': 100, 'max': 500, 'count': 1},
+        ])
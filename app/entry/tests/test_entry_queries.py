@@ -0,0 +1,110 @@
+"""
+Query budget tests for entry api.
+
+Every endpoint serializing entries must run a fixed number of
+queries no matter how many entries are on the page.
+"""
+import re
+from unittest.mock import patch
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.models import EntryImage
+from entry.views import EntryListPagination
+from entry.tests.test_entry_api import (
+    ENTRIES_URL,
+    USER_ENTRIES_URL,
+    create_user,
+    create_entry,
+    detail_url,
+)
+
+
+PAGE_SIZES = [1, 5, 30]
+# the search vector column in a select list
+SELECTED_VECTOR = re.compile(
+    r'(SELECT|,) "core_entry"\."search_vector"(,| FROM)')
+
+
+@override_settings(ENTRY_RESPONSE_CACHE={'ALIAS': 'default', 'TIMEOUT': 0})
+class EntryQueryBudgetTests(TestCase):
+    """
+    Test the number of queries run by entry endpoints,
+    with the response cache disabled.
+    """
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(30):
+            entry = create_entry(user=self.user, title=f'entry {i}')
+            for n in range(2):
+                EntryImage.objects.create(
+                    entry=entry, image=f'uploads/entry/{i}-{n}.jpg')
+
+    def assertQueryBudget(self, budget, url, params=None):
+        """
+        Assert a GET request runs exactly `budget` queries
+        for every page size.
+        """
+        for page_size in PAGE_SIZES:
+            with self.subTest(page_size=page_size), patch.object(
+                    EntryListPagination, 'page_size', page_size):
+                with self.assertNumQueries(budget):
+                    res = self.client.get(url, params)
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_query_budget(self):
+        """
+        Test listing entries runs count, entries and images queries,
+        validators come from the entries generation.
+        """
+        self.assertQueryBudget(3, ENTRIES_URL)
+
+    def test_list_cursor_query_budget(self):
+        """
+        Test cursor listing runs entries and images queries.
+        """
+        self.assertQueryBudget(2, ENTRIES_URL, {'pagination': 'cursor'})
+
+    def test_user_entries_query_budget(self):
+        """
+        Test listing user entries runs count, entries and images queries.
+        """
+        self.assertQueryBudget(3, USER_ENTRIES_URL)
+
+    def test_retrieve_query_budget(self):
+        """
+        Test retrieving an entry runs validators, entry
+        and images queries.
+        """
+        entry = create_entry(user=self.user)
+        EntryImage.objects.create(entry=entry, image='uploads/entry/x.jpg')
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(entry.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['images']), 1)
+
+    def test_search_vector_not_fetched(self):
+        """
+        Test entry endpoints don't select the search vector.
+        """
+        entry = create_entry(user=self.user)
+        for url, params in ((ENTRIES_URL, None),
+                            (ENTRIES_URL, {'search': 'entry'}),
+                            (USER_ENTRIES_URL, None),
+                            (detail_url(entry.id), None)):
+            with self.subTest(url=url, params=params), \
+                    CaptureQueriesContext(connection) as queries:
+                res = self.client.get(url, params)
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                for query in queries:
+                    self.assertNotRegex(query['sql'], SELECTED_VECTOR)
@@ -0,0 +1,100 @@
+"""
+Tests for entry full text search.
+"""
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from django.test import TestCase, override_settings
+
+from core.models import Entry
+from entry.tests.test_entry_api import (
+    ENTRIES_URL,
+    USER_ENTRIES_URL,
+    create_user,
+    create_entry,
+)
+
+
+class EntrySearchTests(TestCase):
+    """
+    Tests for searching entries.
+    """
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_search_title_and_description(self):
+        """
+        Test searching matches titles and descriptions.
+        """
+        create_entry(user=self.user, title='red bicycle')
+        create_entry(user=self.user, title='sofa',
+                     description='comes with a free bicycle pump')
+        create_entry(user=self.user, title='table')
+
+        res = self.client.get(ENTRIES_URL, {'search': 'bicycle'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        titles = [entry['title'] for entry in res.data['results']]
+        self.assertEqual(titles, ['red bicycle', 'sofa'])
+
+    def test_search_vector_follows_updates(self):
+        """
+        Test updated titles are found by search.
+        """
+        entry = create_entry(user=self.user, title='old title')
+        entry.title = 'brand new title'
+        entry.save()
+
+        res = self.client.get(USER_ENTRIES_URL, {'search': 'brand'})
+        self.assertEqual(len(res.data['results']), 1)
+        res = self.client.get(USER_ENTRIES_URL, {'search': 'old'})
+        self.assertEqual(len(res.data['results']), 0)
+
+    def test_search_with_cursor_pagination(self):
+        """
+        Test search results are paginated by cursor in rank order.
+        """
+        for i in range(20):
+            create_entry(user=self.user, title=f'lamp {i}')
+        for i in range(20):
+            create_entry(user=self.user, title=f'desk {i}',
+                         description='with a lamp')
+
+        params = {'search': 'lamp', 'pagination': 'cursor'}
+        res = self.client.get(ENTRIES_URL, params)
+        ids = [entry['id'] for entry in res.data['results']]
+        res = self.client.get(res.data['next'])
+        ids += [entry['id'] for entry in res.data['results']]
+
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(len(ids), 40)
+        titles = list(Entry.objects.filter(
+            pk__in=ids[:20]).values_list('title', flat=True))
+        self.assertTrue(all(title.startswith('lamp') for title in titles))
+
+    @override_settings(ENTRY_SEARCH_CANDIDATES=3)
+    def test_search_ranks_newest_matches(self):
+        """
+        Test only the newest ENTRY_SEARCH_CANDIDATES matches
+        are ranked and returned.
+        """
+        create_entry(user=self.user, title='lamp lamp')
+        for title in ('desk lamp', 'lamp', 'floor lamp'):
+            create_entry(user=self.user, title=title)
+        create_entry(user=self.user, title='lamp', is_expired=True)
+
+        res = self.client.get(ENTRIES_URL, {'search': 'lamp'})
+
+        self.assertEqual(res.data['count'], 3)
+        titles = [entry['title'] for entry in res.data['results']]
+        self.assertCountEqual(titles, ['desk lamp', 'lamp', 'floor lamp'])
+
+    def test_blank_search_lists_all_entries(self):
+        """
+        Test a blank search does not filter entries.
+        """
+        create_entry(user=self.user)
+        res = self.client.get(ENTRIES_URL, {'search': ' '})
+        self.assertEqual(res.data['count'], 1)
@@ -0,0 +1,237 @@
+"""
+Tests for entry tasks.
+"""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import Entry, EntryImage, ImageBlob
+from entry.tasks import (
+    collect_image_blobs,
+    enqueue_image_variants,
+    generate_image_variants,
+    mark_expired_entries,
+)
+from entry.tests.test_entry_api import (
+    create_user,
+    create_entry,
+)
+
+
+class MarkExpiredEntriesTests(TestCase):
+    """
+    Tests for the mark expired entries task.
+    """
+    def setUp(self):
+        self.user = create_user()
+
+    def test_due_entries_are_expired(self):
+        """
+        Test entries past their expiry date are marked expired
+        and others are left alone.
+        """
+        past = timezone.now() - timedelta(minutes=1)
+        due = create_entry(user=self.user, expires_at=past)
+        active = create_entry(user=self.user)
+        no_expiry = create_entry(user=self.user)
+        Entry.objects.filter(pk=no_expiry.pk).update(expires_at=None)
+
+        result = mark_expired_entries()
+
+        self.assertEqual(result['expired'], 1)
+        self.assertIn('duration', result)
+        due.refresh_from_db()
+        active.refresh_from_db()
+        no_expiry.refresh_from_db()
+        self.assertTrue(due.is_expired)
+        self.assertFalse(active.is_expired)
+        self.assertFalse(no_expiry.is_expired)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.active_entries_count, 2)
+
+    def test_entries_are_expired_in_batches(self):
+        """
+        Test every due entry is expired when there are
+        more than one batch of them.
+        """
+        past = timezone.now() - timedelta(minutes=1)
+        for _ in range(5):
+            create_entry(user=self.user, expires_at=past)
+
+        with CaptureQueriesContext(connection) as context:
+            result = mark_expired_entries(batch_size=2)
+
+        updates = [query for query in context.captured_queries
+                   if query['sql'].startswith('UPDATE "core_entry"')]
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(result['expired'], 5)
+        self.assertFalse(Entry.objects.filter(is_expired=False).exists())
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class GenerateImageVariantsTests(TestCase):
+    """
+    Tests for the generate image variants task.
+    """
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.entry = create_entry(user=create_user())
+
+    def create_image(self, content):
+        image = EntryImage(entry=self.entry)
+        image.image.save('photo.png', ContentFile(content))
+        return image
+
+    def png(self, size):
+        buffer = io.BytesIO()
+        Image.new('RGBA', size, (255, 0, 0, 128)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_variants_are_built(self):
+        """
+        Test every variant is written in every format
+        and recorded on the image.
+        """
+        image = self.create_image(self.png((2000, 1000)))
+
+        variants = generate_image_variants(image.pk)
+
+        image.refresh_from_db()
+        self.assertEqual(image.variants, variants)
+        self.assertEqual(set(variants), {'thumbnail', 'medium'})
+        for variant, size in [('thumbnail', (320, 160)),
+                              ('medium', (1024, 512))]:
+            self.assertEqual(set(variants[variant]), {'webp', 'jpeg'})
+            for image_format, path in variants[variant].items():
+                with Image.open(image.image.storage.path(path)) as built:
+                    self.assertEqual(built.size, size)
+                    self.assertEqual(built.format, image_format.upper())
+
+    def test_rebuilding_variants_replaces_files(self):
+        """
+        Test running the task again writes the same files.
+        """
+        image = self.create_image(self.png((100, 100)))
+
+        first = generate_image_variants(image.pk)
+        second = generate_image_variants(image.pk)
+
+        self.assertEqual(first, second)
+        variants_dir = os.path.join(os.path.dirname(image.image.path),
+                                    'variants')
+        stem = os.path.splitext(os.path.basename(image.image.name))[0]
+        built = [name for name in os.listdir(variants_dir)
+                 if name.startswith(stem)]
+        self.assertEqual(len(built), 4)
+
+    def test_unusable_image_is_skipped(self):
+        """
+        Test files that are not images are left without variants.
+        """
+        image = self.create_image(b'not an image')
+
+        self.assertIsNone(generate_image_variants(image.pk))
+        image.refresh_from_db()
+        self.assertEqual(image.variants, {})
+
+    def test_deleted_image_is_skipped(self):
+        """
+        Test images deleted before processing are ignored.
+        """
+        self.assertIsNone(generate_image_variants(0))
+
+    @patch('entry.tasks.build_variants')
+    def test_variants_are_shared_by_blob(self, patched_build):
+        """
+        Test variants already built for a blob are reused.
+        """
+        variants = {'thumbnail': {'jpeg': 'uploads/entry/x-thumbnail.jpg'}}
+        blob = ImageBlob.objects.create(
+            sha256='a' * 64, image='uploads/entry/x.jpg', size=1, refcount=2)
+        EntryImage.objects.create(entry=self.entry, blob=blob,
+                                  image=blob.image.name, variants=variants)
+        image = EntryImage.objects.create(entry=self.entry, blob=blob,
+                                          image=blob.image.name)
+
+        self.assertEqual(generate_image_variants(image.pk), variants)
+        patched_build.assert_not_called()
+
+    @patch('entry.tasks.generate_image_variants.delay')
+    def test_variants_are_enqueued_on_commit(self, patched_delay):
+        """
+        Test variant tasks are sent after the transaction commits.
+        """
+        image = self.create_image(self.png((10, 10)))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            enqueue_image_variants([image])
+            patched_delay.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+        patched_delay.assert_called_once_with(image.pk)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class CollectImageBlobsTests(TestCase):
+    """
+    Tests for the collect image blobs task.
+    """
+    def setUp(self):
+        self.entry = create_entry(user=create_user())
+
+    def create_blob(self, content, refcount):
+        blob = ImageBlob.objects.acquire(
+            hashlib.sha256(content).hexdigest(), '.jpg',
+            ContentFile(content))
+        ImageBlob.objects.filter(pk=blob.pk).update(refcount=refcount)
+        return blob
+
+    def test_unreferenced_blobs_are_collected(self):
+        """
+        Test unreferenced blobs are deleted with their files
+        and referenced ones are kept.
+        """
+        unreferenced = self.create_blob(b'unreferenced', 0)
+        referenced = self.create_blob(b'referenced', 1)
+        # a drifted refcount never deletes an image in use
+        drifted = self.create_blob(b'drifted', 0)
+        EntryImage.objects.create(entry=self.entry, blob=drifted,
+                                  image=drifted.image.name)
+
+        self.assertEqual(collect_image_blobs(batch_size=1), 1)
+
+        self.assertEqual(set(ImageBlob.objects.all()), {referenced, drifted})
+        storage = unreferenced.image.storage
+        self.assertFalse(storage.exists(unreferenced.image.name))
+        self.assertTrue(storage.exists(referenced.image.name))
+
+    def test_released_blob_is_stored_again(self):
+        """
+        Test uploading collected content stores it again.
+        """
+        blob = self.create_blob(b'content', 0)
+        collect_image_blobs()
+
+        blob = self.create_blob(b'content', 1)
+
+        self.assertTrue(blob.image.storage.exists(blob.image.name))
@@ -0,0 +1,103 @@
+"""
+Tests for the entry image upload handler.
+"""
+from django.core.files.uploadhandler import SkipFile, StopUpload
+from django.test import SimpleTestCase
+
+from entry.uploads import (
+    EntryImageUploadHandler,
+    TooManyImages,
+    UploadTooLarge,
+    sniff_image_format,
+)
+
+PNG_HEAD = b'\x89PNG\r\n\x1a\n\0\0\0\r'
+
+
+class EntryImageUploadHandlerTests(SimpleTestCase):
+    """
+    Tests for checking uploads while they are streamed.
+    """
+    def setUp(self):
+        self.handler = EntryImageUploadHandler(
+            'images', max_files=2, max_file_size=100)
+
+    def start_file(self, field_name='images'):
+        self.handler.new_file(field_name, 'photo.png', 'image/png', None)
+
+    def test_sniff_image_format(self):
+        """
+        Test image formats are recognized from their first bytes.
+        """
+        self.assertEqual(sniff_image_format(PNG_HEAD), 'png')
+        self.assertEqual(sniff_image_format(b'\xff\xd8\xff\xe0'), 'jpeg')
+        self.assertEqual(sniff_image_format(b'RIFF\0\0\0\0WEBP'), 'webp')
+        self.assertIsNone(sniff_image_format(b'RIFF\0\0\0\0WAVE'))
+        self.assertIsNone(sniff_image_format(b'<svg xmlns='))
+
+    def test_stop_after_max_files(self):
+        """
+        Test the upload stops at the first file over the limit.
+        """
+        for _ in range(2):
+            self.start_file()
+            self.handler.receive_data_chunk(PNG_HEAD, 0)
+
+        with self.assertRaises(StopUpload):
+            self.start_file()
+        with self.assertRaises(TooManyImages):
+            self.handler.check()
+
+    def test_stop_at_chunk_over_max_file_size(self):
+        """
+        Test the upload stops at the chunk going over the size limit.
+        """
+        self.start_file()
+        self.handler.receive_data_chunk(PNG_HEAD + b'\0' * 80, 0)
+
+        with self.assertRaises(StopUpload):
+            self.handler.receive_data_chunk(b'\0' * 20, 92)
+        with self.assertRaises(UploadTooLarge):
+            self.handler.check()
+
+    def test_stop_at_first_chunk_of_non_image(self):
+        """
+        Test the upload stops as soon as a file is not an image.
+        """
+        self.start_file()
+
+        with self.assertRaises(StopUpload):
+            self.handler.receive_data_chunk(b'#!/bin/sh\nrm -rf /', 0)
+
+    def test_large_body_is_not_read(self):
+        """
+        Test bodies too large for the allowed files are not parsed.
+        """
+        result = self.handler.handle_raw_input(None, {}, 10000, b'x')
+
+        self.assertEqual(len(result[1]), 0)
+        with self.assertRaises(UploadTooLarge):
+            self.handler.check()
+
+    def test_full_entry_body_is_not_read(self):
+        """
+        Test bodies for entries without room for images are not
+        parsed, whatever their size.
+        """
+        handler = EntryImageUploadHandler(
+            'images', max_files=0, max_file_size=100)
+
+        for content_length in (50, 10000):
+            result = handler.handle_raw_input(None, {}, content_length, b'x')
+
+            self.assertEqual(len(result[1]), 0)
+            with self.assertRaises(TooManyImages):
+                handler.check()
+
+    def test_other_fields_are_skipped(self):
+        """
+        Test files of other fields are not received.
+        """
+        with self.assertRaises(SkipFile):
+            self.start_file('attachment')
+        self.handler.check()
@@ -0,0 +1,164 @@
+"""
+Upload handling for entry images.
+
+Image uploads are checked while the request body is parsed, so
+requests over the image count or size limits are stopped without
+reading the rest of the body. Their sha256 digests are computed
+on the way, to store every distinct image once.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import (
+    FileUploadHandler,
+    SkipFile,
+    StopUpload,
+)
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+# leading bytes of the accepted image formats
+IMAGE_SIGNATURES = {
+    'jpeg': [b'\xff\xd8\xff'],
+    'png': [b'\x89PNG\r\n\x1a\n'],
+    'gif': [b'GIF87a', b'GIF89a'],
+    'webp': [b'RIFF'],
+}
+
+# file extension of the stored images per format
+IMAGE_EXTENSIONS = {
+    'jpeg': '.jpg',
+    'png': '.png',
+    'gif': '.gif',
+    'webp': '.webp',
+}
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Upload is too large.'
+    default_code = 'upload_too_large'
+
+
+class TooManyImages(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_code = 'too_many_images'
+
+    def __init__(self, max_files):
+        super().__init__({'message': f'Maximum images allowed: {max_files}'})
+
+
+def sniff_image_format(head):
+    """
+    Return the image format of a file from its first bytes,
+    or None when it is not an accepted image.
+    """
+    for image_format, signatures in IMAGE_SIGNATURES.items():
+        if any(head.startswith(signature) for signature in signatures):
+            # RIFF containers hold other media than WebP
+            if image_format == 'webp' and head[8:12] != b'WEBP':
+                continue
+            return image_format
+
+    return None
+
+
+def inspect_upload(file):
+    """
+    Return the sha256 digest and image format of an uploaded
+    file, the format is None when it is not an accepted image.
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    head = file.read(EntryImageUploadHandler.sniff_size)
+    file.seek(0)
+
+    return digest.hexdigest(), sniff_image_format(head)
+
+
+class EntryImageUploadHandler(FileUploadHandler):
+    """
+    Upload handler enforcing the image count, per file size and
+    file type limits of an image upload while it is streamed.
+
+    The first violation stops the upload and is raised by check().
+    The digest and format of every received image are collected
+    in uploads, in the order of the files.
+    """
+    # enough bytes to recognize every accepted format
+    sniff_size = 12
+
+    def __init__(self, image_field, max_files, max_file_size, request=None):
+        super().__init__(request)
+        self.image_field = image_field
+        self.max_files = max_files
+        self.max_file_size = max_file_size
+        self.files = 0
+        self.uploads = []
+        self.error = None
+
+    def stop(self, error):
+        self.error = error
+        raise StopUpload(connection_reset=True)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        # bodies are not read for entries without room for images,
+        # or when too large to hold the allowed files
+        if self.max_files == 0:
+            self.error = TooManyImages(self.max_files)
+            return QueryDict(encoding=encoding), MultiValueDict()
+        if content_length > (self.max_files + 1) * self.max_file_size:
+            self.error = UploadTooLarge()
+            return QueryDict(encoding=encoding), MultiValueDict()
+
+        return None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        if field_name != self.image_field:
+            raise SkipFile()
+
+        self.files += 1
+        if self.files > self.max_files:
+            self.stop(TooManyImages(self.max_files))
+        self.head = b''
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_file_size:
+            self.stop(UploadTooLarge(
+                f'Images must not be larger than {self.max_file_size} '
+                f'bytes.'))
+
+        if len(self.head) < self.sniff_size:
+            self.head += raw_data[:self.sniff_size - len(self.head)]
+            if (len(self.head) == self.sniff_size
+                    and sniff_image_format(self.head) is None):
+                self.stop(ValidationError(
+                    {'images': f'{self.file_name} is not an image.'}))
+
+        self.digest.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        # files shorter than the sniffed prefix are checked here
+        image_format = sniff_image_format(self.head)
+        if image_format is None:
+            self.stop(ValidationError(
+                {'images': f'{self.file_name} is not an image.'}))
+
+        self.uploads.append((self.digest.hexdigest(), image_format))
+        return None
+
+    def check(self):
+        """
+        Raise the error that stopped the upload, if any.
+        """
+        if self.error is not None:
+            raise self.error
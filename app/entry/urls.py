@@ -1,15 +1,36 @@
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
-from entry import views
+from entry import async_views, views
 
 router = DefaultRouter()
 router.register('entries', views.EntryViewSet)
 
 app_name = 'entry'
 
-urlpatterns = [
+category_list_view = views.CategoryListView.as_view()
+
+sync_urlpatterns = [
     path('', include(router.urls)),
     path('category-list/',
-         views.CategoryListView.as_view(),
+         category_list_view,
          name='category-list')
 ]
+
+# the async views answer reads under the names of the sync views
+# they wrap, which answer the other methods
+sync_views = {url.name: url.callback for url in router.urls}
+async_urlpatterns = [
+    path('entries/',
+         async_views.EntryListView.as_view(sync_views['entry-list']),
+         name='entry-list'),
+    re_path(r'^entries/(?P<pk>[^/.]+)/$',
+            async_views.EntryDetailView.as_view(sync_views['entry-detail']),
+            name='entry-detail'),
+    path('category-list/',
+         async_views.CategoryListView.as_view(category_list_view),
+         name='category-list'),
+] + sync_urlpatterns
+
+urlpatterns = (async_urlpatterns if settings.ENTRY_ASYNC_VIEWS
+               else sync_urlpatterns)
@@ -1,6 +1,10 @@
 """
 Views for recipe APIs.
 """
+from functools import partial
+
+from asgiref.sync import sync_to_async
+
 from rest_framework import (
     viewsets,
     status,
@@ -8,24 +12,153 @@ from rest_framework import (
 )
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import ValidationError
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (
+    PageNumberPagination,
+    CursorPagination,
+)
+
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db import transaction
+from django.db.models import Count
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 
 from core.models import (
     Entry,
+    EntryFacet,
     EntryImage,
+    EntryLimitExceeded,
+    ImageBlob,
     Category,
 )
+from core.timing import time_serialization
 from entry import serializers
+from entry.cache import cached_response, bump_entries_generation
+from entry.conditional import (
+    cached_entry_validators,
+    conditional_response,
+    list_validators,
+)
+from entry.filters import (
+    EntryFieldFilter,
+    EntrySearchFilter,
+    SEARCH_ORDERING,
+)
+from entry.categories import category_registry
+from entry.tasks import enqueue_image_variants
+from entry.uploads import (
+    IMAGE_EXTENSIONS,
+    EntryImageUploadHandler,
+    TooManyImages,
+    inspect_upload,
+)
+from user.authentication import CachedTokenAuthentication
+
+
+class EntryCursorPagination(CursorPagination):
+    """
+    Keyset pagination for listing entries.
+    """
+    page_size = 30
+    ordering = ('-created_at', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        # search results are ordered by relevance first
+        if 'rank' in queryset.query.annotations:
+            return SEARCH_ORDERING
+
+        return self.ordering
 
 
 class EntryListPagination(PageNumberPagination):
     """
     Pagination for listing entries.
+
+    Page numbers are used by default. Clients opt into keyset
+    pagination with `?pagination=cursor`, the next and previous
+    links carry an opaque `cursor` parameter from then on.
+    Cursor pages run no count query and cost the same at any depth.
     """
     page_size = 30
+    mode_query_param = 'pagination'
+    cursor_class = EntryCursorPagination
+
+    def __init__(self):
+        self.cursor_paginator = None
+
+    def use_cursor(self, request):
+        """
+        Check whether the request asks for keyset pagination.
+        """
+        cursor_query_param = self.cursor_class.cursor_query_param
+        return (request.query_params.get(self.mode_query_param) == 'cursor'
+                or cursor_query_param in request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async variant of paginate_queryset. Page number pages are
+        counted and fetched with the async ORM, cursor pages are
+        paginated in a thread.
+        """
+        if self.use_cursor(request):
+            return await sync_to_async(self.paginate_queryset)(
+                queryset, request, view)
+
+        self.request = request
+        paginator = self.django_paginator_class(
+            queryset, self.get_page_size(request))
+        # fills the cached count the paginator would query for
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)))
+
+        if paginator.num_pages > 1:
+            self.display_page_controls = True
+
+        self.page.object_list = [
+            entry async for entry in self.page.object_list]
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters += [
+            {
+                'name': self.mode_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Set to `cursor` for keyset pagination.',
+                'schema': {'type': 'string', 'enum': ['cursor']},
+            },
+            {
+                'name': self.cursor_class.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+        ]
+        return parameters
 
 
 class EntryViewSet(viewsets.ModelViewSet):
@@ -34,28 +167,82 @@ class EntryViewSet(viewsets.ModelViewSet):
     """
     serializer_class = serializers.EntryDetailSerializer
     queryset = Entry.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     pagination_class = EntryListPagination
+    filter_backends = [EntryFieldFilter, EntrySearchFilter]
+    serializing_actions = ('list', 'retrieve', 'list_user_entries',
+                           'update', 'partial_update')
 
     def get_queryset(self):
         """
         Retrieve entries ordered by date and time.
         """
+        # the search vector is only read by the search filter in
+        # the database, don't fetch it with every entry
+        queryset = self.queryset.defer('search_vector')
+        # category and images are serialized with every entry,
+        # fetch them in batches instead of once per entry
+        if self.action in self.serializing_actions:
+            queryset = queryset.select_related(
+                'category').prefetch_related('images')
+
         # users are allowed to list and retrieve others entries
         # but not allowed to preform delete or update operations
         # on other users entries
         if self.action == 'list' or self.action == 'retrieve':
-            return self.queryset.filter(
+            return queryset.filter(
                 is_expired=False).order_by('-created_at')
 
         if self.action == 'list_user_entries':
-            return self.queryset.filter(
+            return queryset.filter(
                 user=self.request.user).order_by('-created_at')
 
-        return self.queryset.filter(
+        if self.action == 'upload_image':
+            queryset = queryset.annotate(image_count=Count('images'))
+
+        return queryset.filter(
             user=self.request.user).order_by('-created_at')
 
+    def list(self, request, *args, **kwargs):
+        """
+        List active entries, cached for every user.
+        """
+        get_response = partial(cached_response, request, 'list',
+                               partial(self.list_page, request))
+        return conditional_response(
+            request, list_validators(request), get_response)
+
+    def list_page(self, request):
+        """
+        Return the response listing a page of active entries.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        with time_serialization():
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieve an active entry, cached for every user.
+        """
+        queryset = self.get_queryset().filter(pk=kwargs['pk'])
+        get_response = partial(cached_response, request, 'retrieve',
+                               partial(self.retrieve_entry, request))
+        return conditional_response(
+            request,
+            cached_entry_validators(request, 'retrieve', queryset),
+            get_response)
+
+    def retrieve_entry(self, request):
+        """
+        Return the response with an active entry.
+        """
+        instance = self.get_object()
+        with time_serialization():
+            return Response(self.get_serializer(instance).data)
+
     def get_serializer_class(self):
         """
         Return the serializer class for the request.
@@ -78,42 +265,107 @@ class EntryViewSet(viewsets.ModelViewSet):
         if user.is_profile_complete() is False:
             raise ValidationError("Profile is incomplete.")
 
-        user_entries_count = Entry.objects.filter(
-            user=user).count()
+        # the entry slot is claimed with a conditional update
+        # on the user's active entry counter
         max_entries = user.plan.max_entries
-        if user_entries_count == max_entries:
+        try:
+            serializer.save(user=user, max_entries=max_entries)
+        except EntryLimitExceeded:
             raise ValidationError(
                 f'User has reached the maximum of {max_entries} entries.')
 
-        serializer.save(user=user)
-
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """
         Upload multiple images to an entry.
         """
+        # the entry comes with its image count from one query
         entry = self.get_object()
+
+        # user is not allowed to upload images more than
+        # max_entry_images specified in their plan, counting
+        # the images the entry already has
+        max_entry_images = request.user.plan.max_entry_images
+        handler = EntryImageUploadHandler(
+            'images',
+            max_files=max(max_entry_images - entry.image_count, 0),
+            max_file_size=settings.ENTRY_IMAGE_MAX_UPLOAD_SIZE,
+        )
+        # limits are enforced while the body is parsed
+        request._request.upload_handlers.insert(0, handler)
         images = request.FILES.getlist('images')
+        handler.check()
 
         if not images:
             return Response({'error': 'No images provided'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # user is not allowed to upload images more than
-        # max_entry_images specified in their plan
-        max_entry_images = request.user.plan.max_entry_images
-        if len(images) > max_entry_images:
-            return Response(
-                {'message': f'Maximum images allowed: {max_entry_images}'},
-                status=status.HTTP_400_BAD_REQUEST)
+        # the body may have been parsed before the handler was added
+        if len(images) > handler.max_files:
+            raise TooManyImages(handler.max_files)
+
+        uploads = handler.uploads
+        if len(uploads) != len(images):
+            uploads = [inspect_upload(image) for image in images]
+            if any(image_format is None for _, image_format in uploads):
+                raise ValidationError({'images': 'Upload only images.'})
 
-        image_instances = [EntryImage(
-            image=image, entry=entry) for image in images]
-        EntryImage.objects.bulk_create(image_instances)
+        # identical images share one stored blob
+        with transaction.atomic():
+            image_instances = []
+            for image, (digest, image_format) in zip(images, uploads):
+                blob = ImageBlob.objects.acquire(
+                    digest, IMAGE_EXTENSIONS[image_format], image)
+                image_instances.append(EntryImage(
+                    image=blob.image.name, blob=blob, entry=entry))
+            EntryImage.objects.bulk_create(image_instances)
+        # bulk_create sends no signals
+        bump_entries_generation()
+        enqueue_image_variants(image_instances)
 
         return Response({'message': 'Images uploaded successfully'},
                         status=status.HTTP_201_CREATED)
 
+    @action(methods=['GET'], detail=False, url_path='facets')
+    def facets(self, request):
+        """
+        Count active entries per category and price bucket,
+        from the facet rollup instead of the entries table.
+        """
+        return cached_response(request, 'facets',
+                               partial(self.get_facets, request))
+
+    def get_facets(self, request):
+        """
+        Return the facet counts, price buckets restricted to
+        the category named in the query parameters.
+        """
+        facets = EntryFacet.objects.filter(count__gt=0).values_list(
+            'category__name', 'price_bucket', 'count')
+        category = request.query_params.get('category')
+
+        categories = {}
+        buckets = dict.fromkeys(range(len(settings.ENTRY_PRICE_BUCKETS) + 1),
+                                0)
+        for name, bucket, count in facets:
+            categories[name] = categories.get(name, 0) + count
+            if not category or category == name:
+                buckets[bucket] += count
+
+        bounds = [None, *settings.ENTRY_PRICE_BUCKETS, None]
+        return Response({
+            'categories': [
+                {'name': name, 'count': count}
+                for name, count in sorted(categories.items())
+            ],
+            'price_buckets': [
+                {'min': bounds[bucket], 'max': bounds[bucket + 1],
+                 'count': count}
+                for bucket, count in buckets.items()
+                if count
+            ],
+        })
+
     @action(methods=['GET'], detail=False, url_path='user-entries')
     def list_user_entries(self, resuqest):
         """
@@ -122,12 +374,13 @@ class EntryViewSet(viewsets.ModelViewSet):
         queryset = self.filter_queryset(self.get_queryset())
 
         page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+        with time_serialization():
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
 
 
 class CategoryListView(generics.ListAPIView):
@@ -136,5 +389,25 @@ class CategoryListView(generics.ListAPIView):
     """
     serializer_class = serializers.CategorySerializer
     queryset = Category.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+
+    def list(self, request, *args, **kwargs):
+        """
+        List categories from the category registry.
+        """
+        return category_response(request, category_registry.snapshot())
+
+
+def category_response(request, snapshot):
+    """
+    Return the categories of a registry snapshot, or 304 Not
+    Modified when the client has them.
+    """
+    etag = quote_etag(snapshot['etag'])
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = Response(snapshot['data'])
+
+    response['ETag'] = etag
+    return response
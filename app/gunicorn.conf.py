@@ -0,0 +1,99 @@
+"""
+Gunicorn settings of the production server.
+
+GUNICORN_WORKER_MODE picks the worker model:
+
+- sync: preforked workers serving one request at a time on app.wsgi
+- gthread: preforked workers with GUNICORN_THREADS threads on app.wsgi
+- uvicorn: preforked uvicorn workers on app.asgi
+
+Send SIGHUP to the master process for a graceful reload, new workers
+start on the new code before the old ones finish their requests.
+"""
+import multiprocessing
+import os
+
+mode = os.environ.get('GUNICORN_WORKER_MODE', 'gthread')
+if mode not in ('sync', 'gthread', 'uvicorn'):
+    raise ValueError(f'Unknown GUNICORN_WORKER_MODE {mode}.')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get(
+    'WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}[mode]
+wsgi_app = 'app.asgi:application' if mode == 'uvicorn' \
+    else 'app.wsgi:application'
+
+if mode == 'uvicorn':
+    # async requests do not reuse database connections, persistent
+    # ones would pile up in the worker's thread pool
+    os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# recycling workers bounds the memory a leak can take
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+# the app is loaded by every worker, so a reload picks up new code
+preload_app = False
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+
+
+def on_starting(server):
+    """
+    Drop the metrics and query statistics snapshots of earlier
+    processes of this host.
+    """
+    from core import snapshots
+
+    for variable in ('METRICS_MULTIPROC_DIR', 'QUERY_STATS_DIR'):
+        directory = os.environ.get(variable)
+        if directory:
+            snapshots.clear(directory)
+
+
+def child_exit(server, worker):
+    """
+    Combine the metrics and query statistics snapshots of an exited
+    worker with those of the earlier ones, recycled workers would
+    leave a snapshot each.
+    """
+    from core import snapshots
+    from core.metrics import combine_dumps
+    from core.querystats import combine_snapshots
+
+    combiners = {
+        'METRICS_MULTIPROC_DIR': combine_dumps,
+        'QUERY_STATS_DIR': combine_snapshots,
+    }
+    for variable, combine in combiners.items():
+        directory = os.environ.get(variable)
+        if not directory:
+            continue
+        try:
+            snapshots.retire(directory, worker.pid, combine)
+        except OSError:
+            server.log.exception('Could not combine the snapshot of '
+                                 'worker %s in %s.', worker.pid, directory)
+
+
+def worker_exit(server, worker):
+    """
+    Write the final metrics and query statistics of a worker.
+    """
+    from django.conf import settings
+
+    from core.metrics import default_registry
+    from core.querystats import query_stats
+
+    if settings.METRICS_MULTIPROC_DIR:
+        default_registry.flush()
+    if settings.QUERY_STATS['DIR']:
+        query_stats.flush()
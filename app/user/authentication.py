@@ -0,0 +1,238 @@
+"""
+Authentication for the APIs.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+
+from core.routers import primary_reads
+from core.timing import record_cache
+
+
+class TokenCache:
+    """
+    Bounded in-process LRU cache of token key -> token snapshots.
+
+    Snapshots hold the token with its user and the user's plan
+    loaded. Entries live for `ttl` seconds, with a shared cache
+    configured local misses are looked up there before the database.
+    """
+    shared_key_prefix = 'auth-token'
+
+    def __init__(self, max_size, ttl, shared_cache_alias=None,
+                 shared_ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared_cache_alias = shared_cache_alias
+        self.shared_ttl = shared_ttl or ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        """
+        Create a token cache configured by AUTH_TOKEN_CACHE setting.
+        """
+        options = settings.AUTH_TOKEN_CACHE
+        return cls(max_size=options['MAX_SIZE'],
+                   ttl=options['TTL'],
+                   shared_cache_alias=options.get('SHARED_CACHE_ALIAS'),
+                   shared_ttl=options.get('SHARED_TTL'))
+
+    @property
+    def shared_cache(self):
+        """
+        Return the shared cache backing this cache or None.
+        """
+        if self.shared_cache_alias is None:
+            return None
+        return caches[self.shared_cache_alias]
+
+    def shared_key(self, key):
+        """
+        Return the shared cache key of a token, prefixed with
+        the generation to let clear() drop every shared entry.
+        """
+        generation = self.shared_cache.get_or_set(
+            f'{self.shared_key_prefix}:generation', 1, None)
+        return f'{self.shared_key_prefix}:{generation}:{key}'
+
+    def get(self, key):
+        """
+        Return a copy of the cached token snapshot or None.
+        """
+        token = self.get_local(key)
+        if token is not None:
+            return token
+
+        if self.shared_cache is not None:
+            token = self.shared_cache.get(self.shared_key(key))
+            if token is not None:
+                self._store(key, token)
+                return self.snapshot(token)
+
+        return None
+
+    def get_local(self, key):
+        """
+        Return a copy of the token snapshot cached in this process
+        or None, without looking up the shared cache.
+        """
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                token, expires = item
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return self.snapshot(token)
+                del self._entries[key]
+
+        return None
+
+    def set(self, key, token):
+        """
+        Cache a token snapshot.
+        """
+        self._store(key, token)
+        if self.shared_cache is not None:
+            self.shared_cache.set(self.shared_key(key), token,
+                                  self.shared_ttl)
+
+    def delete(self, *keys):
+        """
+        Drop the snapshots of the given token keys.
+        """
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+        if self.shared_cache is not None and keys:
+            self.shared_cache.delete_many(
+                [self.shared_key(key) for key in keys])
+
+    def clear(self):
+        """
+        Drop every snapshot.
+        """
+        with self._lock:
+            self._entries.clear()
+
+        if self.shared_cache is not None:
+            try:
+                self.shared_cache.incr(
+                    f'{self.shared_key_prefix}:generation')
+            except ValueError:
+                pass
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _store(self, key, token):
+        with self._lock:
+            self._entries[key] = (token, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def snapshot(self, token):
+        """
+        Copy a snapshot so requests cannot change the cached objects.
+        """
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return token
+
+
+token_cache = TokenCache.from_settings()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication serving users from the token cache.
+
+    A warm cache authenticates without queries and with
+    request.user.plan already loaded.
+    """
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+
+        return self.authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        """
+        Async variant of authenticate, tokens cached in this process
+        are served without leaving the event loop.
+        """
+        key = self.get_key(request)
+        if key is None:
+            return None
+
+        token = token_cache.get_local(key)
+        if token is None:
+            # the shared cache and the database are queried in a thread
+            return await sync_to_async(self.authenticate_credentials)(key)
+
+        record_cache(True)
+        return (token.user, token)
+
+    def get_key(self, request):
+        """
+        Return the token key of the Authorization header, or None
+        when the request carries no token.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. No credentials provided.'))
+        elif len(auth) > 2:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. '
+                  'Token string should not contain spaces.'))
+
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. '
+                  'Token string should not contain invalid characters.'))
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        record_cache(token is not None)
+        if token is None:
+            model = self.get_model()
+            try:
+                # tokens are used right after they are created
+                with primary_reads():
+                    token = model.objects.select_related(
+                        'user__plan').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(
+                    _('User inactive or deleted.'))
+
+            token_cache.set(key, token)
+            token = token_cache.snapshot(token)
+
+        return (token.user, token)
@@ -4,14 +4,32 @@ from django.contrib.auth import (
     get_user_model,
     authenticate
 )
+from django.db import IntegrityError, transaction
 from django.utils.translation import gettext as _
 
 from rest_framework import serializers
 
 import re
+from contextlib import contextmanager
 from datetime import date
 
 
+@contextmanager
+def unique_phone_number():
+    """
+    Raise the phone number validation error for writes losing
+    a race for the same phone number against another request.
+    """
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError as exc:
+        if 'user_phone_number_unique' not in str(exc):
+            raise
+        raise serializers.ValidationError(
+            {'phone_number': ['Invalid phone number.']})
+
+
 class UserSerializer(serializers.ModelSerializer):
     """
     Serializer for the user object
@@ -91,7 +109,8 @@ class UserSerializer(serializers.ModelSerializer):
         """
         Create and return a user with encrypted password.
         """
-        return get_user_model().objects.create_user(**validated_data)
+        with unique_phone_number():
+            return get_user_model().objects.create_user(**validated_data)
 
     def update(self, instance, validated_data):
         """
@@ -101,11 +120,12 @@ class UserSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Date of birth cannot be editted.')
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
+        with unique_phone_number():
+            user = super().update(instance, validated_data)
 
-        if password:
-            user.set_password(password)
-            user.save()
+            if password:
+                user.set_password(password)
+                user.save()
 
         return user
 
@@ -0,0 +1,38 @@
+"""
+Signal handlers for the user app.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Plan
+from user.authentication import token_cache
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """
+    Drop cached tokens of a changed or deleted user.
+    """
+    keys = Token.objects.filter(
+        user_id=instance.pk).values_list('key', flat=True)
+    token_cache.delete(*keys)
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    """
+    Drop a changed or deleted token.
+    """
+    token_cache.delete(instance.key)
+
+
+@receiver([post_save, post_delete], sender=Plan)
+def invalidate_all_tokens(sender, instance, **kwargs):
+    """
+    Drop every cached token when a plan changes,
+    plans are shared by many users and rarely change.
+    """
+    token_cache.clear()
@@ -0,0 +1,149 @@
+"""
+Tests for cached token authentication.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Plan
+from user.authentication import TokenCache, token_cache
+
+ME_URL = reverse('user:me')
+
+
+class TokenCacheTests(TestCase):
+    """
+    Tests for the token cache.
+    """
+
+    def test_least_recently_used_token_evicted(self):
+        """
+        Test the cache drops the least recently used token when full.
+        """
+        cache = TokenCache(max_size=2, ttl=60)
+        user = get_user_model().objects.create_user('user@example.com')
+        token = Token.objects.create(user=user)
+        cache.set('a', token)
+        cache.set('b', token)
+        cache.get('a')
+        cache.set('c', token)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+
+    @patch('user.authentication.time.monotonic')
+    def test_token_expires_after_ttl(self, patched_monotonic):
+        """
+        Test cached tokens are dropped after the ttl.
+        """
+        cache = TokenCache(max_size=2, ttl=60)
+        user = get_user_model().objects.create_user('user@example.com')
+        token = Token.objects.create(user=user)
+        patched_monotonic.return_value = 100
+        cache.set('a', token)
+        patched_monotonic.return_value = 159
+        self.assertIsNotNone(cache.get('a'))
+        patched_monotonic.return_value = 161
+        self.assertIsNone(cache.get('a'))
+
+    @override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'token-cache-tests',
+        },
+    })
+    def test_shared_cache_serves_local_misses(self):
+        """
+        Test tokens cached by another process are read from
+        the shared cache and cleared by generation.
+        """
+        user = get_user_model().objects.create_user('user@example.com')
+        token = Token.objects.create(user=user)
+        TokenCache(max_size=2, ttl=60, shared_cache_alias='default').set(
+            token.key, token)
+
+        cache = TokenCache(max_size=2, ttl=60, shared_cache_alias='default')
+        self.assertEqual(cache.get(token.key).user, user)
+
+        cache.clear()
+        self.assertIsNone(cache.get(token.key))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """
+    Tests for authenticating requests with cached tokens.
+    """
+
+    def setUp(self):
+        token_cache.clear()
+        self.plan = Plan.objects.create(name='Basic')
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='goodpass123',
+            first_name='firstname',
+            plan=self.plan,
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_warm_cache_runs_no_auth_queries(self):
+        """
+        Test repeated requests are authenticated without queries.
+        """
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['first_name'], 'firstname')
+
+    def test_user_change_invalidates_token(self):
+        """
+        Test changes to the user are seen by the next request.
+        """
+        self.client.get(ME_URL)
+        self.user.first_name = 'newname'
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.data['first_name'], 'newname')
+
+    def test_plan_change_invalidates_token(self):
+        """
+        Test plan changes clear cached tokens.
+        """
+        self.client.get(ME_URL)
+        self.plan.max_entries = 10
+        self.plan.save()
+
+        self.assertEqual(len(token_cache), 0)
+
+    def test_deleted_token_rejected(self):
+        """
+        Test a deleted token is not accepted from the cache.
+        """
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user_rejected(self):
+        """
+        Test inactive users are not authenticated.
+        """
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
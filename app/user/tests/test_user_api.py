@@ -1,6 +1,8 @@
 """
 Tests for user API.
 """
+from unittest.mock import patch
+
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.test import TestCase
@@ -11,6 +13,7 @@ from rest_framework import status
 from datetime import date
 
 from core.models import Plan
+from user.serializers import UserSerializer
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
@@ -24,6 +27,21 @@ def create_user(**params):
     return get_user_model().objects.create_user(**params)
 
 
+def phone_number_taken_after_validation():
+    """
+    Patch the user serializer to give the validated phone number
+    to another user before saving, like a concurrent request.
+    """
+    validate = UserSerializer.validate
+
+    def validate_and_take(self, data):
+        create_user(email='other@example.com', password='pass125234',
+                    phone_number=data['phone_number'])
+        return validate(self, data)
+
+    return patch.object(UserSerializer, 'validate', validate_and_take)
+
+
 class PunlicUserApiTests(TestCase):
 
     def setUp(self):
@@ -139,6 +157,25 @@ class PunlicUserApiTests(TestCase):
             phone_number=payload['phone_number']).exists()
         self.assertFalse(exists)
 
+    def test_phone_number_taken_concurrently_error(self):
+        """
+        Test a phone number taken after it was validated
+        returns the phone number error.
+        """
+        payload = {
+            'email': 'test@example.com',
+            'password': 'pass125234',
+            'phone_number': '+906657876543',
+            'date_of_birth': '2000-01-01',
+        }
+        with phone_number_taken_after_validation():
+            res = self.client.post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data, {'phone_number': ['Invalid phone number.']})
+        self.assertFalse(get_user_model().objects.filter(
+            email=payload['email']).exists())
+
     def test_invalid_first_name_error(self):
         """
         Test return error if first name is invalid.
@@ -364,6 +401,20 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertNotEqual(self.user.phone_number, payload['phone_number'])
 
+    def test_update_phone_number_taken_concurrently_error(self):
+        """
+        Test a phone number taken after it was validated
+        returns the phone number error on update.
+        """
+        with phone_number_taken_after_validation():
+            res = self.client.patch(ME_URL, {'phone_number': '+906657876543',
+                                             'first_name': 'changed'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data, {'phone_number': ['Invalid phone number.']})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'firstname')
+
     def test_update_date_of_birth_error(self):
         """
         Test updating date of birth returns error.
@@ -4,7 +4,6 @@ Views for the user API
 
 from rest_framework import (
     generics,
-    authentication,
     permissions,
 )
 from rest_framework.authtoken.views import ObtainAuthToken
@@ -14,6 +13,7 @@ from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
 )
+from user.authentication import CachedTokenAuthentication
 from core.models import Plan
 
 
@@ -41,7 +41,7 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
 
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):